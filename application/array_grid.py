@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""
+AACircuit
+2020-03-02 JvO
+"""
+
+import weakref
+import numpy as np
+
+from gettext import gettext as _
+from application import CELL_DEFAULT, CELL_ERASE
+from application.grid import Grid, Snapshot
+
+# code point of the default (empty) cell
+SPACE = ord(CELL_DEFAULT)
+# code point used for the 'erase' value (hex zero)
+ERASE = 0
+
+
+def to_codes(row):
+    """Convert a row of characters (string or list) to an array of code points."""
+    if isinstance(row, str):
+        return np.frombuffer(row.encode('utf-32-le'), dtype='<u4')
+    return np.array([ERASE if c == CELL_ERASE else ord(c) for c in row], dtype=np.uint32)
+
+
+class ArrayGrid(Grid):
+    """
+    Grid with a 2D NumPy array (of unicode code points) as character buffer.
+
+    The cell interface is the same as for Grid, the bulk operations (blit, erase, insert/remove
+    rows and columns, text dump) are vectorised.
+    """
+
+    def __init__(self, cols=5, rows=5):
+        self._grid = np.full((rows, cols), SPACE, dtype=np.uint32)
+        # the snapshots of the buffer, and the rows saved to them since the latest snapshot, see snapshot()
+        self._snapshots = weakref.WeakSet()
+        self._preserved = set()
+        self._damaged = dict()
+        self._clipped = False
+
+    def __str__(self):
+        str = _("number of rows: {0} columns: {1}\n").format(self.nr_rows, self.nr_cols)
+        for r in range(self.nr_rows):
+            str += "{0}\n".format(self.row(r))
+        return str
+
+    @property
+    def grid(self):
+        return [list(line) for line in self._raw_lines()]
+
+    @property
+    def nr_rows(self):
+        return self._grid.shape[0]
+
+    @property
+    def nr_cols(self):
+        return self._grid.shape[1]
+
+    def row(self, row):
+        return [chr(c) for c in self._grid[row]]
+
+    def col(self, col):
+        return [chr(c) for c in self._grid[:, col]]
+
+    def _raw_lines(self):
+        """Return the grid rows as a list of strings."""
+        if self.nr_cols == 0:
+            return [''] * self.nr_rows
+        # view each row of code points as one fixed-width unicode string
+        buffer = np.ascontiguousarray(self._grid, dtype=np.uint32)
+        return buffer.view('U{0}'.format(self.nr_cols)).ravel().tolist()
+
+    # grid manipulation
+
+    def _writable(self, r_start=0, r_end=None):
+        """
+        Prepare the rows for a write (in place) to the buffer.
+
+        On the first write to a row after a snapshot, the content of the row is saved to the snapshots.
+        :param r_start, r_end: the rows to write to, default all rows
+        """
+        if len(self._snapshots) == 0:
+            return
+        if r_end is None:
+            r_end = self.nr_rows
+        for r in range(r_start, r_end):
+            if r not in self._preserved:
+                line = self._grid[r].copy()
+                for snapshot in self._snapshots:
+                    snapshot._saved.setdefault(r, line)
+                self._preserved.add(r)
+
+    def _record(self, col, row, target, values, where=True):
+        """
+        Record the cells that change to the journal, if any.
+        :param col, row: the upper left corner of the target block
+        :param target: the block of the grid that is written to
+        :param values: the new code points, a block of the same shape or a single code point
+        :param where: the cells that are written to (mask), default all cells
+        """
+        if self.journal is None:
+            return
+        values = np.broadcast_to(values, target.shape)
+        for r, c in zip(*np.nonzero((target != values) & where)):
+            self.journal.record(col + int(c), row + int(r), chr(target[r, c]), chr(values[r, c]))
+
+    def _detach(self):
+        """The buffer has been replaced, the snapshots keep the previous one."""
+        self._snapshots = weakref.WeakSet()
+        self._preserved = set()
+
+    def cell(self, pos):
+        col, row = pos.xy
+        if row < self.nr_rows and col < self.nr_cols:
+            # a negative position wraps around
+            return chr(self._grid[row, col])
+        else:
+            return ' '
+
+    def neighbourhood(self, pos):
+        col, row = pos.xy
+        nr_rows = self.nr_rows
+        nr_cols = self.nr_cols
+        cells = []
+        for r in (row - 1, row, row + 1):
+            for c in (col - 1, col, col + 1):
+                if r < nr_rows and c < nr_cols:
+                    # a negative position wraps around
+                    cells.append(chr(self._grid[r, c]))
+                else:
+                    cells.append(' ')
+        return cells
+
+    def set_cell(self, pos, value):
+        row = pos.y
+        col = pos.x
+        if row < self.nr_rows and col < self.nr_cols:
+            # a negative position wraps around
+            if row < 0 or col < 0:
+                self._lost(value)
+            # hex zero 'erases' content
+            if value == CELL_ERASE:
+                code = SPACE
+            # space character is 'transparent'
+            elif value == ' ':
+                return
+            else:
+                code = ord(value)
+            if self._grid[row, col] != code:
+                if self.journal is not None:
+                    self.journal.record(col % self.nr_cols, row % self.nr_rows, chr(self._grid[row, col]), chr(code))
+                self._writable(row % self.nr_rows, row % self.nr_rows + 1)
+                self._grid[row, col] = code
+                self.damage_cell(col, row)
+        else:
+            self._lost(value)
+
+    def copy(self, cols=None, rows=None):
+        """
+        Return a copy of the grid, optionally with other dimensions.
+
+        The content is copied from the upper left corner, cropped or padded with empty cells.
+        :param cols, rows: the dimensions of the copy, default the dimensions of this grid
+        """
+        if cols is None:
+            cols = self.nr_cols
+        if rows is None:
+            rows = self.nr_rows
+        grid = self.__class__(cols, rows)
+        r = min(rows, self.nr_rows)
+        c = min(cols, self.nr_cols)
+        grid._grid[:r, :c] = self._grid[:r, :c]
+        grid._clipped = self._clipped or self._crops(cols, rows)
+        return grid
+
+    def snapshot(self):
+        """
+        Return a read-only view of the grid content as it is now, e.g. for a checkpoint.
+
+        The snapshot shares the buffer with this grid. On the first write to a row afterwards,
+        this grid saves the content of the row to the snapshot.
+        """
+        grid = ArrayGridSnapshot.__new__(ArrayGridSnapshot)
+        grid._base = self._grid
+        grid._saved = dict()
+        grid._source = weakref.ref(self)
+        grid._damaged = dict()
+        grid._clipped = self._clipped
+        self._snapshots.add(grid)
+        self._preserved = set()
+        return grid
+
+    def _crops(self, cols, rows):
+        """Return True if there is content outside the given dimensions."""
+        return bool(np.any(self._grid[rows:] != SPACE) or np.any(self._grid[:rows, cols:] != SPACE))
+
+    def _clip(self, c_start, r_start, c_end, r_end):
+        """Clip the start/end column and row values to the grid dimensions."""
+        c_start = max(c_start, 0)
+        r_start = max(r_start, 0)
+        c_end = min(c_end, self.nr_cols)
+        r_end = min(r_end, self.nr_rows)
+        return c_start, r_start, c_end, r_end
+
+    def erase(self):
+        """Erase all grid content."""
+        self._record(0, 0, self._grid, SPACE)
+        self._writable()
+        self._grid.fill(SPACE)
+        self.damage()
+
+    def rect(self, rect):
+        """
+        Return the content of the given rectangle.
+        :param rect: the canvas position (Pos) of the upper left corner (row, column) and bottom-right corner of the rectangle
+        :returns the content of the given rectangle
+        """
+        c_start, r_start, c_end, r_end = self._clip(*self.rect_to_rc(rect))
+        return [[chr(c) for c in row] for row in self._grid[r_start:r_end, c_start:c_end]]
+
+    def erase_rect(self, rect):
+        """
+        Erase a rectangle its content.
+        :param rect: rectangle upper-left corner and bottom-right corner (row, column) tuple
+        """
+        c_start, r_start, c_end, r_end = self._clip(*self.rect_to_rc(rect))
+        self._record(c_start, r_start, self._grid[r_start:r_end, c_start:c_end], SPACE)
+        self._writable(r_start, r_end)
+        self._grid[r_start:r_end, c_start:c_end] = SPACE
+        self.damage(c_start, r_start, c_end - c_start, r_end - r_start)
+
+    def fill_rect(self, pos, content):
+        """
+        Fill a rectangle.
+        :param pos: rectangle upper left corner (row, column) tuple
+        :param content: 2D array
+        """
+        self.blit(pos, content)
+
+    def blit(self, pos, content):
+        """
+        Copy a block of characters onto the grid.
+
+        Space characters are transparent, hex zero erases the underlying cell.
+        :param pos: upper left corner (col, row) of the block
+        :param content: list of rows, each row a string or a list of characters
+        """
+        if len(content) == 0:
+            return
+        width = max(len(row) for row in content)
+        if all(isinstance(row, str) and len(row) == width for row in content):
+            # a rectangular block of strings is converted at once
+            block = to_codes(''.join(content)).reshape(len(content), width)
+        else:
+            block = np.full((len(content), width), SPACE, dtype=np.uint32)
+            for r, row in enumerate(content):
+                block[r, :len(row)] = to_codes(row)
+
+        col, row = pos.xy
+        c_start, r_start, c_end, r_end = self._clip(col, row, col + width, row + len(content))
+        source = block[max(r_start - row, 0):max(r_end - row, 0), max(c_start - col, 0):max(c_end - col, 0)]
+        # characters outside the grid are lost
+        if np.count_nonzero((source != SPACE) & (source != ERASE)) < np.count_nonzero((block != SPACE) & (block != ERASE)):
+            self._clipped = True
+        if c_start >= c_end or r_start >= r_end:
+            return
+        values = np.where(source == ERASE, SPACE, source)
+        self._record(c_start, r_start, self._grid[r_start:r_end, c_start:c_end], values, where=(source != SPACE))
+        self._writable(r_start, r_end)
+        target = self._grid[r_start:r_end, c_start:c_end]
+        np.copyto(target, values, where=(source != SPACE))
+        self.damage(c_start, r_start, c_end - c_start, r_end - r_start)
+
+    def _remove_row(self, row):
+        if row >= 0 and row < self.nr_rows:
+            self._grid = np.delete(self._grid, row, axis=0)
+            self._detach()
+            self.damage(0, row)
+
+    def _remove_col(self, col):
+        if col >= 0 and col < self.nr_cols:
+            self._grid = np.delete(self._grid, col, axis=1)
+            self._detach()
+            self.damage(col, 0)
+
+    def _insert_row(self, row):
+        self._grid = np.insert(self._grid, min(row, self.nr_rows), SPACE, axis=0)
+        self._detach()
+        self.damage(0, row)
+
+    def _insert_col(self, col):
+        self._grid = np.insert(self._grid, min(col, self.nr_cols), SPACE, axis=1)
+        self._detach()
+        self.damage(col, 0)
+
+    def remove_row(self, row):
+        """Remove a row from the grid, without changing its dimensions."""
+        if row >= 0 and row < self.nr_rows:
+            self._writable(row)
+            self._grid[row:-1] = self._grid[row + 1:]
+            self._grid[-1] = SPACE
+            self.damage(0, row)
+
+    def remove_col(self, col):
+        """Remove a column from the grid, without changing its dimensions."""
+        if col >= 0 and col < self.nr_cols:
+            self._writable()
+            self._grid[:, col:-1] = self._grid[:, col + 1:]
+            self._grid[:, -1] = SPACE
+            self.damage(col, 0)
+
+    def insert_row(self, row):
+        """Insert a row to the grid, without changing its dimensions."""
+        if row >= 0 and row < self.nr_rows:
+            # the content of the bottom row is lost
+            if np.any(self._grid[-1] != SPACE):
+                self._clipped = True
+            self._writable(row)
+            self._grid[row + 1:] = self._grid[row:-1].copy()
+            self._grid[row] = SPACE
+            self.damage(0, row)
+
+    def insert_col(self, col):
+        """Insert a column to the grid, without changing its dimensions."""
+        if col >= 0 and col < self.nr_cols:
+            # the content of the rightmost column is lost
+            if np.any(self._grid[:, -1] != SPACE):
+                self._clipped = True
+            self._writable()
+            self._grid[:, col + 1:] = self._grid[:, col:-1].copy()
+            self._grid[:, col] = SPACE
+            self.damage(col, 0)
+
+
+class ArrayGridSnapshot(Snapshot, ArrayGrid):
+    """
+    Snapshot of an ArrayGrid.
+
+    The snapshot shares the buffer of the grid, the rows that the grid changed since are saved in the snapshot.
+    On the first read after such a change, the snapshot takes its content in a buffer of its own.
+    """
+
+    @property
+    def _grid(self):
+        if len(self._saved) > 0:
+            grid = self._base.copy()
+            for r, line in self._saved.items():
+                grid[r] = line
+            self._base = grid
+            self._saved = dict()
+            source = self._source()
+            if source is not None:
+                source._snapshots.discard(self)
+        return self._base
+
+    def copy(self, cols=None, rows=None):
+        grid = ArrayGrid.__new__(ArrayGrid)
+        grid._grid = self._grid.copy()
+        grid._snapshots = weakref.WeakSet()
+        grid._preserved = set()
+        grid._damaged = dict()
+        grid._clipped = self._clipped
+        return self._resized(grid, cols, rows)
+
+
+if __name__ == '__main__':
+    # benchmark of pasting and removing symbols, cell by cell and as one block (blit),
+    # e.g.: python -m application.array_grid 1000
+    import sys
+    import time
+    from application.pos import Pos
+    from application.sparse_grid import SparseGrid
+    from application.symbol import Rect, Line, Text
+
+    def cell_by_cell(symbol, grid, erase=False):
+        x0, y0 = symbol.startpos.xy
+        for col, row, value in symbol._relative_repr():
+            grid.set_cell(Pos(x0 + col, y0 + row), CELL_ERASE if erase else value)
+
+    nr_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cols, rows = 400, 300
+    symbols = []
+    for i in range(nr_symbols):
+        x, y = (i * 7) % (cols - 40), (i * 5) % (rows - 20)
+        symbols.append(Rect(Pos(x, y), Pos(x + 30, y + 15)))
+        symbols.append(Line(Pos(x, y + 3), Pos(x + 35, y + 3), Line.LINE1))
+        symbols.append(Text(Pos(x + 2, y + 2), "hello world"))
+    for engine in (Grid, ArrayGrid, SparseGrid):
+        elapsed = []
+        for paste, remove in ((cell_by_cell, lambda symbol, grid: cell_by_cell(symbol, grid, erase=True)),
+                              (lambda symbol, grid: symbol.paste(grid), lambda symbol, grid: symbol.remove(grid))):
+            grid = engine(cols, rows)
+            start = time.perf_counter()
+            for symbol in symbols:
+                paste(symbol, grid)
+            for symbol in symbols:
+                remove(symbol, grid)
+            elapsed.append(time.perf_counter() - start)
+        print("{0}: {1} symbols pasted and removed, cell by cell in {2:.3f} s, as block in {3:.3f} s ({4:.1f}x)".format(
+              engine.__name__, len(symbols), elapsed[0], elapsed[1], elapsed[0] / elapsed[1]))
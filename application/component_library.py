@@ -6,21 +6,29 @@ component_library.py
 
 import json
 import locale
+import pickle
 from pubsub import pub
 from pathlib import Path
 from collections import OrderedDict
 
 from application import gettext as _
 from application import ERROR
-from application import get_path_to_data
-from application.symbol import Symbol
+from application import get_path_to_data, get_path_to_prefs
+from application.symbol import Symbol, compose_variants
 
 
 class ComponentLibrary(object):
+    """
+    The component library.
+
+    :param cache_file: the compiled library cache, by default next to the preferences file
+    """
 
     ORIENTATION = ('N', 'E', 'S', 'W')
+    # to be incremented when the cache content changes
+    CACHE_VERSION = 1
 
-    def __init__(self):
+    def __init__(self, cache_file=None):
         self._libraries = []
 
         default_lib = 'component_en.json'
@@ -44,21 +52,110 @@ class ComponentLibrary(object):
             if check.is_file():
                 self._libraries.append(user_lib)
 
-        self._components = {}
+        if cache_file is None:
+            self._cache_file = get_path_to_prefs().with_name('aacircuit_components.cache')
+        else:
+            self._cache_file = Path(cache_file)
+        # parsed library files, by file name
+        self._cache = None
+
+        # the libraries are parsed lazily, in order, up to the one with the requested component
+        self._pending = list(self._libraries)
+        # components loaded so far, by name
+        self._loaded = {}
+        # all components ordered by id, once all libraries are loaded
+        self._components = None
+        # component id to name index
+        self._by_id = dict()
+        # the orientation/mirror variants, per component name, shared by the symbol instances
+        self._variants = dict()
+
+        self._key = None
+        self._dir = None
+
+    def _sources(self):
+        """Return the cache header: the cache version and the name, modification time and size of the library files."""
+        sources = [self.CACHE_VERSION]
+        for lib in self._libraries:
+            try:
+                stat = Path(get_path_to_data('components/' + lib)).stat()
+                sources.append((lib, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                sources.append((lib, None, None))
+        return sources
+
+    def _read_cache(self):
+        """Return the parsed library files from the cache, or None if the cache is absent or out of date."""
+        try:
+            with open(self._cache_file, 'rb') as f:
+                # the header is unpickled first, the content only if the cache is up to date
+                if pickle.load(f) != self._sources():
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # absent or unreadable, the cache is compiled again
+            return None
+
+    def _compile_cache(self):
+        """Parse the library files and (re)write the cache."""
+        sources = self._sources()
+        libraries = dict()
+        complete = True
         for lib in self._libraries:
             try:
                 f = open(get_path_to_data('components/' + lib), "r")
-                self._components.update(json.load(f))
+                libraries[lib] = json.load(f)
                 f.close()
             except IOError as e:
                 msg = _("Failed to load component library {0} due to I/O error {1}: {2}").format(lib, e.errno, e.strerror)
                 pub.sendMessage('STATUS_MESSAGE', msg=msg, type=ERROR)
                 print(msg)
+                complete = False
+        # do not cache an incomplete library
+        if not complete:
+            return libraries
+        try:
+            with open(self._cache_file, 'wb') as f:
+                pickle.dump(sources, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(libraries, f, pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(_("Unable to write the component library cache {0}: {1}").format(self._cache_file, e.strerror))
+        return libraries
+
+    def _load_library(self, lib):
+        """Add the components of a library file to the indexes."""
+        if self._cache is None:
+            self._cache = self._read_cache()
+            if self._cache is None:
+                self._cache = self._compile_cache()
+        components = self._cache.get(lib)
+        if components is None:
+            return
+
+        for label, symbol in components.items():
+            # a component in a later library replaces the one with the same name
+            previous = self._loaded.get(label)
+            if previous is not None and self._by_id.get(previous['id']) == label:
+                del self._by_id[previous['id']]
+            self._loaded[label] = symbol
+            self._by_id.setdefault(symbol['id'], label)
+            self._variants[label] = compose_variants(symbol['grid'])
+
+    def _load_next(self):
+        """Load the next library, return False if all libraries have been loaded."""
+        if len(self._pending) == 0:
+            return False
+        self._load_library(self._pending.pop(0))
+        return True
+
+    def _load_all(self):
+        while self._load_next():
+            pass
 
         # check component id's
-        if len(self._components) > 0:
+        if len(self._loaded) > 0:
             ids = set()
-            for label, symbol in self._components.items():
+            for label, symbol in self._loaded.items():
                 id = symbol['id']
                 if id in ids:
                     msg = _("Symbol: {} has duplicate id: {} !").format(label, id)
@@ -66,13 +163,30 @@ class ComponentLibrary(object):
                 else:
                     ids.add(id)
         # order by id
-        self._components = OrderedDict(sorted(self._components.items(), key=lambda t: t[1]['id']))
+        self._components = OrderedDict(sorted(self._loaded.items(), key=lambda t: t[1]['id']))
 
-        self._key = None
-        self._dir = None
+        # with duplicate id's, the first one in order is found
+        self._by_id = dict()
+        for label, symbol in self._components.items():
+            self._by_id.setdefault(symbol['id'], label)
+
+    def _component(self, key):
+        """Return the component with the given name, loading the libraries up to the one containing it."""
+        while key not in self._loaded and self._load_next():
+            pass
+        return self._loaded[key]
+
+    def _label(self, id):
+        """Return the name of the component with the given id (or None), loading libraries as needed."""
+        label = self._by_id.get(id)
+        while label is None and self._load_next():
+            label = self._by_id.get(id)
+        return label
 
     @property
     def components(self):
+        if self._components is None:
+            self._load_all()
         return self._components
 
     def get_id(self, key):
@@ -86,7 +200,7 @@ class ComponentLibrary(object):
             # single character id is its (decimal) ASCII value
             id = ord(key)
         else:
-            id = self._components[key]['id']
+            id = self._component(key)['id']
 
         return id
 
@@ -103,7 +217,7 @@ class ComponentLibrary(object):
             # the single character grid is simply the character itself
             grid = [[key]]
         else:
-            grid = self._components[key]['grid']
+            grid = self._component(key)['grid']
 
         return grid
 
@@ -116,7 +230,7 @@ class ComponentLibrary(object):
         """
         grid = self.get_grid(key)
         id = self.get_id(key)
-        symbol = Symbol(id, grid)
+        symbol = Symbol(id, grid, variants=self._variants.get(key))
 
         return symbol
 
@@ -127,20 +241,15 @@ class ComponentLibrary(object):
         :param key: the component name
         :returns the symbol
         """
-        found = None
-        for label, symbol in self._components.items():
-            if symbol['id'] == id:
-                found = symbol['id']
-                grid = symbol['grid']
-                break
-
-        if found:
-            return Symbol(id=found, grid=grid)
+        label = self._label(id)
+        if label:
+            symbol = self._loaded[label]
+            return Symbol(id=symbol['id'], grid=symbol['grid'], variants=self._variants[label])
         else:
             return Symbol()
 
     def nr_components(self):
-        return len(self._components)
+        return len(self.components)
 
     def nr_libraries(self):
         return len(self._libraries)
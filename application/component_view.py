@@ -8,7 +8,7 @@ from application import gettext as _
 
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk  # noqa: E402
+from gi.repository import Gtk, GLib  # noqa: E402
 
 
 class ComponentView():
@@ -22,6 +22,9 @@ class ComponentView():
         self.listmodel = builder.get_object('liststore1')
         view = builder.get_object('treeview1')
         view.get_selection().connect('changed', self.on_changed)
+        # the component list is requested when it is first shown, not at startup
+        self._view = view
+        self._map_handler = view.connect('map', self.on_map)
 
         self.columns = [_('Description')]
         for i, column in enumerate(self.columns):
@@ -34,6 +37,15 @@ class ComponentView():
 
         pub.subscribe(self.set_components, 'ALL_COMPONENTS')
 
+    def on_map(self, widget):
+        self._view.disconnect(self._map_handler)
+        # after the window is drawn, listing all components loads all libraries
+        GLib.idle_add(self.request_components)
+
+    def request_components(self):
+        pub.sendMessage('LIST_COMPONENTS')
+        return False
+
     def set_components(self, list):
         for label in list:
             self.listmodel.append((label,))
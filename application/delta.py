@@ -0,0 +1,84 @@
+"""
+AACircuit
+2020-03-02 JvO
+
+Grid deltas, the cell changes of an edit action to undo and redo it exactly.
+"""
+
+import array
+
+from application import CELL_EMPTY, CELL_ERASE
+from application.pos import Pos
+
+
+class Delta(object):
+    """
+    The grid cells changed by an edit action.
+
+    The changes are recorded in order, packed in arrays: the cell position (col, row)
+    and the character code before and after the change.
+    A row or column insertion/removal is recorded as its symbol, the cells it pushes off the grid as changes.
+    """
+
+    # approximate size (bytes) of an empty delta
+    OVERHEAD = 200
+
+    def __init__(self):
+        self._cols = array.array('i')
+        self._rows = array.array('i')
+        self._old = array.array('I')
+        self._new = array.array('I')
+        # (symbol, pasted): the row or column symbol, True if it was pasted and False if it was removed
+        self.structure = None
+
+    def __len__(self):
+        return len(self._cols)
+
+    @property
+    def nbytes(self):
+        """Return the (approximate) memory size."""
+        return self.OVERHEAD + sum(a.itemsize * len(a) for a in (self._cols, self._rows, self._old, self._new))
+
+    def record(self, col, row, old, new):
+        """Record the change of a cell, the characters are those as stored in the grid."""
+        self._cols.append(col)
+        self._rows.append(row)
+        self._old.append(ord(old))
+        self._new.append(ord(new))
+
+    def extend(self, delta):
+        """Append the cell changes of another delta, e.g. of the next action in a transaction."""
+        self._cols.extend(delta._cols)
+        self._rows.extend(delta._rows)
+        self._old.extend(delta._old)
+        self._new.extend(delta._new)
+
+    @staticmethod
+    def _set(grid, col, row, code):
+        value = chr(code)
+        if value == CELL_EMPTY:
+            # (space) characters are 'transparent'
+            value = CELL_ERASE
+        grid.set_cell(Pos(col, row), value)
+
+    def undo(self, grid):
+        """Restore the cells as they were before the action."""
+        if self.structure is not None:
+            symbol, pasted = self.structure
+            if pasted:
+                symbol.remove(grid)
+            else:
+                symbol.paste(grid)
+        for i in range(len(self._cols) - 1, -1, -1):
+            self._set(grid, self._cols[i], self._rows[i], self._old[i])
+
+    def redo(self, grid):
+        """Change the cells again as the action did."""
+        for i in range(len(self._cols)):
+            self._set(grid, self._cols[i], self._rows[i], self._new[i])
+        if self.structure is not None:
+            symbol, pasted = self.structure
+            if pasted:
+                symbol.paste(grid)
+            else:
+                symbol.remove(grid)
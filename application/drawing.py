@@ -0,0 +1,249 @@
+"""
+AACircuit
+2020-03-02 JvO
+
+Drawing of the grid content with Cairo, without GUI (Gtk) dependencies.
+"""
+
+import cairo
+from pubsub import pub
+
+from application import CELL_DEFAULT
+from application.preferences import Preferences
+
+# PDF page size (portrait) and scale
+PDF_PAGE = (560, 784)
+PDF_SCALE = 0.5
+
+# character -> glyph index in the monospace font
+_glyph_indices = dict()
+
+
+def glyph_index(ctx, char):
+    """
+    Return the index of the glyph for the character in the (monospace) font of the context.
+    :returns the glyph index, or None if the character does not map to a single glyph
+    """
+    try:
+        return _glyph_indices[char]
+    except KeyError:
+        glyphs = ctx.get_scaled_font().text_to_glyphs(0, 0, char, False)
+        if len(glyphs) == 1:
+            index = glyphs[0].index
+        else:
+            index = None
+        _glyph_indices[char] = index
+        return index
+
+
+def invalidate_glyphs():
+    """Invalidate the cached glyph indices, e.g. as the font changed."""
+    _glyph_indices.clear()
+
+
+def draw_content(ctx, grid, rect=None):
+    """
+    Draw the grid content.
+
+    The characters of a row are drawn with a single show_glyphs call, blank cells are skipped.
+    :param ctx: the Cairo context
+    :param grid: the grid
+    :param rect: (col, row, cols, rows) to draw this part of the grid only
+    """
+    if rect is None:
+        rect = (0, 0, grid.nr_cols, grid.nr_rows)
+    col, row, cols, rows = rect
+    ctx.set_source_rgb(0.1, 0.1, 0.1)
+    if Preferences.values['PANGO_FONT']:
+        draw_content_pango(ctx, grid, rect)
+        return
+    font_size = Preferences.values['FONTSIZE']
+    grid_w = Preferences.values['GRIDSIZE_W']
+    grid_h = Preferences.values['GRIDSIZE_H']
+    ctx.set_font_size(font_size)
+    ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+    c_end = min(col + cols, grid.nr_cols)
+    r_end = min(row + rows, grid.nr_rows)
+    for r in range(row, r_end):
+        # the Cairo text glyph origin is its left-bottom corner
+        y = r * grid_h + font_size
+        glyphs = []
+        for c, char in enumerate(grid.row(r)[col:c_end], col):
+            if char == CELL_DEFAULT:
+                continue
+            index = glyph_index(ctx, char)
+            if index is None:
+                ctx.move_to(c * grid_w, y)
+                ctx.show_text(char)
+            else:
+                glyphs.append(cairo.Glyph(index, c * grid_w, y))
+        if len(glyphs) > 0:
+            ctx.show_glyphs(glyphs)
+
+
+def draw_content_pango(ctx, grid, rect):
+    """Draw the grid content with the Pango font, cell by cell."""
+    # imported here, Pango is only needed for this (preference) setting
+    import gi
+    gi.require_version('PangoCairo', '1.0')
+    from gi.repository import Pango, PangoCairo
+    col, row, cols, rows = rect
+    # https://sites.google.com/site/randomcodecollections/home/python-gtk-3-pango-cairo-example
+    # https://developer.gnome.org/pango/stable/pango-Cairo-Rendering.html
+    layout = PangoCairo.create_layout(ctx)
+    desc = Pango.font_description_from_string(Preferences.values['FONT'])
+    layout.set_font_description(desc)
+    grid_w = Preferences.values['GRIDSIZE_W']
+    grid_h = Preferences.values['GRIDSIZE_H']
+    c_end = min(col + cols, grid.nr_cols)
+    r_end = min(row + rows, grid.nr_rows)
+    for r in range(row, r_end):
+        for c, char in enumerate(grid.row(r)[col:c_end], col):
+            if char == CELL_DEFAULT:
+                continue
+            ctx.move_to(c * grid_w, r * grid_h)
+            layout.set_text(char, -1)
+            PangoCairo.show_layout(ctx, layout)
+
+
+class GlyphAtlas(object):
+    """
+    Image of all characters drawn so far, at the current font and grid cell size.
+
+    A cell is painted by copying the image of its character from the atlas, instead of rendering its glyph.
+    The atlas is rebuilt when the font or grid cell size preferences change.
+    """
+
+    # number of character slots per atlas row
+    COLS = 32
+    # margin (pixels) around a slot, for a glyph that extends beyond its cell
+    MARGIN = 4
+
+    def __init__(self):
+        self._key = None
+        self._surface = None
+        # character -> (x, y) position of its slot in the atlas
+        self._slots = dict()
+
+    @property
+    def nr_glyphs(self):
+        return len(self._slots)
+
+    def clear(self):
+        self._key = None
+        self._surface = None
+        self._slots = dict()
+
+    def _font_key(self):
+        values = Preferences.values
+        return (values['PANGO_FONT'], values['FONT'], values['FONTSIZE'], values['GRIDSIZE_W'], values['GRIDSIZE_H'])
+
+    def _slot_size(self):
+        w = Preferences.values['GRIDSIZE_W'] + 2 * self.MARGIN
+        h = Preferences.values['GRIDSIZE_H'] + 2 * self.MARGIN
+        return w, h
+
+    def _grow(self):
+        """Allocate an atlas with (twice) as many slot rows, and copy the current content."""
+        w, h = self._slot_size()
+        if self._surface is None:
+            nr_rows = 4
+        else:
+            nr_rows = 2 * (self._surface.get_height() // h)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.COLS * w, nr_rows * h)
+        if self._surface is not None:
+            ctx = cairo.Context(surface)
+            ctx.set_source_surface(self._surface, 0, 0)
+            ctx.paint()
+        self._surface = surface
+
+    def _render(self, char, x, y):
+        """Render the character at the given position (the upper-left corner of its cell) in the atlas."""
+        ctx = cairo.Context(self._surface)
+        ctx.set_source_rgb(0.1, 0.1, 0.1)
+        if Preferences.values['PANGO_FONT']:
+            # imported here, Pango is only needed for this (preference) setting
+            import gi
+            gi.require_version('PangoCairo', '1.0')
+            from gi.repository import Pango, PangoCairo
+            layout = PangoCairo.create_layout(ctx)
+            desc = Pango.font_description_from_string(Preferences.values['FONT'])
+            layout.set_font_description(desc)
+            ctx.move_to(x, y)
+            layout.set_text(char, -1)
+            PangoCairo.show_layout(ctx, layout)
+        else:
+            ctx.set_font_size(Preferences.values['FONTSIZE'])
+            ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+            # the Cairo text glyph origin is its left-bottom corner
+            ctx.move_to(x, y + Preferences.values['FONTSIZE'])
+            ctx.show_text(char)
+
+    def slot(self, char):
+        """Return the position of the character image in the atlas, the character is rendered on first use."""
+        key = self._font_key()
+        if key != self._key:
+            self.clear()
+            self._key = key
+        try:
+            return self._slots[char]
+        except KeyError:
+            pass
+        w, h = self._slot_size()
+        row, col = divmod(len(self._slots), self.COLS)
+        if self._surface is None or (row + 1) * h > self._surface.get_height():
+            self._grow()
+        pos = (col * w, row * h)
+        self._render(char, pos[0] + self.MARGIN, pos[1] + self.MARGIN)
+        self._slots[char] = pos
+        return pos
+
+    def draw_content(self, ctx, grid, rect=None):
+        """
+        Draw the grid content, by copying the character images from the atlas.
+        :param ctx: the Cairo context
+        :param grid: the grid
+        :param rect: (col, row, cols, rows) to draw this part of the grid only
+        """
+        if rect is None:
+            rect = (0, 0, grid.nr_cols, grid.nr_rows)
+        col, row, cols, rows = rect
+        grid_w = Preferences.values['GRIDSIZE_W']
+        grid_h = Preferences.values['GRIDSIZE_H']
+        w, h = self._slot_size()
+        c_end = min(col + cols, grid.nr_cols)
+        r_end = min(row + rows, grid.nr_rows)
+        for r in range(row, r_end):
+            y = r * grid_h - self.MARGIN
+            for c, char in enumerate(grid.row(r)[col:c_end], col):
+                if char == CELL_DEFAULT:
+                    continue
+                sx, sy = self.slot(char)
+                x = c * grid_w - self.MARGIN
+                ctx.set_source_surface(self._surface, x - sx, y - sy)
+                ctx.rectangle(x, y, w, h)
+                ctx.fill()
+
+
+def write_pdf(grid, filename):
+    """Write the grid content to a (single page) PDF file."""
+    # FIXME Set Portrait or Landscape dimensions based upon prefs or printer settings
+    w, h = PDF_PAGE
+    surface = cairo.PDFSurface(filename, w, h)
+    ctx = cairo.Context(surface)
+    ctx.scale(PDF_SCALE, PDF_SCALE)
+    draw_content(ctx, grid)
+    surface.finish()
+
+
+def write_svg(grid, filename):
+    """Write the grid content to a SVG file, with the size of the grid."""
+    w = grid.nr_cols * Preferences.values['GRIDSIZE_W']
+    h = grid.nr_rows * Preferences.values['GRIDSIZE_H']
+    surface = cairo.SVGSurface(filename, w, h)
+    ctx = cairo.Context(surface)
+    draw_content(ctx, grid)
+    surface.finish()
+
+
+pub.subscribe(invalidate_glyphs, 'SAVE_PREFERENCES')
@@ -5,14 +5,25 @@ AACircuit
 2020-03-02 JvO
 """
 
+from pubsub import pub
 from gettext import gettext as _
 from application import CELL_DEFAULT, CELL_EMPTY, CELL_NEW, CELL_ERASE
 
 
 class Grid(object):
 
+    # True: flush_damage keeps the damage administration, e.g. during a bulk load
+    hold_damage = False
+    # Delta that records the cells changed by set_cell, e.g. for undo
+    journal = None
+
     def __init__(self, cols=5, rows=5):
         self._grid = [[CELL_DEFAULT] * cols for i in range(rows)]
+        # the rows that are shared with a snapshot, by id(), see snapshot()
+        self._shared = dict()
+        # changed cells, per row the span of (start, end) columns
+        self._damaged = dict()
+        self._clipped = False
 
     def __str__(self):
         str = _("number of rows: {0} columns: {1}\n").format(self.nr_rows, self.nr_cols)
@@ -28,6 +39,14 @@ class Grid(object):
     def nr_rows(self):
         return len(self._grid)
 
+    @property
+    def clipped(self):
+        """
+        True if content has been drawn outside the grid, or at a wrapped-around (negative) position.
+        The content then depends on the grid dimensions.
+        """
+        return self._clipped
+
     @property
     def nr_cols(self):
         return len(self._grid[0])
@@ -41,36 +60,226 @@ class Grid(object):
             column.append(r[col])
         return column
 
-    def content_as_str(self):
-        content = ""
+    def _raw_lines(self):
+        """Generate the grid rows as strings."""
         for r in self._grid:
-            line = ""
-            for c in r:
-                line += c
-            content += (line + "\n")
+            yield "".join(r)
+
+    def lines(self, strip=False):
+        """
+        Generate the grid content, one string per row.
+        :param strip: True to strip the trailing blanks of each row and the trailing blank rows
+        """
+        if not strip:
+            yield from self._raw_lines()
+            return
+        blank_rows = 0
+        for line in self._raw_lines():
+            line = line.rstrip(CELL_DEFAULT)
+            if len(line) == 0:
+                # postpone blank rows until we know they are not trailing
+                blank_rows += 1
+                continue
+            for i in range(blank_rows):
+                yield ""
+            blank_rows = 0
+            yield line
+
+    def content_as_str(self, strip=False):
+        content = "".join(line + "\n" for line in self.lines(strip))
         content += _("(created by AACircuit.py © 2020 JvO)")
         return content
 
+    def write_to(self, fileobj, strip=False):
+        """
+        Write the grid content as text, row by row, to the given file object.
+        :param strip: True to strip the trailing blanks of each row and the trailing blank rows
+        """
+        for line in self.lines(strip):
+            fileobj.write(line + "\n")
+        fileobj.write(_("(created by AACircuit.py © 2020 JvO)"))
+
     # grid manipulation
 
+    def _writable_row(self, row):
+        """
+        Return a row to write to, a row that is shared with a snapshot is copied first.
+
+        All changes of the row content go through here. The shared rows are kept (not only their id)
+        so that an id cannot be reused by another row.
+        """
+        line = self._grid[row]
+        if id(line) in self._shared:
+            del self._shared[id(line)]
+            line = list(line)
+            self._grid[row] = line
+        return line
+
+    def _lost(self, value):
+        """Register a character that is drawn outside the grid."""
+        if value != ' ' and value != CELL_ERASE:
+            self._clipped = True
+
     def cell(self, pos):
         col, row = pos.xy
         # TODO return space or x00?
         if row < self.nr_rows and col < self.nr_cols:
+            # a negative position wraps around
             return self._grid[row][col]
         else:
             return ' '
 
+    def neighbourhood(self, pos):
+        """
+        Return the 3x3 block of cells around a position, e.g. to match a line end against its surroundings.
+        :param pos: the position (col, row) of the center cell
+        :returns list of the 9 cells, row by row, as read by cell()
+        """
+        col, row = pos.xy
+        nr_cols = self.nr_cols
+        cells = []
+        for r in (row - 1, row, row + 1):
+            if r >= self.nr_rows:
+                cells.extend(' ' * 3)
+                continue
+            line = self._grid[r]
+            for c in (col - 1, col, col + 1):
+                if c < nr_cols:
+                    # a negative position wraps around
+                    cells.append(line[c])
+                else:
+                    cells.append(' ')
+        return cells
+
     def set_cell(self, pos, value):
         row = pos.y
         col = pos.x
         if row < self.nr_rows and col < self.nr_cols:
+            # a negative position wraps around
+            if row < 0 or col < 0:
+                self._lost(value)
             # hex zero 'erases' content
             if value == CELL_ERASE:
-                self._grid[row][col] = CELL_EMPTY
+                value = CELL_EMPTY
             # space character is 'transparent'
-            elif value != ' ':
-                self._grid[row][col] = value
+            elif value == ' ':
+                return
+            if self._grid[row][col] != value:
+                if self.journal is not None:
+                    self.journal.record(col % self.nr_cols, row % self.nr_rows, self._grid[row][col], value)
+                self._writable_row(row)[col] = value
+                self.damage_cell(col, row)
+        else:
+            self._lost(value)
+
+    def copy(self, cols=None, rows=None):
+        """
+        Return a copy of the grid, optionally with other dimensions.
+
+        The content is copied from the upper left corner, cropped or padded with empty cells.
+        :param cols, rows: the dimensions of the copy, default the dimensions of this grid
+        """
+        if cols is None:
+            cols = self.nr_cols
+        if rows is None:
+            rows = self.nr_rows
+        grid = self.__class__(cols, rows)
+        for r, line in enumerate(self._grid[:rows]):
+            grid._grid[r][:min(cols, len(line))] = line[:cols]
+        grid._clipped = self._clipped or self._crops(cols, rows)
+        return grid
+
+    def snapshot(self):
+        """
+        Return a read-only view of the grid content as it is now, e.g. for a checkpoint.
+
+        The snapshot shares the rows with this grid, no content is copied. This grid copies
+        a shared row on its first write to it.
+        """
+        grid = GridSnapshot.__new__(GridSnapshot)
+        grid._grid = list(self._grid)
+        grid._shared = dict()
+        grid._damaged = dict()
+        grid._clipped = self._clipped
+        self._shared = dict(zip(map(id, self._grid), self._grid))
+        return grid
+
+    def _crops(self, cols, rows):
+        """Return True if there is content outside the given dimensions."""
+        for r in range(self.nr_rows):
+            start = 0 if r >= rows else cols
+            for char in self.row(r)[start:]:
+                if char != CELL_DEFAULT:
+                    return True
+        return False
+
+    # damage tracking
+
+    def damage_cell(self, col, row):
+        """Mark a single cell as changed."""
+        if col < 0:
+            col += self.nr_cols
+        if row < 0:
+            row += self.nr_rows
+        span = self._damaged.get(row)
+        if span is None:
+            self._damaged[row] = [col, col + 1]
+        elif col < span[0]:
+            span[0] = col
+        elif col >= span[1]:
+            span[1] = col + 1
+
+    def damage(self, col=0, row=0, cols=None, rows=None):
+        """
+        Mark a rectangle of cells as changed.
+        :param col, row: upper left corner of the rectangle, default the upper left corner of the grid
+        :param cols, rows: rectangle size, default up to the right and bottom side of the grid
+        """
+        c_end = self.nr_cols if cols is None else min(col + cols, self.nr_cols)
+        r_end = self.nr_rows if rows is None else min(row + rows, self.nr_rows)
+        col = max(col, 0)
+        if col >= c_end:
+            return
+        for r in range(max(row, 0), r_end):
+            span = self._damaged.get(r)
+            if span is None:
+                self._damaged[r] = [col, c_end]
+            else:
+                span[0] = min(span[0], col)
+                span[1] = max(span[1], c_end)
+
+    @property
+    def is_damaged(self):
+        return len(self._damaged) > 0
+
+    def damaged_rects(self):
+        """
+        Return the changed cells as rectangles.
+        Consecutive rows with the same span of columns are coalesced into one rectangle.
+        :returns list of (col, row, cols, rows) tuples
+        """
+        rects = []
+        for row in sorted(self._damaged):
+            # the grid dimensions may have changed in the meantime
+            if row >= self.nr_rows:
+                break
+            c_start, c_end = self._damaged[row]
+            c_end = min(c_end, self.nr_cols)
+            if len(rects) > 0:
+                last = rects[-1]
+                if last[0] == c_start and last[0] + last[2] == c_end and last[1] + last[3] == row:
+                    last[3] += 1
+                    continue
+            rects.append([c_start, row, c_end - c_start, 1])
+        return [tuple(rect) for rect in rects]
+
+    def flush_damage(self):
+        """Publish the changed cells (if any) and reset the damage administration."""
+        if self.hold_damage or not self.is_damaged:
+            return
+        rects = self.damaged_rects()
+        self._damaged = dict()
+        pub.sendMessage('GRID_DAMAGED', rects=rects)
 
     def rect_to_rc(self, rect):
         """Convert the rect to colum and row start/end values.
@@ -88,7 +297,14 @@ class Grid(object):
         """Erase all grid content."""
         rows = self.nr_rows
         cols = self.nr_cols
+        if self.journal is not None:
+            for r, line in enumerate(self._grid):
+                for c, value in enumerate(line):
+                    if value != CELL_DEFAULT:
+                        self.journal.record(c, r, value, CELL_DEFAULT)
         self._grid = [[CELL_DEFAULT] * cols for i in range(rows)]
+        self._shared = dict()
+        self.damage()
 
     def rect(self, rect):
         """
@@ -125,8 +341,12 @@ class Grid(object):
             r_end = self.nr_cols
 
         for r in range(r_start, r_end):
+            line = self._writable_row(r)
             for c in range(c_start, c_end):
-                self._grid[r][c] = CELL_EMPTY
+                if self.journal is not None and line[c] != CELL_EMPTY:
+                    self.journal.record(c, r, line[c], CELL_EMPTY)
+                line[c] = CELL_EMPTY
+        self.damage(c_start, r_start, c_end - c_start, r_end - r_start)
 
     def fill_rect(self, pos, content):
         """
@@ -146,10 +366,16 @@ class Grid(object):
             for char in row:
                 # hex zero 'erases' content
                 if char == CELL_ERASE:
-                    self._grid[y][x] = CELL_EMPTY
+                    char = CELL_EMPTY
                 # space character is 'transparent'
-                elif char != ' ':
-                    self._grid[y][x] = char
+                elif char == ' ':
+                    char = None
+                if char is not None:
+                    line = self._writable_row(y)
+                    if self.journal is not None and line[x] != char:
+                        self.journal.record(x, y, line[x], char)
+                    line[x] = char
+                    self.damage_cell(x, y)
                 x += 1
                 if x >= x_max:
                     break
@@ -157,23 +383,59 @@ class Grid(object):
             if y >= y_max:
                 break
 
+    def blit(self, pos, content):
+        """
+        Copy a block of characters onto the grid.
+
+        Space characters are transparent, hex zero erases the underlying cell.
+        :param pos: upper left corner (col, row) of the block
+        :param content: list of rows, each row a string or a list of characters
+        """
+        c_start, r_start = pos.xy
+        for y, row in enumerate(content, r_start):
+            if y < 0 or y >= self.nr_rows:
+                for char in row:
+                    self._lost(char)
+                continue
+            line = self._writable_row(y)
+            for x, char in enumerate(row, c_start):
+                if x < 0 or x >= self.nr_cols:
+                    self._lost(char)
+                    continue
+                # hex zero 'erases' content
+                if char == CELL_ERASE:
+                    char = CELL_EMPTY
+                # space character is 'transparent'
+                elif char == ' ':
+                    continue
+                if line[x] != char:
+                    if self.journal is not None:
+                        self.journal.record(x, y, line[x], char)
+                    line[x] = char
+                    self.damage_cell(x, y)
+
     def _remove_row(self, row):
         # assert row >= 0 and row < self.nr_rows
         if row >= 0 and row < self.nr_rows:
+            self._shared.pop(id(self._grid[row]), None)
             del self._grid[row]
+            self.damage(0, row)
 
     def _remove_col(self, col):
         # assert col >= 0 and col < self.nr_cols
         if col >= 0 and col < self.nr_cols:
-            for r in self._grid:
-                del r[col]
+            for r in range(self.nr_rows):
+                del self._writable_row(r)[col]
+            self.damage(col, 0)
 
     def _insert_row(self, row):
         self._grid.insert(row, [CELL_NEW] * self.nr_cols)
+        self.damage(0, row)
 
     def _insert_col(self, col):
-        for r in self._grid:
-            r.insert(col, CELL_NEW)
+        for r in range(self.nr_rows):
+            self._writable_row(r).insert(col, CELL_NEW)
+        self.damage(col, 0)
 
     def remove_row(self, row):
         """Remove a row from the grid, without changing its dimensions."""
@@ -189,12 +451,59 @@ class Grid(object):
 
     def insert_row(self, row):
         """Remove a row from the grid, without changing its dimensions."""
+        # the content of the bottom row is lost
+        if row < self.nr_rows and any(char != CELL_DEFAULT for char in self._grid[-1]):
+            self._clipped = True
         self._insert_row(row)
         # maintain dimensions by removing the bottom row
         self._remove_row(self.nr_rows - 1)
 
     def insert_col(self, col):
         """Insert a column to the grid, without changing its dimensions."""
+        # the content of the rightmost column is lost
+        if col < self.nr_cols and any(r[-1] != CELL_DEFAULT for r in self._grid):
+            self._clipped = True
         self._insert_col(col)
         # maintain the grid dimensions by removing the rightmost column
         self._remove_col(self.nr_cols - 1)
+
+
+class Snapshot(object):
+    """
+    Read-only view of the content of a grid, see Grid.snapshot().
+
+    The changes of the content are rejected, the copy() of a snapshot is a (writable) grid.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(_("A grid snapshot is read-only"))
+
+    set_cell = blit = fill_rect = erase = erase_rect = _read_only
+    remove_row = remove_col = insert_row = insert_col = _read_only
+    _remove_row = _remove_col = _insert_row = _insert_col = _read_only
+
+    def snapshot(self):
+        return self
+
+    def _resized(self, grid, cols=None, rows=None):
+        """
+        Return the copy of the snapshot content, optionally with other dimensions.
+        :param grid: (writable) grid with the content of the snapshot, with the same dimensions
+        :param cols, rows: the dimensions of the copy, default the dimensions of the snapshot
+        """
+        if (cols is None or cols == self.nr_cols) and (rows is None or rows == self.nr_rows):
+            return grid
+        return grid.copy(cols, rows)
+
+
+class GridSnapshot(Snapshot, Grid):
+    """Snapshot of a Grid, that shares its rows with the grid."""
+
+    def copy(self, cols=None, rows=None):
+        # the rows are shared, the grid copies a row on its first write to it
+        grid = Grid.__new__(Grid)
+        grid._grid = list(self._grid)
+        grid._shared = dict(zip(map(id, self._grid), self._grid))
+        grid._damaged = dict()
+        grid._clipped = self._clipped
+        return self._resized(grid, cols, rows)
@@ -3,8 +3,9 @@ AACircuit
 2020-03-02 JvO
 """
 
+import math
 import cairo
-import time
+import collections
 from pubsub import pub
 
 from gettext import gettext as _
@@ -16,6 +17,7 @@ from application import TEXT, TEXT_BLOCK
 from application.pos import Pos
 from application.symbol import Text, Line, MagLine, DirLine, Rect, Arrow
 from application.preferences import Preferences
+from application import drawing
 from application.selection import Selection, SelectionCol, SelectionRow, SelectionRect, SelectionArrow, SelectionObject, SelectionEraser
 
 import gi
@@ -23,8 +25,12 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib  # noqa: E402
 
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Pango, PangoCairo  # noqa: E402
+# size (pixels) of a backing store tile
+TILE = 256
+# minimum number of tiles kept, the store is sized to twice the (largest) visible part of the canvas
+MIN_TILES = 16
+# interval (ms) of the cursor blink
+CURSOR_BLINK = 500
 
 
 class GridView(Gtk.DrawingArea):
@@ -32,13 +38,27 @@ class GridView(Gtk.DrawingArea):
     def __init__(self):
         super(GridView, self).__init__()
 
-        self.surface = None
         self._grid = None
         self._objects = None
         self._hover_pos = Pos(0, 0)
         self._hover_previous_pos = Pos(0, 0)
 
         self._selection = Selection(None)
+        self._symbol = None
+
+        # images of the characters, to paint the grid content on screen
+        self._atlas = drawing.GlyphAtlas()
+
+        # backing store: (tile col, tile row) -> surface with the background, grid lines and content,
+        # the least recently used first
+        self._tiles = collections.OrderedDict()
+        self._tiles_key = None
+        # number of tiles kept: the visible tiles plus a margin around them
+        self._max_tiles = MIN_TILES
+
+        # grid lines of a single cell, repeated
+        self._gridline_pattern = None
+        self._gridline_key = None
 
         # selection position
         self._drag_dir = None
@@ -47,8 +67,19 @@ class GridView(Gtk.DrawingArea):
         self._drag_currentpos = None
         self._drag_prevpos = []
 
+        # screen areas (x, y, w, h) of the overlay elements that follow the pointer: the cursor and the selection
+        self._overlay_rects = []
+        # the state the selection was drawn from, and the screen areas of the selection (relative to its origin)
+        self._selection_key = None
+        self._selection_rects = []
+        # the pickpoint marks shown: (shown, symbol, line, text pickpoints), of the objects, and their screen areas
+        self._marks_key = None
+        self._marks_objects = None
+        self._marks_rects = []
+
         # text
         self._cursor_on = True
+        self.cursor_callback = None
         self._text = ""
 
         # pickpoints
@@ -59,7 +90,6 @@ class GridView(Gtk.DrawingArea):
         self.set_can_focus(True)
 
         self.connect('draw', self.on_draw)
-        self.connect('configure-event', self.on_configure)
 
         self.add_events(Gdk.EventMask.BUTTON_PRESS_MASK)
         self.connect('button-press-event', self.on_button_press)
@@ -77,14 +107,10 @@ class GridView(Gtk.DrawingArea):
         self.add_events(Gdk.EventMask.POINTER_MOTION_MASK)
         self.connect('motion-notify-event', self.on_hover)
 
-        # https://developer.gnome.org/gtk3/stable/GtkWidget.html#gtk-widget-add-tick-callback
-        self.start_time = time.time()
-        self.cursor_callback = self.add_tick_callback(self.toggle_cursor)
-        # self.remove_tick_callback(self.cursor_callback)
-
         # subscriptions
 
         pub.subscribe(self.set_grid, 'NEW_GRID')
+        pub.subscribe(self.on_grid_damaged, 'GRID_DAMAGED')
 
         pub.subscribe(self.on_add_text, 'ADD_TEXT')
         pub.subscribe(self.on_add_textblock, 'ADD_TEXTBLOCK')
@@ -122,7 +148,9 @@ class GridView(Gtk.DrawingArea):
 
     def set_grid(self, grid):
         self._grid = grid
+        self.invalidate_tiles()
         self.set_viewport_size()
+        self.queue_draw()
 
     def set_viewport_size(self):
         # https://stackoverflow.com/questions/11546395/how-to-put-gtk-drawingarea-into-gtk-layout
@@ -132,8 +160,8 @@ class GridView(Gtk.DrawingArea):
 
     @property
     def max_pos(self):
-        x_max = self.surface.get_width()
-        y_max = self.surface.get_height()
+        x_max = self.get_allocated_width()
+        y_max = self.get_allocated_height()
         return Pos(x_max, y_max)
 
     @property
@@ -155,40 +183,125 @@ class GridView(Gtk.DrawingArea):
         br = br.grid_cr()
         return ul, br
 
-    def init_surface(self, area):
-        """Initialize Cairo surface."""
-        if self.surface is not None:
-            # destroy previous buffer
-            self.surface.finish()
-            self.surface = None
-        # create a new buffer
-        self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, area.get_allocated_width(), area.get_allocated_height())
-
-    def on_configure(self, area, event, data=None):
-        self.init_surface(self)
-        context = cairo.Context(self.surface)
-        self.do_drawing(context)
-        self.surface.flush()
-        return False
+    def invalidate_tiles(self):
+        """Drop the backing store, the tiles are rendered again when drawn."""
+        self._tiles = collections.OrderedDict()
+
+    def _tiles_font_key(self):
+        values = Preferences.values
+        return (values['PANGO_FONT'], values['FONT'], values['FONTSIZE'], values['GRIDSIZE_W'], values['GRIDSIZE_H'])
+
+    def cells_in(self, x, y, w, h):
+        """
+        Return the cells that cover an area.
+        :param x, y, w, h: the area, in pixels
+        :returns (col, row, cols, rows)
+        """
+        width = Preferences.values['GRIDSIZE_W']
+        height = Preferences.values['GRIDSIZE_H']
+        col = int(x // width)
+        row = int(y // height)
+        cols = int(math.ceil((x + w) / width)) - col
+        rows = int(math.ceil((y + h) / height)) - row
+        return col, row, cols, rows
+
+    def draw_static(self, ctx, x, y, w, h):
+        """
+        Draw the background, grid lines and content of an area.
+        :param x, y, w, h: the area, in pixels
+        """
+        col, row, cols, rows = self.cells_in(x, y, w, h)
+        ctx.save()
+        ctx.rectangle(x, y, w, h)
+        ctx.clip()
+        self.draw_background(ctx)
+        self.draw_gridlines(ctx, (col, row, cols, rows))
+        # include the surrounding cells, their glyphs may extend into the area
+        col = max(col - 1, 0)
+        row = max(row - 1, 0)
+        self.draw_content(ctx, (col, row, cols + 2, rows + 2))
+        ctx.restore()
+
+    def tile(self, key):
+        """
+        Return a tile of the backing store, it is rendered if it is not in the store.
+        :param key: (tile col, tile row)
+        """
+        surface = self._tiles.get(key)
+        if surface is not None:
+            self._tiles.move_to_end(key)
+            return surface
+        t_col, t_row = key
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, TILE, TILE)
+        ctx = cairo.Context(surface)
+        ctx.translate(-t_col * TILE, -t_row * TILE)
+        self.draw_static(ctx, t_col * TILE, t_row * TILE, TILE, TILE)
+        surface.flush()
+        self._tiles[key] = surface
+        # drop the tiles that have been out of view the longest
+        while len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+        return surface
+
+    def on_grid_damaged(self, rects):
+        """
+        Repaint the changed grid cells only.
+
+        The tiles of the backing store that contain the cells are updated, the other tiles are rendered when drawn.
+        :param rects: list of (col, row, cols, rows) rectangles in grid coordinates
+        """
+        if self._grid is None:
+            return
+        width = Preferences.values['GRIDSIZE_W']
+        height = Preferences.values['GRIDSIZE_H']
+        for rect in rects:
+            col, row, cols, rows = rect
+            x, y = (col * width, row * height)
+            w, h = (cols * width, rows * height)
+            for (t_col, t_row), surface in self._tiles.items():
+                tx, ty = (t_col * TILE, t_row * TILE)
+                if tx < x + w and x < tx + TILE and ty < y + h and y < ty + TILE:
+                    ctx = cairo.Context(surface)
+                    ctx.translate(-tx, -ty)
+                    self.draw_static(ctx, x, y, w, h)
+                    surface.flush()
+            self.queue_draw_area(x, y, w, h)
 
     def on_draw(self, area, ctx):
-        if self.surface is not None:
-            ctx.set_source_surface(self.surface, 0.0, 0.0)
-            ctx.paint()
-        else:
-            print(_("Invalid surface"))
+        """Paint the visible part of the canvas from the backing store, and the selection on top of it."""
+        if self._grid is None:
+            return False
+        key = self._tiles_font_key()
+        if key != self._tiles_key:
+            self.invalidate_tiles()
+            self._tiles_key = key
+        # the area to (re)paint, e.g. the part of the canvas that is visible in the scrolled window
+        x1, y1, x2, y2 = ctx.clip_extents()
+        t_rows = range(max(int(y1 // TILE), 0), int(math.ceil(y2 / TILE)))
+        t_cols = range(max(int(x1 // TILE), 0), int(math.ceil(x2 / TILE)))
+        # keep the tiles of the visible part of the canvas, e.g. of a large (4K) window, and a margin
+        self._max_tiles = max(self._max_tiles, 2 * len(t_rows) * len(t_cols))
+        for t_row in t_rows:
+            for t_col in t_cols:
+                ctx.set_source_surface(self.tile((t_col, t_row)), t_col * TILE, t_row * TILE)
+                ctx.rectangle(t_col * TILE, t_row * TILE, TILE, TILE)
+                ctx.fill()
+        self.draw_selection(ctx)
         return False
 
     # (don't) show pickpoints
 
     def on_show_symbol_pickpoints(self, state):
         self._show_symbol_pickpoints = state
+        self.update_overlay()
 
     def on_show_line_pickpoints(self, state):
         self._show_line_pickpoints = state
+        self.update_overlay()
 
     def on_show_text_pickpoints(self, state):
         self._show_text_pickpoints = state
+        self.update_overlay()
 
     # printing
 
@@ -204,20 +317,11 @@ class GridView(Gtk.DrawingArea):
         ctx = print_ctx.get_cairo_context()
         # self.draw_border(ctx, w, h)
         ctx.scale(0.5, 0.5)
-        self.draw_content(ctx)
+        drawing.draw_content(ctx, self._grid)
 
     def on_draw_pdf(self, filename):
         # don't use the drawing_area, so that this method can be run from (nose) test method (w/o GUI)
-        # w = self.get_allocated_width()
-        # h = self.get_allocated_height()
-        # FIXME Set Portrait or Landscape dimensions based upon prefs or printer settings
-        w, h = (560, 784)
-        surface = cairo.PDFSurface(filename, w, h)
-        ctx = cairo.Context(surface)
-        # self.draw_border(ctx, w, h)
-        ctx.scale(0.5, 0.5)
-        self.draw_content(ctx)
-        surface.finish()
+        drawing.write_pdf(self._grid, filename)
         msg = _("PDF Exported to {}").format(filename)
         pub.sendMessage('STATUS_MESSAGE', msg=msg)
 
@@ -225,87 +329,108 @@ class GridView(Gtk.DrawingArea):
 
     def on_nothing_selected(self):
         self._selection = Selection(None)
-        self.queue_resize()
+        self.update_overlay()
 
     def on_add_text(self):
         self._selection = Selection(item=TEXT, state=SELECTING)
         self._text = ""
         self._symbol = Text(Pos(0, 0), self._text)
         self.grab_focus()
+        self.update_overlay()
 
     def on_add_textblock(self, text):
         self._selection = Selection(item=TEXT_BLOCK, state=SELECTING)
         self._symbol = Text(Pos(0, 0), text)
         self._text = text
+        self.update_overlay()
 
     def on_character_selected(self, char):
         self._selection = Selection(item=CHARACTER, state=SELECTED)
         self._symbol = char
+        self.update_overlay()
 
     def on_symbol_selected(self, symbol):
         # only components (can be rotated or mirrored)
         self._selection = Selection(item=COMPONENT, state=SELECTED)
         self._symbol = symbol
+        self.update_overlay()
 
     def on_objects_selected(self, objects):
         # one object or multiple objects have been selected
         self._selection = Selection(item=OBJECTS)
         self._selection.state = SELECTED
         self._objects = objects
+        self.update_overlay()
 
     def on_selecting_object(self, objects):
         # select a single object
         self._selection = SelectionObject()
         self._objects = objects
+        self.update_overlay()
 
     def on_selecting_eraser(self):
         self._selection = SelectionEraser()
+        self.update_overlay()
 
     def on_selecting_rect(self, objects):
         self._selection = SelectionRect()
         self._objects = objects
+        self.update_overlay()
 
     def on_selecting_arrow(self, objects):
         self._selection = SelectionArrow()
         self._objects = objects
+        self.update_overlay()
 
     def on_selecting_row(self, action):
         self._selection = SelectionRow(action)
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     def on_selecting_col(self, action):
         self._selection = SelectionCol(action)
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     # LINES
 
     def on_draw_mag_line(self):
         self._selection = Selection(item=MAG_LINE)
-        self._symbol = MagLine(Pos(0, 0), Pos(1, 1), self._grid.cell)
+        self._symbol = MagLine(Pos(0, 0), Pos(1, 1), self._grid.cell, neighbourhood_callback=self._grid.neighbourhood)
+        self.update_overlay()
 
     def on_draw_dir_line(self, type):
         self._selection = Selection(item=DIR_LINE)
         self._symbol = DirLine(Pos(0, 0), Pos(1, 1))
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     def on_draw_line(self, type):
         self._selection = Selection(item=LINE)
         self._symbol = Line(Pos(0, 0), Pos(1, 1), type=type)
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     def on_draw_rect(self):
         self._selection = Selection(item=DRAW_RECT)
         self._symbol = Rect(Pos(0, 0), Pos(1, 1))
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     def on_draw_arrow(self):
         self._selection = Selection(item=ARROW)
         self._symbol = Arrow(Pos(0, 0), Pos(1, 1))
         pub.sendMessage('STATUS_MESSAGE', msg='')
+        self.update_overlay()
 
     # TEXT ENTRY
 
     def on_key_press(self, widget, event):
+        handled = self.key_press(event)
+        self.update_overlay()
+        return handled
+
+    def key_press(self, event):
 
         # TODO Will this work in other locale too?
         def filter_non_printable(ascii):
@@ -355,12 +480,6 @@ class GridView(Gtk.DrawingArea):
 
     # DRAWING
 
-    def do_drawing(self, ctx):
-        self.draw_background(ctx)
-        self.draw_gridlines(ctx)
-        self.draw_content(ctx)
-        self.draw_selection(ctx)
-
     def draw_border(self, ctx, w, h):
         """draw a border at 1% of the page-size."""
         ctx.save()
@@ -381,77 +500,92 @@ class GridView(Gtk.DrawingArea):
         ctx.rectangle(0, 0, x_max, y_max)
         ctx.fill()
 
-    def draw_gridlines(self, ctx):
-        # TODO use CSS for uniform colors?
-        ctx.set_source_rgb(0.75, 0.75, 0.75)
-        ctx.set_line_width(0.5)
-        ctx.set_tolerance(0.1)
-        ctx.set_line_join(cairo.LINE_JOIN_ROUND)
+    def gridline_pattern(self):
+        """
+        Return the pattern of the grid lines.
 
-        x_max, y_max = self.max_pos.xy
+        The lines along the edges of a single cell are rendered once, and repeated.
+        The pattern is rendered again when the grid cell size changes.
+        """
+        width = Preferences.values['GRIDSIZE_W']
+        height = Preferences.values['GRIDSIZE_H']
+        if self._gridline_key != (width, height):
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            ctx = cairo.Context(surface)
+            # TODO use CSS for uniform colors?
+            ctx.set_source_rgb(0.75, 0.75, 0.75)
+            ctx.set_line_width(0.5)
+            # half of a line is in this cell, the other half in the adjacent cell
+            ctx.move_to(0, 0)
+            ctx.line_to(width, 0)
+            ctx.move_to(0, height)
+            ctx.line_to(width, height)
+            ctx.move_to(0, 0)
+            ctx.line_to(0, height)
+            ctx.move_to(width, 0)
+            ctx.line_to(width, height)
+            ctx.stroke()
+            surface.flush()
+            self._gridline_pattern = cairo.SurfacePattern(surface)
+            self._gridline_pattern.set_extend(cairo.EXTEND_REPEAT)
+            self._gridline_key = (width, height)
+        return self._gridline_pattern
+
+    def draw_gridlines(self, ctx, rect=None):
+        """
+        Draw the grid lines, with a single fill of the grid line pattern.
+        :param rect: (col, row, cols, rows) to draw the lines for this part of the grid only
+        """
         x_incr = Preferences.values['GRIDSIZE_W']
         y_incr = Preferences.values['GRIDSIZE_H']
+        if rect is None:
+            x_min, y_min = (0, 0)
+            x_max, y_max = self.max_pos.xy
+        else:
+            col, row, cols, rows = rect
+            x_min, y_min = (col * x_incr, row * y_incr)
+            x_max, y_max = ((col + cols) * x_incr, (row + rows) * y_incr)
 
-        # horizontal lines
-        y = Preferences.values['GRIDSIZE_H']
-        while y <= y_max:
-            ctx.new_path()
-            ctx.move_to(0, y)
-            ctx.line_to(x_max, y)
-            ctx.stroke()
-            y += y_incr
-        # vertical lines
-        x = 0
-        while x <= x_max:
-            ctx.new_path()
-            ctx.move_to(x, 0)
-            ctx.line_to(x, y_max)
-            ctx.stroke()
-            x += x_incr
+        ctx.save()
+        # the pattern is aligned with the grid cells
+        ctx.set_source(self.gridline_pattern())
+        ctx.new_path()
+        ctx.rectangle(x_min, y_min, x_max - x_min, y_max - y_min)
+        ctx.fill()
+        ctx.restore()
 
-    def draw_content(self, ctx):
+    def draw_content(self, ctx, rect=None):
+        """
+        Draw the grid content.
+        :param rect: (col, row, cols, rows) to draw this part of the grid only
+        """
         if self._grid is None:
             return
-        ctx.set_source_rgb(0.1, 0.1, 0.1)
-        use_pango_font = Preferences.values['PANGO_FONT']
-        if use_pango_font:
-            # https://sites.google.com/site/randomcodecollections/home/python-gtk-3-pango-cairo-example
-            # https://developer.gnome.org/pango/stable/pango-Cairo-Rendering.html
-            layout = PangoCairo.create_layout(ctx)
-            desc = Pango.font_description_from_string(Preferences.values['FONT'])
-            layout.set_font_description(desc)
-        else:
-            ctx.set_font_size(Preferences.values['FONTSIZE'])
-            ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-        y = 0
-        for r in self._grid.grid:
-            x = 0
-            for c in r:
-                if use_pango_font:
-                    ctx.move_to(x, y)
-                    layout.set_text(str(c), -1)
-                    PangoCairo.show_layout(ctx, layout)
-                else:
-                    # the Cairo text glyph origin is its left-bottom corner
-                    ctx.move_to(x, y + Preferences.values['FONTSIZE'])
-                    ctx.show_text(str(c))
-                x += Preferences.values['GRIDSIZE_W']
-            y += Preferences.values['GRIDSIZE_H']
-            # no reference to surface dimension, to allow to be run from (nose) test (w/o GUI)
-            # if y >= self.surface.get_height():
-            #     break
-
-    def draw_selection(self, ctx):
+        self._atlas.draw_content(ctx, self._grid, rect)
+
+    def draw_selection(self, ctx, marks=True, cursor=True):
+        """
+        Draw the overlay: the pickpoint marks, the cursor and the selection.
+        :param marks: False to leave out the pickpoint marks
+        :param cursor: False to leave out the cursor
+        """
         ctx.save()
-        if self._selection.state == IDLE:
-            if self._selection.item == RECT:
-                self.mark_all_objects(ctx)
-        elif self._selection.state == SELECTING:
-            self.draw_selecting_state(ctx)
+        if marks and self.marks_shown():
+            self.mark_all_objects(ctx)
+        if self._selection.state == SELECTING:
+            self.draw_selecting_state(ctx, cursor)
         elif self._selection.state == SELECTED:
             self.draw_selected_state(ctx)
         ctx.restore()
 
+    def marks_shown(self):
+        """Return True if the pickpoints of the objects are marked, in the current selection state."""
+        state = self._selection.state
+        item = self._selection.item
+        return (state == IDLE and item == RECT) or \
+            (state == SELECTING and item in (OBJECT, RECT)) or \
+            (state == SELECTED and item in (OBJECT, RECT, OBJECTS))
+
     def draw_selected_state(self, ctx):
         if self._selection.item in (CHARACTER, COMPONENT):
             self._symbol.draw(ctx, self._hover_pos)
@@ -461,17 +595,16 @@ class GridView(Gtk.DrawingArea):
             self._selection.endpos = self._drag_endpos
             self._selection.maxpos = self.max_pos_grid
             self._selection.draw(ctx)
-            self.mark_all_objects(ctx)
         elif self._selection.item == OBJECTS:
-            self.mark_all_objects(ctx)
             self.draw_selected_objects(ctx)
 
-    def draw_selecting_state(self, ctx):
+    def draw_selecting_state(self, ctx, cursor=True):
         if self._selection.item == OBJECT:
-            self.mark_all_objects(ctx)
-            self.draw_cursor(ctx)
+            if cursor:
+                self.draw_cursor(ctx)
         elif self._selection.item in (TEXT, TEXT_BLOCK):
-            self.draw_cursor(ctx)
+            if cursor:
+                self.draw_cursor(ctx)
             self._symbol.startpos = self._hover_pos.grid_cr()
             self._symbol.text = self._text
             self._symbol.draw(ctx)
@@ -486,10 +619,7 @@ class GridView(Gtk.DrawingArea):
             self._selection.endpos = self._drag_currentpos
             self._selection.maxpos = self.max_pos_grid
 
-            if self._selection.item == RECT:
-                self.mark_all_objects(ctx)
-                self._selection.draw(ctx)
-            elif self._selection.item in (MAG_LINE, LINE, DIR_LINE, DRAW_RECT, ARROW):
+            if self._selection.item in (MAG_LINE, LINE, DIR_LINE, DRAW_RECT, ARROW):
                 self._symbol.startpos = self._selection.startpos.grid_cr()
                 self._symbol.endpos = self._selection.endpos.grid_cr()
                 self._symbol.draw(ctx)
@@ -510,35 +640,146 @@ class GridView(Gtk.DrawingArea):
         ctx.stroke()
         ctx.restore()
 
-    def toggle_cursor(self, widget, frame_clock, user_data=None):
-        now = time.time()
-        elapsed = now - self.start_time
-        if elapsed > 0.5:
-            self.start_time = now
-            self._cursor_on = not self._cursor_on
-            self.queue_resize()
-        elif elapsed > 0.25:
-            self.queue_resize()
+    def cursor_visible(self):
+        return self._selection.state == SELECTING and self._selection.item in (OBJECT, TEXT, TEXT_BLOCK)
+
+    def cursor_rect(self):
+        """Return the screen area (x, y, w, h) of the cursor."""
+        x, y = self._hover_pos.xy
+        return (x - 1, y - 1, Preferences.values['GRIDSIZE_W'] + 2, Preferences.values['GRIDSIZE_H'] + 2)
+
+    def toggle_cursor(self, user_data=None):
+        """Blink the cursor, the timeout is only installed while the cursor is visible."""
+        self._cursor_on = not self._cursor_on
+        # repaint the cursor only
+        self.queue_draw_area(*self.cursor_rect())
         return GLib.SOURCE_CONTINUE
 
+    def selection_follows_pointer(self):
+        """Return True if the selection is drawn at the pointer position, e.g. the symbol to paste."""
+        state = self._selection.state
+        item = self._selection.item
+        return (state == SELECTED and item in (CHARACTER, COMPONENT, OBJECTS)) or \
+            (state == SELECTING and item in (TEXT, TEXT_BLOCK))
+
+    def selection_key(self):
+        """Return the state that the selection is drawn from, apart from the pointer position if it follows the pointer."""
+        def xy(pos):
+            return None if pos is None else pos.xy
+
+        symbol = self._symbol
+        if symbol is not None:
+            symbol = (symbol, symbol.ori, symbol.mirrored)
+        hover_pos = None if self.selection_follows_pointer() else self._hover_pos.xy
+        return (self._selection, self._selection.state, self._selection.item, symbol, self._text, self._objects,
+                hover_pos, xy(self._drag_startpos), xy(self._drag_endpos), xy(self._drag_currentpos),
+                None if self._grid is None else self.max_pos_grid.xy, Preferences.values['FONTSIZE'])
+
+    def selection_rects(self):
+        """
+        Return the screen areas of the selection, e.g. the selection rectangle, the drag preview or the symbol to paste.
+
+        The areas are determined by drawing the selection, only when it changed; a selection that follows the pointer
+        is moved along with it.
+        :returns list of (x, y, w, h)
+        """
+        x0, y0 = self._hover_pos.xy if self.selection_follows_pointer() else (0, 0)
+        key = self.selection_key()
+        if key != self._selection_key:
+            self._selection_key = key
+            self._selection_rects = [(x - x0, y - y0, w, h) for x, y, w, h in self.draw_selection_rects()]
+        return [(x + x0, y + y0, w, h) for x, y, w, h in self._selection_rects]
+
+    def draw_selection_rects(self):
+        """
+        Return the screen areas of the selection as drawn.
+
+        An outlined selection rectangle results in the areas of its four sides, not in the area it encloses.
+        :returns list of (x, y, w, h)
+        """
+        surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+        self.draw_selection(cairo.Context(surface), marks=False, cursor=False)
+        x, y, w, h = surface.ink_extents()
+        if w == 0 or h == 0:
+            return []
+        # include the anti-aliased edges
+        x = int(math.floor(x)) - 1
+        y = int(math.floor(y)) - 1
+        w = int(math.ceil(w)) + 3
+        h = int(math.ceil(h)) + 3
+        if self._selection.item in (OBJECT, RECT) and self._selection.state != IDLE:
+            t = 4
+            return [(x, y, w, t), (x, y + h - t, w, t), (x, y, t, h), (x + w - t, y, t, h)]
+        return [(x, y, w, h)]
+
+    def mark_rects(self):
+        """Return the screen areas of the pickpoint marks of the objects."""
+        margin = 4
+        w = Preferences.values['GRIDSIZE_W'] + 2 * margin
+        h = max(Preferences.values['GRIDSIZE_H'], Preferences.values['FONTSIZE']) + 2 * margin
+        rects = []
+        for ref in self._objects or []:
+            if self.is_marked(ref.symbol):
+                pos = ref.symbol.pickpoint_pos.view_xy()
+                rects.append((pos.x - margin, pos.y - margin, w, h))
+        return rects
+
+    def update_overlay(self):
+        """
+        Repaint the overlay, after the selection, cursor or pointer position changed.
+
+        The previous and the current area of the cursor and of the selection are repainted,
+        the pickpoint marks only when they are shown or hidden. The grid is painted from the backing store.
+        """
+        rects = self.selection_rects()
+        if self.cursor_visible():
+            rects.append(self.cursor_rect())
+        for rect in self._overlay_rects + rects:
+            self.queue_draw_area(*rect)
+        self._overlay_rects = rects
+
+        key = (self.marks_shown(), self._show_symbol_pickpoints, self._show_line_pickpoints, self._show_text_pickpoints)
+        if key != self._marks_key or self._objects is not self._marks_objects:
+            # the marks are shown or hidden, or those of other objects are shown
+            rects = self.mark_rects() if key[0] else []
+            for rect in self._marks_rects + rects:
+                self.queue_draw_area(*rect)
+            self._marks_rects = rects
+            self._marks_key = key
+            self._marks_objects = self._objects
+
+        # the cursor blinks while it is visible
+        if self.cursor_visible():
+            if self.cursor_callback is None:
+                self._cursor_on = True
+                self.cursor_callback = GLib.timeout_add(CURSOR_BLINK, self.toggle_cursor)
+        elif self.cursor_callback is not None:
+            GLib.source_remove(self.cursor_callback)
+            self.cursor_callback = None
+
     def mark_all_objects(self, ctx):
         """Mark all objects on the grid canvas."""
         ctx.save()
         for ref in self._objects:
-            if ref.symbol.has_pickpoint:
-                if (self._show_symbol_pickpoints and ref.symbol.is_symbol) or \
-                        (self._show_line_pickpoints and ref.symbol.is_line) or \
-                        (self._show_text_pickpoints and ref.symbol.is_text):
-                    ctx.set_source_rgb(1, 0, 0)
-                    ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-                    # FIXME the pickpoint of a mostleft position (x=0) will not show as it falls of the grid
-                    pos = ref.symbol.pickpoint_pos.view_xy()
-                    # the text glyph origin is its left-bottom corner
-                    y_xbase = pos.y + Preferences.values['FONTSIZE']
-                    ctx.move_to(pos.x, y_xbase)
-                    ctx.show_text(MARK_CHAR)  # mark the upper-left corner
+            if self.is_marked(ref.symbol):
+                ctx.set_source_rgb(1, 0, 0)
+                ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+                # FIXME the pickpoint of a mostleft position (x=0) will not show as it falls of the grid
+                pos = ref.symbol.pickpoint_pos.view_xy()
+                # the text glyph origin is its left-bottom corner
+                y_xbase = pos.y + Preferences.values['FONTSIZE']
+                ctx.move_to(pos.x, y_xbase)
+                ctx.show_text(MARK_CHAR)  # mark the upper-left corner
         ctx.restore()
 
+    def is_marked(self, symbol):
+        """Return True if the pickpoint of the symbol is to be marked."""
+        if not symbol.has_pickpoint:
+            return False
+        return (self._show_symbol_pickpoints and symbol.is_symbol) or \
+            (self._show_line_pickpoints and symbol.is_line) or \
+            (self._show_text_pickpoints and symbol.is_text)
+
     def draw_selected_objects(self, ctx):
         """Draw multiple objects selection."""
         ctx.save()
@@ -567,7 +808,7 @@ class GridView(Gtk.DrawingArea):
 
         elif self._selection.state == SELECTED:
             self.selected_state(event)
-        widget.queue_resize()
+        self.update_overlay()
 
     def selected_state(self, event):
         pos = self._hover_pos
@@ -634,6 +875,7 @@ class GridView(Gtk.DrawingArea):
         self._drag_prevpos = []
         self._drag_prevpos.append(pos)
         self._selection.state = SELECTING
+        self.update_overlay()
 
     def on_drag_end(self, widget, x_offset, y_offset):
         if self._selection.state == SELECTING and self._selection.item in (DRAW_RECT, ARROW, RECT, ERASER, LINE, MAG_LINE, DIR_LINE):
@@ -646,6 +888,7 @@ class GridView(Gtk.DrawingArea):
         startpos = self._drag_startpos.grid_cr()
         endpos = self._drag_endpos.grid_cr()
         self._selection.state = SELECTED
+        self.update_overlay()
 
         if self._selection.item == DRAW_RECT:
             pub.sendMessage('PASTE_RECT', startpos=startpos, endpos=endpos)
@@ -689,6 +932,7 @@ class GridView(Gtk.DrawingArea):
             self._drag_currentpos = pos
             # snap to either a horizontal or a vertical straight line
             self._drag_dir = self.pointer_dir()
+        self.update_overlay()
 
     def pointer_dir(self):
         """Return the pointer direction in relation to the start position."""
@@ -732,7 +976,10 @@ class GridView(Gtk.DrawingArea):
             self.grab_focus()
         width = Preferences.values['GRIDSIZE_W']
         height = Preferences.values['GRIDSIZE_H']
+        previous_pos = self._hover_pos
         self._hover_pos = self.calc_position(event.x, event.y)
+        if self._hover_pos != previous_pos:
+            self.update_overlay()
         delta = self._hover_previous_pos - self._hover_pos
         if abs(delta.x) > width / 2 or abs(delta.y) > height / 2:
             moved_enough = True
@@ -16,8 +16,9 @@ from application import INSERT, REMOVE
 from application.symbol import Line
 from application.grid_view import GridView
 from application.component_view import ComponentView
-from application.preferences import Preferences, PreferencesDialog
-from application.magic_line_settings import MagicLineSettingsDialog
+from application.preferences import Preferences
+from application.preferences_dialog import PreferencesDialog
+from application.magic_line_dialog import MagicLineSettingsDialog
 
 import gi
 gi.require_version('Gtk', '3.0')
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+AACircuit
+2020-03-02 JvO
+
+Memo parser, converts the lines of a memo (AACircuit file) to records.
+"""
+
+import re
+import json
+import collections
+
+from application import REMOVE, INSERT
+from application.pos import Pos
+from application import symbol
+
+# memo records, linenr is the line number in the memo
+Component = collections.namedtuple('Component', ['linenr', 'id', 'ori', 'mirrored', 'pos'])
+Character = collections.namedtuple('Character', ['linenr', 'char', 'pos'])
+Eraser = collections.namedtuple('Eraser', ['linenr', 'size', 'pos'])
+Text = collections.namedtuple('Text', ['linenr', 'ori', 'pos', 'text'])
+Line = collections.namedtuple('Line', ['linenr', 'type', 'startpos', 'endpos'])
+MagLine = collections.namedtuple('MagLine', ['linenr', 'type', 'startpos', 'endpos'])
+DirLine = collections.namedtuple('DirLine', ['linenr', 'startpos', 'endpos'])
+Rect = collections.namedtuple('Rect', ['linenr', 'startpos', 'endpos'])
+Arrow = collections.namedtuple('Arrow', ['linenr', 'startpos', 'endpos'])
+Column = collections.namedtuple('Column', ['linenr', 'action', 'col'])
+Row = collections.namedtuple('Row', ['linenr', 'action', 'row'])
+# line that is not understood
+Skipped = collections.namedtuple('Skipped', ['linenr', 'line'])
+
+# numeric arguments: three or more, separated by a comma
+NUMBERS = re.compile(r':(\d+),(\d+),(\d+),?(\d*),?(\d*),?(\d*)')
+ROWCOL = re.compile(r':(\d+)')
+TEXT = re.compile(r':(\d+),(\d+),(\d+),(.*)')
+# original AACircuit
+TEXT_ORIGINAL = re.compile(r':(.+),(\d+),(\d+)')
+COMPONENT_ORIGINAL = re.compile(r':(\d+),(\d+),(\d+),(\d+),(\w),?(\w*)')
+
+
+def _numbers(m):
+    return [int(n) for n in m.groups()[:3]] + [int(n) if n else None for n in m.groups()[3:]]
+
+
+def _eraser(linenr, m):
+    w, h, x, y = _numbers(m)[:4]
+    return Eraser(linenr, (w, h), Pos(x, y))
+
+
+def _component(linenr, m):
+    id, ori, mirrored, x, y = _numbers(m)[:5]
+    return Component(linenr, id, ori, mirrored, Pos(x, y))
+
+
+def _character(linenr, m):
+    ascii, x, y = _numbers(m)[:3]
+    return Character(linenr, chr(ascii), Pos(x, y))
+
+
+def _line_type(type):
+    """Return the line type, raise ValueError for an unknown type."""
+    if type not in symbol.Line.TERMINAL_TYPE:
+        raise ValueError("unknown line type: {0}".format(type))
+    return type
+
+
+def _line(linenr, m):
+    type, x1, y1, x2, y2 = _numbers(m)[:5]
+    type = _line_type(type)
+    return Line(linenr, type, Pos(x1, y1), Pos(x2, y2))
+
+
+def _mag_line(linenr, m):
+    type, x1, y1, x2, y2 = _numbers(m)[:5]
+    type = _line_type(type)
+    return MagLine(linenr, type, Pos(x1, y1), Pos(x2, y2))
+
+
+def _dir_line(linenr, m):
+    x1, y1, x2, y2 = _numbers(m)[:4]
+    return DirLine(linenr, Pos(x1, y1), Pos(x2, y2))
+
+
+def _rect(linenr, m):
+    x1, y1, x2, y2 = _numbers(m)[:4]
+    return Rect(linenr, Pos(x1, y1), Pos(x2, y2))
+
+
+def _arrow(linenr, m):
+    x1, y1, x2, y2 = _numbers(m)[:4]
+    return Arrow(linenr, Pos(x1, y1), Pos(x2, y2))
+
+
+def _text(linenr, m):
+    ori, x, y = (int(n) for n in m.group(1, 2, 3))
+    return Text(linenr, ori, Pos(x, y), json.loads(m.group(4)))
+
+
+def _rowcol(record, action):
+    def parse(linenr, m):
+        return record(linenr, action, int(m.group(1)))
+    return parse
+
+
+def _rect_original(linenr, m):
+    # the first number is not used
+    x1, y1, x2, y2 = _numbers(m)[1:5]
+    return Rect(linenr, Pos(x1, y1), Pos(x2, y2))
+
+
+def _text_original(linenr, m):
+    x, y = (int(n) for n in m.group(2, 3))
+    return Text(linenr, 0, Pos(x, y), m.group(1))
+
+
+def _component_original(linenr, m):
+    id, ori, x, y = (int(n) for n in m.group(1, 2, 3, 4))
+    # orientation 1-4, mirrored with suffix 's'
+    mirrored = 1 if m.group(5) == 's' else 0
+    return Component(linenr, id, ori - 1, mirrored, Pos(x, y))
+
+
+# line prefix -> (arguments pattern, record constructor)
+SYNTAX = {'eras': (NUMBERS, _eraser),
+          'comp': (NUMBERS, _component),
+          'char': (NUMBERS, _character),
+          'line': (NUMBERS, _line),
+          'magl': (NUMBERS, _mag_line),
+          'dirl': (NUMBERS, _dir_line),
+          'rect': (NUMBERS, _rect),
+          'arrw': (NUMBERS, _arrow),
+          'text': (TEXT, _text),
+          'icol': (ROWCOL, _rowcol(Column, INSERT)),
+          'dcol': (ROWCOL, _rowcol(Column, REMOVE)),
+          'irow': (ROWCOL, _rowcol(Row, INSERT)),
+          'drow': (ROWCOL, _rowcol(Row, REMOVE))}
+
+SYNTAX_ORIGINAL = {'eras': (NUMBERS, _eraser),
+                   'comp': (COMPONENT_ORIGINAL, _component_original),
+                   'char': (NUMBERS, _character),
+                   'line': (NUMBERS, _line),
+                   'MagL': (NUMBERS, _mag_line),
+                   'dirl': (NUMBERS, _dir_line),
+                   'rect': (NUMBERS, _rect_original),
+                   'text': (TEXT_ORIGINAL, _text_original),
+                   'ICOL': (ROWCOL, _rowcol(Column, INSERT)),
+                   'DCOL': (ROWCOL, _rowcol(Column, REMOVE)),
+                   'IROW': (ROWCOL, _rowcol(Row, INSERT)),
+                   'DROW': (ROWCOL, _rowcol(Row, REMOVE))}
+
+
+def parse(memo, legacy=False):
+    """
+    Generate the records for the memo lines.
+
+    Every line results in one record, a line that is not understood in a Skipped record.
+    :param memo: iterable of memo lines
+    :param legacy: True for the original (Delphi/Pascal) AACircuit file format
+    """
+    syntax = SYNTAX_ORIGINAL if legacy else SYNTAX
+    for linenr, line in enumerate(memo, 1):
+        try:
+            pattern, record = syntax[line[:4]]
+            m = pattern.match(line, 4)
+            yield record(linenr, m)
+        except (KeyError, AttributeError, TypeError, ValueError):
+            # unknown prefix, no match, missing argument or invalid text
+            yield Skipped(linenr, line)
+
+
+if __name__ == '__main__':
+    # benchmark, e.g.: python -m application.memo_parser 100000
+    import sys
+    import time
+
+    sample = ['comp:15,0,0,18,10\n',
+              'line:0,7,2,26,2\n',
+              'magl:1,12,3,20,9\n',
+              'char:65,3,4\n',
+              'text:0,5,6,"hello"\n',
+              'rect:7,8,26,15\n',
+              'irow:12\n']
+    nr_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    memo = [sample[i % len(sample)] for i in range(nr_lines)]
+    start = time.perf_counter()
+    nr_records = sum(1 for record in parse(memo))
+    elapsed = time.perf_counter() - start
+    print("{0} lines parsed in {1:.3f} s ({2:.0f} lines/s)".format(nr_records, elapsed, nr_records / elapsed))
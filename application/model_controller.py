@@ -0,0 +1,888 @@
+"""
+AACircuit
+2020-03-02 JvO
+"""
+
+import os
+import itertools
+import contextlib
+import collections
+from pubsub import pub
+
+from application import gettext as _
+from application import ERROR, WARNING
+from application import REMOVE, INSERT
+from application import CELL_DEFAULT
+from application.pos import Pos
+from application.grid import Grid
+from application.sparse_grid import SparseGrid
+from application.magic_line_settings import MagicLineSettings
+from application.preferences import Preferences
+from application.component_library import ComponentLibrary
+from application.spatial_index import SpatialIndex
+from application.delta import Delta
+from application import memo_parser
+from application.symbol import Eraser, Character, Text, Line, MagLine, MagLineOld, DirLine, Rect, Arrow, Row, Column
+
+try:
+    from application.array_grid import ArrayGrid
+except ImportError:
+    # NumPy is optional, without it the grid is a Grid
+    ArrayGrid = None
+
+# the grid storage engines, by name
+GRID_ENGINES = {'list': Grid, 'sparse': SparseGrid}
+if ArrayGrid is not None:
+    GRID_ENGINES['array'] = ArrayGrid
+# number of cells from which on a new grid is an ArrayGrid (when the engine is not set), see grid_engine()
+ARRAY_GRID_CELLS = 200 * 100
+
+SelectedObjects = collections.namedtuple('SelectedObjects', ['startpos', 'symbol'])
+# delta: the grid cells changed by the action (Delta)
+Action = collections.namedtuple('Action', ['action', 'symbol', 'delta'])
+# actions that are undone and redone as one,
+# delta: the grid cells changed by all actions (Delta), or None to revert the actions one by one
+Transaction = collections.namedtuple('Transaction', ['actions', 'delta'])
+# the grid after (re)drawing the objects with the given handles, in that order
+Checkpoint = collections.namedtuple('Checkpoint', ['handles', 'grid'])
+
+
+def grid_engine(cols, rows):
+    """
+    Return the grid storage engine for a grid of the given dimensions.
+
+    The bulk operations (insert/remove rows and columns, snapshots, copies) of a large grid are faster with an ArrayGrid,
+    a small grid is a Grid.
+    """
+    if ArrayGrid is not None and cols * rows >= ARRAY_GRID_CELLS:
+        return ArrayGrid
+    return Grid
+
+
+def action_nbytes(act):
+    """Return the memory size of the deltas of an action or transaction."""
+    if isinstance(act, Transaction) and act.delta is None:
+        return sum(action_nbytes(a) for a in act.actions)
+    if act.delta is None:
+        return 0
+    return act.delta.nbytes
+
+
+def transaction_of(actions):
+    """
+    Return the transaction of the actions.
+
+    The cell changes of the actions are combined in a single delta, to undo and redo them in one pass.
+    That is, unless an action has no delta or inserts/removes a row or column.
+    """
+    if any(act.delta is None or act.delta.structure is not None for act in actions):
+        return Transaction(actions, None)
+    delta = Delta()
+    for act in actions:
+        delta.extend(act.delta)
+    return Transaction([act._replace(delta=None) for act in actions], delta)
+
+
+class ModelController(object):
+    """
+    The drawing model: the grid, the objects on it and their undo/redo administration.
+
+    Without GUI (Gtk) dependencies, e.g. for batch processing; the Controller adds the GUI on top.
+    """
+
+    # number of objects between two grid checkpoints
+    CHECKPOINT_INTERVAL = 100
+    # memory (bytes) for the undo history, the oldest actions are dropped beyond it
+    UNDO_BUDGET = 16 * 1024 * 1024
+
+    def __init__(self):
+        self.prefs = Preferences()
+        self.ml_settings = MagicLineSettings()
+        self.init_view()
+        self.complib = ComponentLibrary()
+        self.filename = None
+
+        # grid storage engine: Grid, ArrayGrid or SparseGrid, None: by the grid size (see grid_engine())
+        self._grid_class = None
+
+        self.init_stack()
+        self.init_grid()
+
+        # True: read original (Delphi/Pascal) AACircuit file
+        self._import_legacy = False
+        # True: no undo recording and notifications, see bulk_load()
+        self._bulk_loading = False
+        # the actions of the current transaction, see transaction()
+        self._transaction = None
+
+        # subscriptions
+
+        pub.subscribe(self.on_list_components, 'LIST_COMPONENTS')
+        pub.subscribe(self.on_character_changed, 'CHARACTER_CHANGED')
+        pub.subscribe(self.on_component_changed, 'COMPONENT_CHANGED')
+
+        pub.subscribe(self.on_rotate_symbol, 'ROTATE_SYMBOL')
+        pub.subscribe(self.on_mirror_symbol, 'MIRROR_SYMBOL')
+
+        pub.subscribe(self.on_paste_objects, 'PASTE_OBJECTS')
+        pub.subscribe(self.on_paste_mag_line, 'PASTE_MAG_LINE')
+        pub.subscribe(self.on_paste_dir_line, 'PASTE_DIR_LINE')
+        pub.subscribe(self.on_paste_line, 'PASTE_LINE')
+        pub.subscribe(self.on_paste_rect, 'PASTE_RECT')
+        pub.subscribe(self.on_paste_arrow, 'PASTE_ARROW')
+        pub.subscribe(self.on_paste_text, 'PASTE_TEXT')
+        pub.subscribe(self.on_paste_text, 'PASTE_TEXTBLOCK')
+        pub.subscribe(self.on_undo, 'UNDO')
+        pub.subscribe(self.on_redo, 'REDO')
+
+        pub.subscribe(self.on_erase, 'ERASE')
+        pub.subscribe(self.on_eraser_selected, 'ERASER')
+        pub.subscribe(self.on_select_rect, 'SELECT_RECT')
+        pub.subscribe(self.on_select_object, 'SELECT_OBJECT')
+        pub.subscribe(self.on_selector_moved, 'SELECTOR_MOVED')
+
+        # insert/remove rows or columns
+        pub.subscribe(self.on_grid_col, 'GRID_COL')
+        pub.subscribe(self.on_grid_row, 'GRID_ROW')
+
+        # clipboard
+        pub.subscribe(self.on_cut, 'CUT')
+        pub.subscribe(self.on_copy, 'COPY')
+
+        pub.subscribe(self.on_load_ascii_from_file, 'LOAD_ASCII_FROM_FILE')
+        pub.subscribe(self.on_rerun_memo, 'RERUN_MEMO')
+
+        # file
+        pub.subscribe(self.on_new, 'NEW_FILE')
+        pub.subscribe(self.on_save, 'SAVE_FILE')
+
+        # open/save grid from/to file
+        pub.subscribe(self.on_read_from_file, 'READ_FROM_FILE')
+        pub.subscribe(self.on_write_to_file, 'WRITE_TO_FILE')
+        pub.subscribe(self.on_write_to_ascii_file, 'WRITE_TO_ASCII_FILE')
+
+        # grid
+        pub.subscribe(self.on_grid_size, 'GRID_SIZE')
+        pub.subscribe(self.on_redraw_grid, 'REDRAW_GRID')
+        # the objects are drawn otherwise
+        pub.subscribe(self.clear_checkpoints, 'SAVE_PREFERENCES')
+        pub.subscribe(self.clear_checkpoints, 'SAVE_MAGIC_LINE_SETTINGS')
+
+    def init_view(self):
+        """Create the view, before the model publishes its initial state (e.g. the new grid)."""
+        pass
+
+    @property
+    def legacy(self):
+        return self._import_legacy
+
+    @legacy.setter
+    def legacy(self, value):
+        self._import_legacy = value
+
+    @property
+    def grid_class(self):
+        return self._grid_class
+
+    @grid_class.setter
+    def grid_class(self, value):
+        """Set the grid storage engine, used for the next (new) grid; None: chosen by the grid size."""
+        self._grid_class = value
+        self.clear_checkpoints()
+
+    def init_stack(self):
+        # action stack with the last cut/pasted symbol(s)
+        self.latest_action = []
+        # redo stack that contains the last undone actions
+        self.undone_action = []
+        # memory used by the deltas on the undo stack
+        self._undo_bytes = 0
+        # all objects on the grid, by their handle (in the order of placement)
+        self.objects = collections.OrderedDict()
+        self._handles = itertools.count(1)
+        # the objects by their pick-point
+        self.object_index = SpatialIndex()
+        self.selected_objects = []
+        self.clear_checkpoints()
+
+    def clear_checkpoints(self):
+        self._checkpoints = []
+
+    def init_grid(self, cols=None, rows=None):
+        if cols is None:
+            self._cols = Preferences.values['DEFAULT_COLS']
+        else:
+            self._cols = cols
+        if rows is None:
+            self._rows = Preferences.values['DEFAULT_ROWS']
+        else:
+            self._rows = rows
+        self.grid = self.new_grid(self._cols, self._rows)
+        pub.sendMessage('NEW_GRID', grid=self.grid)
+
+    def new_grid(self, cols, rows):
+        """Return an empty grid of the storage engine, see grid_class."""
+        grid_class = self._grid_class
+        if grid_class is None:
+            grid_class = grid_engine(cols, rows)
+        return grid_class(cols, rows)
+
+    def cell_callback(self, pos):
+        # prevent calling an old grid instance method
+        # FIXME better solution (than that this controller needs to know about a grid method)?
+        return self.grid.cell(pos)
+
+    def neighbourhood_callback(self, pos):
+        return self.grid.neighbourhood(pos)
+
+    def apply_symbol(self, symbol, paste=True):
+        """
+        Paste a symbol on the grid, or remove it, and record the cells that change.
+        :param paste: True to paste the symbol, False to remove it
+        :returns the Delta, None during a bulk load (that is not recorded)
+        """
+        if self._bulk_loading:
+            delta = None
+        else:
+            delta = Delta()
+        grid = self.grid
+        if delta is not None and isinstance(symbol, (Row, Column)):
+            # recorded as the insertion/removal, not cell by cell
+            self.record_structure(delta, symbol, paste)
+        else:
+            grid.journal = delta
+        try:
+            if paste:
+                symbol.paste(grid)
+            else:
+                symbol.remove(grid)
+        finally:
+            grid.journal = None
+        return delta
+
+    def record_structure(self, delta, symbol, paste):
+        """Record a row/column insertion or removal, and the cells that it pushes off the grid."""
+        grid = self.grid
+        insert = (symbol.action == INSERT) == paste
+        if isinstance(symbol, Row):
+            if symbol.row < 0 or symbol.row >= grid.nr_rows:
+                return
+            row = grid.nr_rows - 1 if insert else symbol.row
+            for col, value in enumerate(grid.row(row)):
+                if value != CELL_DEFAULT:
+                    delta.record(col, row, value, CELL_DEFAULT)
+        else:
+            if symbol.col < 0 or symbol.col >= grid.nr_cols:
+                return
+            col = grid.nr_cols - 1 if insert else symbol.col
+            for row, value in enumerate(grid.col(col)):
+                if value != CELL_DEFAULT:
+                    delta.record(col, row, value, CELL_DEFAULT)
+        delta.structure = (symbol, paste)
+
+    def revert(self, act, redo=False):
+        """
+        Revert an action, or the actions of a transaction in reverse order.
+        :param redo: True to redo an undone action
+        :returns the action, or transaction, that reverts it again
+        """
+        if isinstance(act, Transaction):
+            if act.delta is None:
+                return Transaction([self.revert(a, redo) for a in reversed(act.actions)], None)
+            # the objects one by one, the grid cells in one pass
+            actions = [self.revert_objects(a) for a in reversed(act.actions)]
+            if redo:
+                act.delta.redo(self.grid)
+            else:
+                act.delta.undo(self.grid)
+            return Transaction(actions, act.delta)
+        action, symbol, delta = self.revert_objects(act)
+        if delta is None:
+            if action == INSERT:
+                symbol.paste(self.grid)
+            else:
+                symbol.remove(self.grid)
+        elif redo:
+            delta.redo(self.grid)
+        else:
+            delta.undo(self.grid)
+        return Action(action=action, symbol=symbol, delta=delta)
+
+    def revert_objects(self, act):
+        """Revert the insertion or removal of the action symbol in the objects, return the action that reverts it again."""
+        if act.action == REMOVE:
+            self.add_to_objects(act.symbol)
+            return act._replace(action=INSERT)
+        self.remove_from_objects(act.symbol)
+        return act._replace(action=REMOVE)
+
+    def revert_action(self, stack, redo=False):
+        """Revert the last action (or transaction) on the undo or redo stack, return the action that reverts it again."""
+        act = stack.pop()
+        if stack is self.latest_action:
+            self._undo_bytes -= action_nbytes(act)
+        return self.revert(act, redo)
+
+    def on_undo(self):
+        if len(self.latest_action) > 0:
+            self.push_undone(self.revert_action(self.latest_action))
+            self.grid.flush_damage()
+        if len(self.latest_action) < 1:
+            # there are no more actions to undo
+            pub.sendMessage('UNDO_CHANGED', undo=False)
+
+    def on_redo(self):
+        if len(self.undone_action) > 0:
+            self.record_action(self.revert_action(self.undone_action, redo=True))
+            self.notify_undo()
+            self.grid.flush_damage()
+        if len(self.undone_action) < 1:
+            # there are no more actions to redo
+            pub.sendMessage('REDO_CHANGED', redo=False)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Group the actions into a single undo step, e.g.:
+
+            with controller.transaction():
+                controller.on_paste_line(...)
+                controller.on_paste_text(...)
+
+        The grid damage and the undo state are published once, at the end.
+        Undo and redo restore the grid cells of all actions in a single pass over their combined delta.
+        A transaction within a transaction is part of the outer one.
+        """
+        if self._transaction is not None:
+            yield
+            return
+        grid = self.grid
+        hold_damage = grid.hold_damage
+        grid.hold_damage = True
+        self._transaction = []
+        try:
+            yield
+        finally:
+            actions = self._transaction
+            self._transaction = None
+            grid.hold_damage = hold_damage
+            if len(actions) == 1:
+                self.record_action(actions[0])
+            elif len(actions) > 1:
+                self.record_action(transaction_of(actions))
+        self.grid.flush_damage()
+        if not self._bulk_loading:
+            pub.sendMessage('UNDO_CHANGED', undo=len(self.latest_action) > 0)
+
+    def push_latest_action(self, symbol, action=INSERT, delta=None):
+        """Add a cut or paste action to the undo stack."""
+        if self._bulk_loading:
+            return
+        self.record_action(Action(action=action, symbol=symbol, delta=delta))
+        self.notify_undo()
+
+    def notify_undo(self):
+        """Publish that there is an action to undo, a transaction does so at its end."""
+        if self._transaction is None:
+            pub.sendMessage('UNDO_CHANGED', undo=True)
+
+    def record_action(self, act):
+        """Add an action to the undo stack, drop the oldest actions when the history exceeds the UNDO_BUDGET."""
+        if self._bulk_loading:
+            return
+        if self._transaction is not None:
+            # recorded at the end of the transaction
+            self._transaction.append(act)
+            return
+        self.latest_action.append(act)
+        self._undo_bytes += action_nbytes(act)
+        while self._undo_bytes > self.UNDO_BUDGET and len(self.latest_action) > 1:
+            self._undo_bytes -= action_nbytes(self.latest_action.pop(0))
+
+    def push_undone(self, act):
+        """Add an undone action (or transaction) to the redo stack."""
+        self.undone_action.append(act)
+        pub.sendMessage('REDO_CHANGED', redo=True)
+
+    def add_selected_object(self, symbol):
+        obj = SelectedObjects(symbol.startpos, symbol)
+        self.selected_objects.append(obj)
+
+    # File menu
+
+    def on_new(self):
+        self.init_grid()
+        self.init_stack()
+        self.filename = None
+        pub.sendMessage('NOTHING_SELECTED')
+
+    def on_save(self):
+        if self.filename is not None:
+            self.on_write_to_file(self.filename)
+
+    # Edit menu
+
+    def add_to_objects(self, symbol):
+        # a symbol that is put back (undo of a cut) keeps its handle
+        if symbol.handle is None or symbol.handle in self.objects:
+            symbol.handle = next(self._handles)
+        self.objects[symbol.handle] = symbol
+        self.object_index.insert(symbol)
+
+    def remove_from_objects(self, symbol):
+        # the instances differ as symbols are copied before being added to the selection list, the handle is copied along
+        sym = self.objects.pop(symbol.handle, None)
+        if sym is not None:
+            self.object_index.remove(sym)
+
+    def find_selected(self, rect):
+        """Find all symbols that are located within the selection rectangle."""
+        ul, br = rect
+        selected = []
+        # select symbols of which the pick-point is within the selection rectangle
+        for symbol in self.object_index.in_rect(rect):
+            copy = symbol.copy()
+            copy.handle = symbol.handle
+            selection = SelectedObjects(startpos=ul, symbol=copy)
+            selected.append(selection)
+
+        # TODO Only one of multiple objects sharing the same position will be selected
+        if len(selected) > 0:
+            selected.sort(key=lambda x: x.startpos)
+            selected_unique = []
+            pps = set()
+            for sel in selected:
+                if sel.symbol.pickpoint_pos in pps:
+                    msg = _("More than one item at position: {} !").format(sel.symbol.pickpoint_pos)
+                    pub.sendMessage('STATUS_MESSAGE', msg=msg, type=WARNING)
+                else:
+                    pps.add(sel.symbol.pickpoint_pos)
+                    selected_unique.append(sel)
+            selected = selected_unique
+        self.selected_objects = selected
+
+    def on_selector_moved(self, pos):
+        """Show the object (type) that is located at the cursor position."""
+        found = self.object_index.at(pos)
+        count = len(found)
+        if count > 0:
+            last_found = found[-1]
+        if count > 1:
+            msg = _("More than one item at position: {} !").format(pos)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=WARNING)
+        elif count == 1:
+            msg = "Object: " + last_found.name
+            pub.sendMessage('STATUS_MESSAGE', msg=msg)
+        else:
+            pub.sendMessage('STATUS_MESSAGE', msg="")
+
+    def on_cut(self, rect):
+        self.find_selected(rect)
+        with self.transaction():
+            for obj in self.selected_objects:
+                delta = self.apply_symbol(obj.symbol, paste=False)
+                self.remove_from_objects(obj.symbol)
+                self.record_action(Action(action=REMOVE, symbol=obj.symbol, delta=delta))
+        pub.sendMessage('OBJECTS_SELECTED', objects=self.selected_objects)
+        if len(self.selected_objects) > 0:
+            first_obj = self.selected_objects[0]
+            pub.sendMessage('ORIENTATION_CHANGED', ori=first_obj.symbol.ori_as_str)
+
+    def on_copy(self, rect):
+        """Select all symbols that are located within the selection rectangle."""
+        self.find_selected(rect)
+        pub.sendMessage('OBJECTS_SELECTED', objects=self.selected_objects)
+        if len(self.selected_objects) > 0:
+            first_obj = self.selected_objects[0]
+            pub.sendMessage('ORIENTATION_CHANGED', ori=first_obj.symbol.ori_as_str)
+
+    def on_rerun_memo(self, str):
+        self.init_stack()
+        self.init_grid()
+        memo = []
+        str = str.splitlines()
+        for line in str:
+            memo.append(line)
+        self.bulk_load(memo_parser.parse(memo))
+
+    # grid manipulation
+
+    def on_grid_size(self, cols, rows):
+        self._rows = rows
+        self._cols = cols
+        self.clear_checkpoints()
+        if self.grid.clipped and (cols > self.grid.nr_cols or rows > self.grid.nr_rows):
+            # content drawn outside the grid may now fit
+            self.on_redraw_grid()
+        else:
+            # copy the content into the new dimensions
+            self.grid = self.grid.copy(cols, rows)
+            pub.sendMessage('NEW_GRID', grid=self.grid)
+
+    def on_redraw_grid(self):
+        """Draw all objects on a new grid, starting from the latest checkpoint that is still valid."""
+        rows = self._rows
+        cols = self._cols
+        handles = tuple(self.objects.keys())
+        # valid checkpoints are those of which the objects are still the first ones on the grid
+        self._checkpoints = [cp for cp in self._checkpoints if handles[:len(cp.handles)] == cp.handles]
+        if len(self._checkpoints) > 0:
+            checkpoint = self._checkpoints[-1]
+            start = len(checkpoint.handles)
+            # a (writable) grid that shares the content of the checkpoint snapshot
+            self.grid = checkpoint.grid.copy()
+        else:
+            start = 0
+            self.grid = self.new_grid(cols, rows)
+        objects = list(self.objects.values())
+        for n in range(start, len(objects)):
+            objects[n].paste(self.grid)
+            if (n + 1) % self.CHECKPOINT_INTERVAL == 0:
+                self._checkpoints.append(Checkpoint(handles[:n + 1], self.grid.snapshot()))
+        # the grid is shown when it is complete
+        pub.sendMessage('NEW_GRID', grid=self.grid)
+        self.grid.flush_damage()
+
+    def on_grid_col(self, col, action):
+        # don't mistake the symbol action for the edit action
+        symbol = Column(col, action)
+        self.add_to_objects(symbol)
+        delta = self.apply_symbol(symbol)
+        self.grid.flush_damage()
+        self.push_latest_action(symbol, delta=delta)
+
+    def on_grid_row(self, row, action):
+        # don't mistake the symbol action for the edit action
+        symbol = Row(row, action)
+        self.add_to_objects(symbol)
+        delta = self.apply_symbol(symbol)
+        self.grid.flush_damage()
+        self.push_latest_action(symbol, delta=delta)
+
+    # character/component symbol
+
+    def on_list_components(self):
+        """Publish the names of all library components, this loads all libraries (on the first browse, not at startup)."""
+        all_components = [key for key in self.complib.components]
+        if self.complib.nr_libraries() == 1:
+            msg = _("One library loaded, total number of components: {0}").format(self.complib.nr_components())
+        else:
+            msg = _("{0} libraries loaded, total number of components: {1}").format(self.complib.nr_libraries(),
+                                                                                    self.complib.nr_components())
+        pub.sendMessage('STATUS_MESSAGE', msg=msg)
+        pub.sendMessage('ALL_COMPONENTS', list=all_components)
+
+    def on_character_changed(self, char):
+        symbol = Character(char)
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        pub.sendMessage('CHARACTER_SELECTED', char=symbol)
+
+    def on_component_changed(self, label):
+        symbol = self.complib.get_symbol(label)
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        pub.sendMessage('STATUS_MESSAGE', msg='')
+        pub.sendMessage('SYMBOL_SELECTED', symbol=symbol)
+        pub.sendMessage('ORIENTATION_CHANGED', ori=symbol.ori_as_str)
+
+    def on_rotate_symbol(self):
+        first = True
+        for obj in self.selected_objects:
+            obj.symbol.rotate()
+            # show the orientation of a single, or the first, symbol in the statusbar
+            if first:
+                first = False
+                pub.sendMessage('ORIENTATION_CHANGED', ori=obj.symbol.ori_as_str)
+
+    def on_mirror_symbol(self):
+        for obj in self.selected_objects:
+            obj.symbol.mirrored = 1 - obj.symbol.mirrored  # toggle 0/1
+
+    def on_paste_text(self, symbol):
+        self.paste_symbol(symbol)
+
+    def on_paste_objects(self, pos):
+        """
+        Paste selection.
+        :param pos: the target position in grid (col, row) coordinates.
+        """
+        with self.transaction():
+            for obj in self.selected_objects:
+                offset = pos - obj.startpos
+                # TODO make the position translation a Symbol method?
+                symbol = obj.symbol.copy()
+                symbol.startpos += offset
+                symbol.endpos += offset
+                self.add_to_objects(symbol)
+                delta = self.apply_symbol(symbol)
+                self.record_action(Action(action=INSERT, symbol=symbol, delta=delta))
+
+    def paste_symbol(self, symbol):
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        self.add_to_objects(symbol)
+        delta = self.apply_symbol(symbol)
+        self.grid.flush_damage()
+        self.push_latest_action(symbol, delta=delta)
+
+    # lines
+
+    def on_paste_line(self, startpos, endpos, type):
+        symbol = Line(startpos, endpos, type)
+        self.paste_symbol(symbol)
+
+    def on_paste_dir_line(self, startpos, endpos):
+        symbol = DirLine(startpos, endpos)
+        self.paste_symbol(symbol)
+
+    def on_paste_mag_line(self, startpos, endpos):
+        symbol = MagLine(startpos, endpos, self.cell_callback, neighbourhood_callback=self.neighbourhood_callback)
+        # symbol = MagLineOld(startpos, endpos, self.cell_callback, neighbourhood_callback=self.neighbourhood_callback)
+        self.paste_symbol(symbol)
+
+    def on_paste_mag_line_w_type(self, startpos, endpos, type):
+        # backward compatibility
+        # the lines of a bulk load do not report their terminals in the status bar
+        report_status = not self._bulk_loading
+        if type == 1:
+            symbol = MagLine(startpos, endpos, self.cell_callback, neighbourhood_callback=self.neighbourhood_callback,
+                             report_status=report_status)
+        else:
+            symbol = MagLineOld(startpos, endpos, self.cell_callback, neighbourhood_callback=self.neighbourhood_callback,
+                                report_status=report_status)
+        self.paste_symbol(symbol)
+
+    def on_paste_rect(self, startpos, endpos):
+        symbol = Rect(startpos, endpos)
+        self.paste_symbol(symbol)
+
+    def on_paste_arrow(self, startpos, endpos):
+        symbol = Arrow(startpos, endpos)
+        self.paste_symbol(symbol)
+
+    # clipboard
+
+    def on_load_ascii_from_file(self, filename):
+        try:
+            file = open(filename, 'r')
+            str = file.readlines()
+            startpos = Pos(0, 0)
+            pos = Pos(0, 0)
+            for line in str:
+                # create a TEXT instance for each line
+                # fill selected_objects...
+                symbol = Text(pos, line)
+                selection = SelectedObjects(startpos=startpos, symbol=symbol)
+                pos += Pos(0, 1)
+                self.selected_objects.append(selection)
+            file.close()
+            pub.sendMessage('OBJECTS_SELECTED', objects=self.selected_objects)
+            return True
+
+        except IOError as e:
+            msg = _("Unable to open file for reading: {} error({}): {}").format(filename, e.errno, e.strerror)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=WARNING)
+            return False
+
+        except UnicodeDecodeError as e:
+            msg = _("Unable to open file for reading: {} error({}): {}").format(filename, e.encoding, e.reason)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=WARNING)
+            return False
+
+    # other
+
+    def on_erase(self, startpos, size):
+        """Erase an area of the given size."""
+        symbol = Eraser(size, startpos)
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        self.add_to_objects(symbol)
+        delta = self.apply_symbol(symbol)
+        self.grid.flush_damage()
+        self.push_latest_action(symbol, delta=delta)
+
+    def on_eraser_selected(self, size):
+        """Select eraser of the given size."""
+        symbol = Eraser(size)
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        pub.sendMessage('SYMBOL_SELECTED', symbol=symbol)
+
+    def select_all_objects(self):
+        """Select all objects."""
+        selection = []
+        for symbol in self.objects.values():
+            sel = SelectedObjects(symbol.startpos, symbol)
+            selection.append(sel)
+        return selection
+
+    def on_select_rect(self):
+        """Select multiple objects."""
+        pub.sendMessage('NOTHING_SELECTED')
+        pub.sendMessage('SELECTING_RECT', objects=self.select_all_objects())
+        msg = _("Selecting rectangle...")
+        pub.sendMessage('STATUS_MESSAGE', msg=msg)
+
+    def on_select_object(self):
+        """Select individual objects."""
+        pub.sendMessage('NOTHING_SELECTED')
+        pub.sendMessage('SELECTING_OBJECT', objects=self.select_all_objects())
+
+    # file open/save
+
+    # TODO naar eigen file of class zetten
+
+    def on_write_to_file(self, filename):
+        try:
+            fout = open(filename, 'w')
+            str = ""
+            for symbol in self.objects.values():
+                str += symbol.memo() + "\n"
+            fout.write(str)
+            fout.close()
+            self.filename = filename
+            msg = _("Schema has been saved in: {}").format(filename)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg)
+            # in case we have saved a new file, we now have an opened file
+            pub.sendMessage('FILE_OPENED')
+            return True
+
+        except IOError:
+            msg = _("Unable to open file for writing: {}").format(filename)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=ERROR)
+            return False
+
+    def on_write_to_ascii_file(self, filename, strip=False):
+        try:
+            fout = open(filename, 'w')
+            self.grid.write_to(fout, strip)
+            fout.close()
+            self.filename = filename
+            msg = _("ASCII Schema has been saved in: {}").format(filename)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg)
+            return True
+
+        except IOError:
+            msg = _("Unable to open file for writing: %s" % filename)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=ERROR)
+            return False
+
+    def on_read_from_file(self, filename):
+        self.filename = filename
+        try:
+            file = open(filename, 'r')
+            str = file.readlines()
+            # start with a fresh grid
+            self.init_stack()
+            self.init_grid()
+            memo = []
+            for line in str:
+                memo.append(line)
+            file.close()
+
+            skipped = self.bulk_load(memo_parser.parse(memo, legacy=self._import_legacy))
+
+            # TODO only the basename in statusbar, or truncated path, e.g. when the full path exceeds length x
+            base = os.path.basename(filename)
+            if skipped > 0:
+                msg = _("{0} lines skipped in: {1}").format(skipped, base)
+            else:
+                msg = _("File: {}").format(base)
+
+            pub.sendMessage('STATUS_MESSAGE', msg=msg)
+            pub.sendMessage('FILE_OPENED')
+            pub.sendMessage('NOTHING_SELECTED')
+            return True
+
+        except IOError as e:
+            msg = _("Unable to open file for reading: {} error({}): {}").format(filename, e.errno, e.strerror)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=ERROR)
+            return False
+
+        except UnicodeDecodeError as e:
+            msg = _("Unable to open file for reading: {} error({}): {}").format(filename, e.encoding, e.reason)
+            pub.sendMessage('STATUS_MESSAGE', msg=msg, type=ERROR)
+            return False
+
+    def play_memo(self, memo):
+        return self.play_records(memo_parser.parse(memo))
+
+    def play_memo_original_aac(self, memo):
+        return self.play_records(memo_parser.parse(memo, legacy=True))
+
+    def play_records(self, records):
+        """
+        Paste the parsed memo records.
+        :param records: iterable of memo_parser records
+        :returns the number of skipped lines
+        """
+        skipped = 0
+        for record in records:
+            kind = type(record)
+            if kind is memo_parser.Component:
+                symbol = self.complib.get_symbol_byid(record.id)
+                symbol.ori = record.ori
+                symbol.mirrored = record.mirrored
+                self.paste_record(symbol, record.pos)
+
+            elif kind is memo_parser.Character:
+                self.paste_record(Character(record.char), record.pos)
+
+            elif kind is memo_parser.Eraser:
+                self.paste_record(Eraser(record.size), record.pos)
+
+            elif kind is memo_parser.Text:
+                self.paste_record(Text(record.pos, record.text, record.ori), record.pos)
+
+            elif kind is memo_parser.Line:
+                self.on_paste_line(record.startpos, record.endpos, record.type)
+
+            elif kind is memo_parser.MagLine:
+                self.on_paste_mag_line_w_type(record.startpos, record.endpos, record.type)
+
+            elif kind is memo_parser.DirLine:
+                self.on_paste_dir_line(record.startpos, record.endpos)
+
+            elif kind is memo_parser.Rect:
+                self.on_paste_rect(record.startpos, record.endpos)
+
+            elif kind is memo_parser.Arrow:
+                self.on_paste_arrow(record.startpos, record.endpos)
+
+            elif kind is memo_parser.Column:
+                self.on_grid_col(record.col, record.action)
+
+            elif kind is memo_parser.Row:
+                self.on_grid_row(record.row, record.action)
+
+            else:
+                if not self._bulk_loading:
+                    msg = _("skipped linenr: {}").format(record.linenr)
+                    pub.sendMessage('STATUS_MESSAGE', msg=msg, type=WARNING)
+                skipped += 1
+        return skipped
+
+    def bulk_load(self, records):
+        """
+        Paste the memo records without undo recording and notifications, e.g. to load a file.
+
+        The grid damage and the undo state are published once, at the end.
+        :param records: iterable of memo_parser records
+        :returns the number of skipped lines
+        """
+        self._bulk_loading = True
+        self.grid.hold_damage = True
+        try:
+            skipped = self.play_records(records)
+        finally:
+            self._bulk_loading = False
+            self.grid.hold_damage = False
+        self.grid.flush_damage()
+        pub.sendMessage('UNDO_CHANGED', undo=len(self.latest_action) > 0)
+        return skipped
+
+    def paste_record(self, symbol, pos):
+        self.selected_objects = []
+        self.add_selected_object(symbol)
+        self.on_paste_objects(pos)
@@ -0,0 +1,187 @@
+"""
+AACircuit
+2020-03-02 JvO
+
+Batch conversion of AACircuit files to ASCII, PDF and SVG, without GUI.
+
+usage: aacircuit-render [-h] [-f {ascii,pdf,svg}] [-o DIR] [-j JOBS] [--engine {array,auto,list,sparse}] [--legacy] [--strip] [--force] FILE [FILE ...]
+e.g.: aacircuit-render -f ascii -f pdf -j 4 -o build/schematics 'docs/**/*.aac'
+"""
+
+import os
+import sys
+import glob
+import argparse
+import collections
+import multiprocessing
+
+from application import memo_parser
+
+FORMATS = {'ascii': '.txt', 'pdf': '.pdf', 'svg': '.svg'}
+# the grid storage engines, 'array' needs NumPy
+ENGINES = ['array', 'auto', 'list', 'sparse']
+
+# engine: name of the grid storage engine, 'auto': chosen by the grid size
+Job = collections.namedtuple('Job', ['filename', 'outputs', 'legacy', 'strip', 'engine'], defaults=['auto'])
+# outputs: the files written, skipped: the memo records (Skipped) that were not understood
+Result = collections.namedtuple('Result', ['filename', 'outputs', 'skipped', 'error'])
+
+# the model, one per (worker) process
+_controller = None
+
+
+def controller():
+    global _controller
+    if _controller is None:
+        # imported here, so that a worker process only loads the model when it has work to do
+        from application.model_controller import ModelController
+        _controller = ModelController()
+    return _controller
+
+
+def engine_class(engine):
+    """
+    Return the grid storage engine (class) by its name.
+    :param engine: 'list', 'array', 'sparse' or 'auto'
+    :returns the grid class, None for 'auto' (chosen by the grid size)
+    """
+    if engine == 'auto':
+        return None
+    from application.model_controller import GRID_ENGINES
+    if engine not in GRID_ENGINES:
+        raise ValueError("grid engine '{0}' is not available".format(engine))
+    return GRID_ENGINES[engine]
+
+
+def output_files(filename, formats, output_dir=None):
+    """Return the output filename for each format."""
+    base = os.path.splitext(os.path.basename(filename))[0]
+    if output_dir is None:
+        output_dir = os.path.dirname(filename)
+    return [(format, os.path.join(output_dir, base + FORMATS[format])) for format in formats]
+
+
+def up_to_date(filename, outputs):
+    """Return True if all outputs exist and are not older than the input file."""
+    mtime = os.stat(filename).st_mtime_ns
+    for format, output in outputs:
+        try:
+            if os.stat(output).st_mtime_ns < mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def render(job):
+    """
+    Play the memo of a file and write the outputs.
+    :param job: Job
+    :returns Result
+    """
+    try:
+        with open(job.filename, 'r') as file:
+            records = list(memo_parser.parse(file.readlines(), legacy=job.legacy))
+        c = controller()
+        c.grid_class = engine_class(job.engine)
+        c.init_stack()
+        c.init_grid()
+        c.bulk_load(records)
+        grid = c.grid
+        for format, output in job.outputs:
+            if format == 'ascii':
+                with open(output, 'w') as fout:
+                    grid.write_to(fout, job.strip)
+            elif format == 'pdf':
+                # imported here, ASCII conversion does not need (py)cairo
+                from application import drawing
+                drawing.write_pdf(grid, output)
+            elif format == 'svg':
+                from application import drawing
+                drawing.write_svg(grid, output)
+        skipped = [record for record in records if isinstance(record, memo_parser.Skipped)]
+        return Result(job.filename, [output for format, output in job.outputs], skipped, None)
+
+    except (IOError, UnicodeDecodeError) as e:
+        return Result(job.filename, [], [], str(e))
+    except Exception as e:
+        # report the failure of this file, without aborting the conversion of the others
+        return Result(job.filename, [], [], "{0}: {1}".format(type(e).__name__, e))
+
+
+def expand(patterns):
+    """Return the filenames that match the given filenames or (recursive) glob patterns, in order and without duplicates."""
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if len(matches) == 0:
+            # not a pattern, or no match: report it as an error later on
+            matches = [pattern]
+        for filename in matches:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog='aacircuit-render',
+                                     description="Convert AACircuit files to ASCII, PDF or SVG.")
+    parser.add_argument('files', metavar='FILE', nargs='+',
+                        help="AACircuit file or (quoted) glob pattern, e.g. 'docs/**/*.aac'")
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS), action='append',
+                        help="output format, can be repeated (default: ascii)")
+    parser.add_argument('-o', '--output-dir', metavar='DIR',
+                        help="directory for the output files (default: next to the input file)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help="grid storage engine (default: auto, an array for a large grid if NumPy is installed)")
+    parser.add_argument('--legacy', action='store_true',
+                        help="read original (Delphi/Pascal) AACircuit files")
+    parser.add_argument('--strip', action='store_true',
+                        help="strip the trailing blanks and blank rows from the ASCII output")
+    parser.add_argument('--force', action='store_true',
+                        help="also convert files of which the outputs are up to date")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """
+    Convert the files.
+    :returns the exit status: 0 if all files are converted completely, 1 otherwise
+    """
+    args = parse_args(sys.argv[1:] if args is None else args)
+    formats = args.format or ['ascii']
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = []
+    nr_up_to_date = 0
+    for filename in expand(args.files):
+        outputs = output_files(filename, formats, args.output_dir)
+        if not args.force and os.path.exists(filename) and up_to_date(filename, outputs):
+            nr_up_to_date += 1
+            continue
+        jobs.append(Job(filename, outputs, args.legacy, args.strip, args.engine))
+
+    if args.jobs > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(min(args.jobs, len(jobs))) as pool:
+            results = pool.map(render, jobs, chunksize=1)
+    else:
+        results = [render(job) for job in jobs]
+
+    status = 0
+    for result in results:
+        if result.error is not None:
+            print("{0}: {1}".format(result.filename, result.error), file=sys.stderr)
+            status = 1
+        for record in result.skipped:
+            print("{0}:{1}: skipped: {2}".format(result.filename, record.linenr, record.line.rstrip('\n')), file=sys.stderr)
+            status = 1
+    nr_converted = len([result for result in results if result.error is None])
+    print("{0} converted, {1} up to date, {2} failed".format(nr_converted, nr_up_to_date, len(results) - nr_converted))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
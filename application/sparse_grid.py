@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+"""
+AACircuit
+2020-03-02 JvO
+"""
+
+from gettext import gettext as _
+from application import CELL_DEFAULT, CELL_EMPTY, CELL_ERASE
+from application.grid import Grid, Snapshot
+
+# tile size (in cols and rows)
+TILE = 32
+
+
+class SparseGrid(Grid):
+    """
+    Grid that stores only non-empty cells, in fixed-size tiles.
+
+    A tile is allocated on the first write of a non-empty cell and released when its last
+    non-empty cell is erased. Empty regions read back as CELL_DEFAULT, so memory use and the cost
+    of erasing and of row/column insertion and removal are proportional to the content,
+    not to the grid dimensions.
+    """
+
+    def __init__(self, cols=5, rows=5):
+        self._cols = cols
+        self._rows = rows
+        # (tile row, tile col) -> TILE x TILE list of lists
+        self._tiles = dict()
+        # (tile row, tile col) -> number of non-empty cells in the tile
+        self._counts = dict()
+        # (tile row, tile col) of the tiles that are shared with a snapshot, see snapshot()
+        self._shared = set()
+        self._damaged = dict()
+        self._clipped = False
+
+    def __str__(self):
+        str = _("number of rows: {0} columns: {1}\n").format(self.nr_rows, self.nr_cols)
+        for r in range(self.nr_rows):
+            str += "{0}\n".format(self.row(r))
+        return str
+
+    @property
+    def grid(self):
+        return [self.row(r) for r in range(self.nr_rows)]
+
+    @property
+    def nr_rows(self):
+        return self._rows
+
+    @property
+    def nr_cols(self):
+        return self._cols
+
+    @property
+    def nr_tiles(self):
+        """Return the number of allocated tiles."""
+        return len(self._tiles)
+
+    def row(self, row):
+        line = [CELL_DEFAULT] * self._cols
+        t_row, r = divmod(row, TILE)
+        for t_col in range((self._cols + TILE - 1) // TILE):
+            tile = self._tiles.get((t_row, t_col))
+            if tile is not None:
+                c_start = t_col * TILE
+                c_end = min(c_start + TILE, self._cols)
+                line[c_start:c_end] = tile[r][:c_end - c_start]
+        return line
+
+    def col(self, col):
+        column = [CELL_DEFAULT] * self._rows
+        t_col, c = divmod(col, TILE)
+        for t_row in range((self._rows + TILE - 1) // TILE):
+            tile = self._tiles.get((t_row, t_col))
+            if tile is not None:
+                r_start = t_row * TILE
+                for r in range(r_start, min(r_start + TILE, self._rows)):
+                    column[r] = tile[r - r_start][c]
+        return column
+
+    def _raw_lines(self):
+        """Generate the grid rows as strings."""
+        blank = CELL_DEFAULT * self._cols
+        occupied = set(t_row for t_row, t_col in self._tiles)
+        for r in range(self._rows):
+            if r // TILE in occupied:
+                yield "".join(self.row(r))
+            else:
+                yield blank
+
+    # grid manipulation
+
+    def _index(self, col, row):
+        """Return the (non-negative) column and row index, or None if outside the grid."""
+        # negative indices count from the end, as for the list based grid
+        if col < 0:
+            col += self._cols
+        if row < 0:
+            row += self._rows
+        if col < 0 or row < 0 or col >= self._cols or row >= self._rows:
+            return None
+        return col, row
+
+    def _get(self, col, row):
+        tile = self._tiles.get((row // TILE, col // TILE))
+        if tile is None:
+            return CELL_DEFAULT
+        return tile[row % TILE][col % TILE]
+
+    def _put(self, col, row, value):
+        """Store a cell value, (de)allocating tiles as needed; return True if the cell changed."""
+        key = (row // TILE, col // TILE)
+        tile = self._tiles.get(key)
+        if tile is None:
+            if value == CELL_DEFAULT:
+                return False
+            tile = [[CELL_DEFAULT] * TILE for i in range(TILE)]
+            self._tiles[key] = tile
+            self._counts[key] = 0
+        r = row % TILE
+        c = col % TILE
+        old = tile[r][c]
+        if old == value:
+            return False
+        if key in self._shared:
+            # copy on the first write
+            self._shared.discard(key)
+            tile = [list(line) for line in tile]
+            self._tiles[key] = tile
+        tile[r][c] = value
+        if old == CELL_DEFAULT:
+            self._counts[key] += 1
+        elif value == CELL_DEFAULT:
+            self._counts[key] -= 1
+            if self._counts[key] == 0:
+                del self._tiles[key]
+                del self._counts[key]
+                self._shared.discard(key)
+        return True
+
+    def _cells(self):
+        """Generate the (col, row, value) of all non-empty cells."""
+        for (t_row, t_col), tile in self._tiles.items():
+            for r, line in enumerate(tile):
+                for c, value in enumerate(line):
+                    if value != CELL_DEFAULT:
+                        yield t_col * TILE + c, t_row * TILE + r, value
+
+    def _move_cells(self, move):
+        """
+        Relocate all non-empty cells.
+        :param move: function (col, row) -> (col, row) with the new position, or None to drop the cell
+        """
+        cells = list(self._cells())
+        self._tiles = dict()
+        self._counts = dict()
+        self._shared = set()
+        for col, row, value in cells:
+            new = move(col, row)
+            if new is not None:
+                col, row = new
+                if col < self._cols and row < self._rows:
+                    self._put(col, row, value)
+                else:
+                    # moved outside the grid
+                    self._clipped = True
+
+    def cell(self, pos):
+        index = self._index(*pos.xy)
+        if index is None:
+            return ' '
+        # a negative position wraps around
+        return self._get(*index)
+
+    def neighbourhood(self, pos):
+        col, row = pos.xy
+        cells = []
+        for r in (row - 1, row, row + 1):
+            for c in (col - 1, col, col + 1):
+                index = self._index(c, r)
+                if index is None:
+                    cells.append(' ')
+                    continue
+                # a negative position wraps around
+                cells.append(self._get(*index))
+        return cells
+
+    def set_cell(self, pos, value):
+        index = self._index(*pos.xy)
+        if index is None:
+            self._lost(value)
+            return
+        # a negative position wraps around
+        if index != pos.xy:
+            self._lost(value)
+        # hex zero 'erases' content
+        if value == CELL_ERASE:
+            value = CELL_EMPTY
+        # space character is 'transparent'
+        elif value == ' ':
+            return
+        old = self._get(*index) if self.journal is not None else None
+        if self._put(index[0], index[1], value):
+            if old is not None:
+                self.journal.record(index[0], index[1], old, value)
+            self.damage_cell(*index)
+
+    def erase(self):
+        """Erase all grid content."""
+        if self.journal is not None:
+            for col, row, value in self._cells():
+                self.journal.record(col, row, value, CELL_DEFAULT)
+        self._tiles = dict()
+        self._counts = dict()
+        self._shared = set()
+        self.damage()
+
+    def copy(self, cols=None, rows=None):
+        """
+        Return a copy of the grid, optionally with other dimensions.
+
+        The content is copied from the upper left corner, cropped or padded with empty cells.
+        :param cols, rows: the dimensions of the copy, default the dimensions of this grid
+        """
+        if cols is None:
+            cols = self._cols
+        if rows is None:
+            rows = self._rows
+        grid = self.__class__(cols, rows)
+        grid._clipped = self._clipped
+        for col, row, value in self._cells():
+            if col < cols and row < rows:
+                grid._put(col, row, value)
+            else:
+                grid._clipped = True
+        return grid
+
+    def snapshot(self):
+        """
+        Return a read-only view of the grid content as it is now, e.g. for a checkpoint.
+
+        The snapshot shares the tiles with this grid, this grid copies a shared tile on its first write to it.
+        """
+        grid = SparseGridSnapshot.__new__(SparseGridSnapshot)
+        grid._share(self)
+        self._shared = set(self._tiles)
+        return grid
+
+    def _share(self, grid):
+        """Take the dimensions and (shared) tiles of the grid."""
+        self._cols = grid._cols
+        self._rows = grid._rows
+        self._tiles = dict(grid._tiles)
+        self._counts = dict(grid._counts)
+        self._shared = set()
+        self._damaged = dict()
+        self._clipped = grid._clipped
+
+    def rect(self, rect):
+        """
+        Return the content of the given rectangle.
+        :param rect: the canvas position (Pos) of the upper left corner (row, column) and bottom-right corner of the rectangle
+        :returns the content of the given rectangle
+        """
+        c_start, r_start, c_end, r_end = self.rect_to_rc(rect)
+        c_end = min(c_end, self._cols)
+        r_end = min(r_end, self._rows)
+        return [[self._get(c, r) for c in range(c_start, c_end)] for r in range(r_start, r_end)]
+
+    def erase_rect(self, rect):
+        """
+        Erase a rectangle its content.
+        :param rect: rectangle upper-left corner and bottom-right corner (row, column) tuple
+        """
+        c_start, r_start, c_end, r_end = self.rect_to_rc(rect)
+        c_end = min(c_end, self._cols)
+        r_end = min(r_end, self._rows)
+        # visit the allocated tiles only
+        for (t_row, t_col) in list(self._tiles.keys()):
+            for r in range(max(r_start, t_row * TILE), min(r_end, (t_row + 1) * TILE)):
+                for c in range(max(c_start, t_col * TILE), min(c_end, (t_col + 1) * TILE)):
+                    old = self._get(c, r)
+                    if self._put(c, r, CELL_DEFAULT) and self.journal is not None:
+                        self.journal.record(c, r, old, CELL_DEFAULT)
+        self.damage(c_start, r_start, c_end - c_start, r_end - r_start)
+
+    def fill_rect(self, pos, content):
+        """
+        Fill a rectangle.
+        :param pos: rectangle upper left corner (row, column) tuple
+        :param content: 2D array
+        """
+        self.blit(pos, content)
+
+    def blit(self, pos, content):
+        """
+        Copy a block of characters onto the grid.
+
+        Space characters are transparent, hex zero erases the underlying cell.
+        :param pos: upper left corner (col, row) of the block
+        :param content: list of rows, each row a string or a list of characters
+        """
+        c_start, r_start = pos.xy
+        for y, row in enumerate(content, r_start):
+            if y < 0 or y >= self._rows:
+                for char in row:
+                    self._lost(char)
+                continue
+            for x, char in enumerate(row, c_start):
+                if x < 0 or x >= self._cols:
+                    self._lost(char)
+                    continue
+                # hex zero 'erases' content
+                if char == CELL_ERASE:
+                    char = CELL_EMPTY
+                # space character is 'transparent'
+                elif char == ' ':
+                    continue
+                old = self._get(x, y) if self.journal is not None else None
+                if self._put(x, y, char):
+                    if old is not None:
+                        self.journal.record(x, y, old, char)
+                    self.damage_cell(x, y)
+
+    def _remove_row(self, row):
+        if row >= 0 and row < self._rows:
+            self._move_cells(lambda c, r: None if r == row else (c, r - 1 if r > row else r))
+            self._rows -= 1
+            self.damage(0, row)
+
+    def _remove_col(self, col):
+        if col >= 0 and col < self._cols:
+            self._move_cells(lambda c, r: None if c == col else (c - 1 if c > col else c, r))
+            self._cols -= 1
+            self.damage(col, 0)
+
+    def _insert_row(self, row):
+        self._rows += 1
+        self._move_cells(lambda c, r: (c, r + 1 if r >= row else r))
+        self.damage(0, row)
+
+    def _insert_col(self, col):
+        self._cols += 1
+        self._move_cells(lambda c, r: (c + 1 if c >= col else c, r))
+        self.damage(col, 0)
+
+    def remove_row(self, row):
+        """Remove a row from the grid, without changing its dimensions."""
+        if row >= 0 and row < self._rows:
+            self._move_cells(lambda c, r: None if r == row else (c, r - 1 if r > row else r))
+            self.damage(0, row)
+
+    def remove_col(self, col):
+        """Remove a column from the grid, without changing its dimensions."""
+        if col >= 0 and col < self._cols:
+            self._move_cells(lambda c, r: None if c == col else (c - 1 if c > col else c, r))
+            self.damage(col, 0)
+
+    def insert_row(self, row):
+        """Insert a row to the grid, without changing its dimensions."""
+        if row >= 0 and row < self._rows:
+            self._move_cells(lambda c, r: (c, r + 1 if r >= row else r))
+            self.damage(0, row)
+
+    def insert_col(self, col):
+        """Insert a column to the grid, without changing its dimensions."""
+        if col >= 0 and col < self._cols:
+            self._move_cells(lambda c, r: (c + 1 if c >= col else c, r))
+            self.damage(col, 0)
+
+
+class SparseGridSnapshot(Snapshot, SparseGrid):
+    """Snapshot of a SparseGrid, that shares its tiles with the grid."""
+
+    def copy(self, cols=None, rows=None):
+        # the tiles are shared, the grid copies a tile on its first write to it
+        grid = SparseGrid.__new__(SparseGrid)
+        grid._share(self)
+        grid._shared = set(self._tiles)
+        return self._resized(grid, cols, rows)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+AACircuit
+2020-03-02 JvO
+"""
+
+# bucket size (in cols and rows)
+BUCKET = 16
+
+
+class SpatialIndex(object):
+    """
+    Index of the symbols on the grid by their pick-point, in a uniform grid of buckets.
+
+    Lookups return the symbols in the order they were inserted, as if the list of objects was scanned.
+    The pick-point of a symbol is taken on insertion, a symbol must not be moved while it is indexed.
+    """
+
+    def __init__(self):
+        # (bucket col, bucket row) -> {id(symbol): (sequence nr, pick-point (col, row), symbol)}
+        self._buckets = dict()
+        # id(symbol) -> (bucket col, bucket row)
+        self._keys = dict()
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def insert(self, symbol):
+        col, row = symbol.pickpoint_pos.xy
+        key = (col // BUCKET, row // BUCKET)
+        bucket = self._buckets.setdefault(key, dict())
+        bucket[id(symbol)] = (self._seq, (col, row), symbol)
+        self._keys[id(symbol)] = key
+        self._seq += 1
+
+    def remove(self, symbol):
+        key = self._keys.pop(id(symbol), None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        del bucket[id(symbol)]
+        if len(bucket) == 0:
+            del self._buckets[key]
+
+    def clear(self):
+        self._buckets = dict()
+        self._keys = dict()
+
+    def at(self, pos):
+        """Return the symbols with their pick-point at the given position."""
+        col, row = pos.xy
+        bucket = self._buckets.get((col // BUCKET, row // BUCKET), dict())
+        found = [(seq, symbol) for seq, xy, symbol in bucket.values() if xy == (col, row)]
+        found.sort(key=lambda x: x[0])
+        return [symbol for seq, symbol in found]
+
+    def in_rect(self, rect):
+        """
+        Return the symbols with their pick-point within the given rectangle.
+        :param rect: the upper left (Pos) and bottom right (Pos, exclusive) coordinates of the rectangle
+        """
+        ul, br = rect
+        c_start, r_start = ul.xy
+        c_end, r_end = br.xy
+        if c_start >= c_end or r_start >= r_end:
+            return []
+        bc_start = c_start // BUCKET
+        br_start = r_start // BUCKET
+        bc_end = (c_end - 1) // BUCKET + 1
+        br_end = (r_end - 1) // BUCKET + 1
+        # visit the buckets within the rectangle, or all (non-empty) buckets if there are fewer of those
+        if (bc_end - bc_start) * (br_end - br_start) <= len(self._buckets):
+            keys = [(b_col, b_row) for b_row in range(br_start, br_end) for b_col in range(bc_start, bc_end)]
+        else:
+            keys = [key for key in self._buckets
+                    if key[0] >= bc_start and key[0] < bc_end and key[1] >= br_start and key[1] < br_end]
+        found = []
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for seq, (col, row), symbol in bucket.values():
+                if col >= c_start and col < c_end and row >= r_start and row < r_end:
+                    found.append((seq, symbol))
+        found.sort(key=lambda x: x[0])
+        return [symbol for seq, symbol in found]
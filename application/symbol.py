@@ -3,6 +3,7 @@ AACircuit
 2020-03-02 JvO
 '''
 
+import collections
 import copy
 import json
 import re
@@ -29,6 +30,42 @@ def show_text(ctx, x, y, text):
     return
 
 
+# symbol grid for one orientation and mirroring, with its non-blank cells (col, row, char) and pick-point column offset
+Variant = collections.namedtuple('variant', ['grid', 'cells', 'pickpoint'])
+
+
+def compose_variants(grid):
+    """
+    Compose the orientation/mirror variants of a symbol.
+
+    :param grid: the character-grids of the symbol, per orientation
+    :returns dictionary of (ori, mirrored) and the Variant, for the orientations present in the grid
+    """
+    variants = dict()
+    for ori, key in Symbol.ORIENTATION.items():
+        if key not in grid:
+            continue
+        for mirrored in (0, 1):
+            rows = grid[key]
+            if mirrored == 1:
+                rows = Symbol.mirror(rows)
+            cells = []
+            for r, row in enumerate(rows):
+                for c, char in enumerate(row):
+                    if char != ' ':
+                        cells.append((c, r, char))
+            # pick-point left of the first non-blank character in the first row
+            found = None
+            if len(rows) > 0:
+                found = re.search(r'\S', rows[0])
+            if found:
+                x_offset = found.start() - 1
+            else:
+                x_offset = 0
+            variants[(ori, mirrored)] = Variant(rows, tuple(cells), x_offset)
+    return variants
+
+
 class Symbol(object):
     """
     Symbol represented by a grid.
@@ -39,11 +76,15 @@ class Symbol(object):
     :param mirrored: set to 1 to mirror the symbol vertically
     :param startpos: the upper-left corner (col,row) coordinate of the character-grid
     :param endpos: used in subclasses, e.g. Line
+    :param variants: the orientation/mirror variants of the grid (see compose_variants), composed on first use if not given
     """
 
     ORIENTATION = {0: "N", 1: "E", 2: "S", 3: "W"}
 
-    def __init__(self, id=0, grid=None, ori=None, mirrored=None, startpos=None, endpos=None):
+    # incremented to invalidate all cached representations, e.g. when the preferences change
+    _repr_generation = 0
+
+    def __init__(self, id=0, grid=None, ori=None, mirrored=None, startpos=None, endpos=None, variants=None):
         self._id = id
         self._has_pickpoint = True
         if ori is None:
@@ -66,9 +107,16 @@ class Symbol(object):
             self._endpos = Pos(0, 0)
         else:
             self._endpos = endpos
+        self._variants = variants
+        # identifies the symbol once placed on the grid (see Controller)
+        self._handle = None
         self._is_symbol = True
         self._is_text = False
         self._is_line = False
+        # the representation does not depend on the start position, other than by translation
+        self._translatable = True
+        # (key, representation relative to the start position)
+        self._repr_cache = None
 
     def __str__(self):
         str = _("Class: {0} id: {1} ori: {2} startpos: {3}").format(self.__class__.__name__, self._id, self.ORIENTATION[self._ori], self.startpos)
@@ -76,15 +124,54 @@ class Symbol(object):
 
     def _representation(self):
         self._repr = dict()
-        pos = self._startpos
-        incr = Pos(1, 0)
-        for row in self.grid:
-            pos.x = self._startpos.x
-            for char in row:
-                if char != ' ':
-                    self._repr[pos] = char
-                pos += incr
-            pos += Pos(0, 1)
+        x0, y0 = self._startpos.xy
+        for col, row, char in self._variant().cells:
+            self._repr[Pos(x0 + col, y0 + row)] = char
+
+    @property
+    def variants(self):
+        """The orientation/mirror variants of the symbol, shared with its copies."""
+        if self._variants is None:
+            self._variants = compose_variants(self._grid)
+        return self._variants
+
+    def _variant(self):
+        """Return the variant for the current orientation and mirroring."""
+        mirrored = 1 if self._mirrored == 1 else 0
+        try:
+            return self.variants[(self._ori, mirrored)]
+        except KeyError:
+            return compose_variants(self.default)[(0, 0)]
+
+    def _repr_key(self):
+        """Return the symbol state the representation depends on."""
+        key = (self._ori, self._mirrored)
+        if not self._translatable:
+            key += (self._startpos.xy, self._endpos.xy)
+        return key
+
+    def _reads_valid(self):
+        """Return True if the grid cells the representation was composed from are unchanged."""
+        return True
+
+    def _relative_repr(self):
+        """
+        Return the representation relative to the start position.
+
+        The representation is composed once and cached, it is composed again only when its key
+        (orientation, mirroring, start/end position if not translatable) or the preferences changed,
+        or when the grid cells it was composed from (MagLine) changed.
+        :returns list of (col, row, char) tuples
+        """
+        key = (Symbol._repr_generation, self._repr_key())
+        cache = self._repr_cache
+        if cache is None or cache[0] != key or not self._reads_valid():
+            x0, y0 = self._startpos.xy
+            self._representation()
+            cells = [(pos.x - x0, pos.y - y0, char) for pos, char in self._repr.items()]
+            cache = (key, cells)
+            self._repr_cache = cache
+        return cache[1]
 
     @property
     def name(self):
@@ -118,13 +205,7 @@ class Symbol(object):
         '.......' => '.......x' => empty first line not expected, see the component library content
 
         """
-        first_row = self.grid[0]
-        found = re.search(r'\S', first_row)
-        if found:
-            x_offset = found.start()
-            x_offset -= 1
-        else:
-            x_offset = 0
+        x_offset = self._variant().pickpoint
         pos = Pos(self._startpos.x + x_offset, self._startpos.y)
         return pos
 
@@ -132,6 +213,14 @@ class Symbol(object):
     def id(self):
         return self._id
 
+    @property
+    def handle(self):
+        return self._handle
+
+    @handle.setter
+    def handle(self, value):
+        self._handle = value
+
     @property
     def ori_as_str(self):
         return Symbol.ORIENTATION[self._ori]
@@ -188,7 +277,8 @@ class Symbol(object):
         The representation in ASCII characters of the symbol on a grid.
         :returns a dictionary of positions in grid (col,row) coordinates and the character to be shown on each position.
         """
-        return self._repr
+        x0, y0 = self._startpos.xy
+        return {Pos(x0 + col, y0 + row): char for col, row, char in self._relative_repr()}
 
     def memo(self):
         """Return entry for the actions as recorded in the memo."""
@@ -200,17 +290,14 @@ class Symbol(object):
         mirrored = copy.deepcopy(self._mirrored)
         startpos = copy.deepcopy(self._startpos)
         endpos = copy.deepcopy(self._endpos)
-        return Symbol(id=self._id, grid=self._grid, ori=ori, mirrored=mirrored, startpos=startpos, endpos=endpos)
+        symbol = Symbol(id=self._id, grid=self._grid, ori=ori, mirrored=mirrored, startpos=startpos, endpos=endpos, variants=self._variants)
+        # the copy has the same (relative) representation
+        symbol._repr_cache = self._repr_cache
+        return symbol
 
     @property
     def grid(self):
-        try:
-            if self._mirrored == 1:
-                return self.mirror(self._grid[self.ORIENTATION[self._ori]])
-            else:
-                return self._grid[self.ORIENTATION[self._ori]]
-        except KeyError:
-            return self.default[self.ORIENTATION[0]]
+        return self._variant().grid
 
     def rotate(self):
         """Return the grid with the next (90 degrees clockwise rotated) orientation for this symbol."""
@@ -225,27 +312,52 @@ class Symbol(object):
         :param ctx: the Cairo context
         :param pos: target position in grid canvas (x,y) coordinates
         """
-        self._representation()
+        cells = self._relative_repr()
         if pos is None:
             pos = self._startpos.view_xy()
-        offset = pos - self._startpos.view_xy()
-        for pos, char in self._repr.items():
-            grid_pos = pos.view_xy() + offset
+        for col, row, char in cells:
+            grid_pos = Pos(col, row).view_xy() + pos
             show_text(ctx, grid_pos.x, grid_pos.y, char)
 
     def paste(self, grid):
         """Paste the symbol in the target grid at its start position."""
-        self._representation()
-        for pos, value in self._repr.items():
-            grid.set_cell(pos, value)
+        self._blit(grid)
 
     def remove(self, grid):
         """Remove the symbol from the target grid."""
-        self._representation()
-        for pos in self._repr.keys():
-            grid.set_cell(pos, CELL_ERASE)
+        self._blit(grid, erase=True)
 
-    def mirror(self, grid):
+    def _blit(self, grid, erase=False):
+        """
+        Copy the representation onto the grid as one block, in a single (vectorised) grid operation.
+
+        A symbol that is (partly) outside the grid is written cell by cell, to keep the clipping of set_cell.
+        :param grid: the target grid
+        :param erase: erase the cells of the representation instead of drawing them
+        """
+        cells = self._relative_repr()
+        if len(cells) == 0:
+            return
+        x0, y0 = self._startpos.xy
+        cols = [col for col, row, value in cells]
+        rows = [row for col, row, value in cells]
+        c_min, c_max = min(cols), max(cols)
+        r_min, r_max = min(rows), max(rows)
+        if x0 + c_min < 0 or y0 + r_min < 0 or x0 + c_max >= grid.nr_cols or y0 + r_max >= grid.nr_rows:
+            for col, row, value in cells:
+                grid.set_cell(Pos(x0 + col, y0 + row), CELL_ERASE if erase else value)
+            return
+        # space characters are transparent
+        block = [[' '] * (c_max - c_min + 1) for row in range(r_max - r_min + 1)]
+        for col, row, value in cells:
+            block[row - r_min][col - c_min] = CELL_ERASE if erase else value
+        if not erase and all(isinstance(value, str) for col, row, value in cells):
+            # rows of characters only are passed as strings, which an ArrayGrid converts at once
+            block = [''.join(row) for row in block]
+        grid.blit(Pos(x0 + c_min, y0 + r_min), block)
+
+    @staticmethod
+    def mirror(grid):
         """Return the symbol grid vertically mirrored."""
         # mirror specific characters
         switcher = {'/': '\\',
@@ -278,7 +390,7 @@ class Eraser(Symbol):
         """
         super(Eraser, self).__init__(grid=None, startpos=startpos)
         self._size = size
-        self._representation()
+        self._relative_repr()
 
     def _representation(self):
         self._repr = dict()
@@ -328,11 +440,11 @@ class Character(Symbol):
         self._char = char
         self._is_symbol = False
         self._is_text = True
-        self._representation()
+        self._relative_repr()
 
-    @property
-    def grid(self):
-        return self._grid[self.ORIENTATION[0]]
+    def _variant(self):
+        # one orientation only
+        return self.variants[(0, 0)]
 
     def memo(self):
         str = "{0}:{1},{2}".format(CHARACTER, self._id, self._startpos)
@@ -355,7 +467,7 @@ class Text(Symbol):
         self._text = text
         self._is_symbol = False
         self._is_text = True
-        self._representation()
+        self._relative_repr()
 
     def _representation(self):
         self._repr = dict()
@@ -379,9 +491,12 @@ class Text(Symbol):
                     pos += Pos(0, 1)
                 pos += Pos(1, 0)
 
-    @property
-    def grid(self):
-        return self._grid[self.ORIENTATION[0]]
+    def _repr_key(self):
+        return (self._ori, self._text)
+
+    def _variant(self):
+        # one orientation only
+        return self.variants[(0, 0)]
 
     @property
     def text(self):
@@ -428,7 +543,8 @@ class Line(Symbol):
         self._terminal = self.TERMINAL_TYPE[self._type]
         self._is_symbol = False
         self._is_line = True
-        self._representation()
+        self._translatable = False
+        self._relative_repr()
 
     def _direction(self):
         dx, dy = (self._endpos - self._startpos).xy
@@ -510,7 +626,6 @@ class DirLine(Line):
 
     def __init__(self, startpos, endpos):
         super(DirLine, self).__init__(startpos=startpos, endpos=endpos)
-        self._representation()
 
     def _representation(self):
         x, y = (self._endpos - self._startpos).xy
@@ -561,44 +676,52 @@ class MagLine(Line):
 
     ori_desc = {0: 'hor', 1: 'vert', 2: 'longest-first', None: 'None'}
 
-    def __init__(self, startpos, endpos, cell_callback=None, type=Line.MLINE):
-        self.cell = cell_callback
+    def __init__(self, startpos, endpos, cell_callback=None, type=Line.MLINE, neighbourhood_callback=None, report_status=True):
+        self._cell_callback = cell_callback
+        self._neighbourhood_callback = neighbourhood_callback
+        # False: no status messages, e.g. for the lines of a bulk load
+        self.report_status = report_status
+        # grid cells read to compose the representation, (col, row) -> content
+        self._reads = dict()
         super(MagLine, self).__init__(startpos=startpos, endpos=endpos, type=type)
-        self._representation()
 
-    def _line_match(self, idx, ori, pos):
+    def cell(self, pos):
+        """Return the grid cell content, and record it to validate the cached representation."""
+        value = self._cell_callback(pos)
+        self._reads[pos.xy] = value
+        return value
+
+    def neighbourhood(self, pos):
+        """Return the 3x3 block of grid cells around the position, row by row, and record them."""
+        x, y = pos.xy
+        if self._neighbourhood_callback is None:
+            cells = [self._cell_callback(Pos(x + i, y + j)) for j in (-1, 0, 1) for i in (-1, 0, 1)]
+        else:
+            cells = self._neighbourhood_callback(pos)
+        for k, value in enumerate(cells):
+            j, i = divmod(k, 3)
+            self._reads[(x + i - 1, y + j - 1)] = value
+        return cells
+
+    def _reads_valid(self):
+        for (x, y), value in self._reads.items():
+            if self._cell_callback(Pos(x, y)) != value:
+                return False
+        return True
+
+    def _line_match(self, ori, pos):
         """
-        Match a character in the grid against a Magic Line pattern.
+        Match a character in the grid against the Magic Line patterns.
 
-        :param idx: number of the line matching pattern to be used
-        :param ori: orientation of the line to be drawn
+        The 3x3 block around the position is read once, and looked up in the compiled patterns.
+        :param ori: orientation of the line to be drawn, None for any orientation
         :param pos: character position (col, row) coordinates
 
-        :return result: True if a match was found, otherwise False
-        :return ori: magic line orientation
-        :return char: terminal character
-
+        :return (number, ori, char) of the first matching pattern, None if no pattern matches
         """
-        lmd = MagicLineSettings.LMD[idx]
-        result = True
-        m_ori = None
-        m_char = None
-        if pos > Pos(0, 0) and (ori is None or ori == lmd.ori):
-            for j, row in enumerate(lmd.pattern):
-                for i, char in enumerate(row):
-                    if char != 'x':
-                        m_pos = pos + Pos(i - 1, j - 1)
-                        m_cell = self.cell(m_pos)
-                        if m_cell != char:
-                            result = False
-                            break
-            if result:
-                m_ori = lmd.ori
-                m_char = lmd.char
-                # print("line_match, idx:", idx, " m_ori:", m_ori, " m_char:", m_char)
-        else:
-            result = False
-        return result, m_ori, m_char
+        if not pos > Pos(0, 0):
+            return None
+        return MagicLineSettings.match(self.neighbourhood(pos), ori)
 
     def _representation(self):
         startpos = self._startpos
@@ -606,16 +729,18 @@ class MagLine(Line):
         dx = endpos.x - startpos.x
         dy = endpos.y - startpos.y
         self._repr = dict()
+        self._reads = dict()
         f_ori = None
         f_terminal = None
         s_ori = HORIZONTAL
 
         # determine the first line terminal
-        for i in range(len(MagicLineSettings.LMD)):
-            match, f_ori, f_terminal = self._line_match(i, None, startpos)
-            if match:
-                self._repr[startpos] = f_terminal
-                break
+        match = self._line_match(None, startpos)
+        if match is None:
+            i = len(MagicLineSettings.LMD) - 1
+        else:
+            i, f_ori, f_terminal = match
+            self._repr[startpos] = f_terminal
         # the orientation of the first line
         if f_ori is None:
             f_ori = HORIZONTAL
@@ -637,14 +762,18 @@ class MagLine(Line):
                 s_ori = HORIZONTAL
             else:
                 s_ori = VERTICAL
-        for i in range(len(MagicLineSettings.LMD)):
-            match, m_ori, m_terminal = self._line_match(i, s_ori, endpos)
-            if match:
-                # the end-terminal of the second line
-                self._repr[endpos] = m_terminal
-                break
+        match = self._line_match(s_ori, endpos)
+        if match is None:
+            i = len(MagicLineSettings.LMD) - 1
+            m_ori = None
+            m_terminal = None
+        else:
+            i, m_ori, m_terminal = match
+            # the end-terminal of the second line
+            self._repr[endpos] = m_terminal
         msg += _("End: M[{0}] char:{1} ori:{2}").format(i, m_terminal, MagLine.ori_desc[m_ori])
-        pub.sendMessage('STATUS_MESSAGE', msg=msg)
+        if self.report_status:
+            pub.sendMessage('STATUS_MESSAGE', msg=msg)
         self._corner_line(f_ori)
 
     def _corner_line(self, ori):
@@ -704,29 +833,196 @@ class MagLine(Line):
     def copy(self):
         startpos = copy.deepcopy(self._startpos)
         endpos = copy.deepcopy(self._endpos)
-        return MagLine(startpos, endpos, self.cell, self.type)
+        return MagLine(startpos, endpos, self._cell_callback, self.type, self._neighbourhood_callback, self.report_status)
 
     def memo(self):
         str = "{0}:{1},{2},{3}".format(MAG_LINE, self._type, self._startpos, self._endpos)
         return str
 
 
+# MagLineOld: the neighbour cells of a line end, and the line characters
+Neighbours = collections.namedtuple('Neighbours', ['top', 'bottom', 'left', 'right'])
+LineChars = collections.namedtuple('LineChars', ['hor', 'vert', 'upper', 'lower'])
+
+SPACE_CHAR = ' '
+CONNECT_CHAR = 'o'
+
+
+def legacy_line_chars():
+    values = Preferences.values
+    return LineChars(values['LINE_HOR'], values['LINE_VERT'], values['UPPER_CORNER'], values['LOWER_CORNER'])
+
+
+def _all_free(n, c):
+    return n.top == SPACE_CHAR and n.bottom == SPACE_CHAR and n.left == SPACE_CHAR and n.right == SPACE_CHAR
+
+
+def _start_all_free(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if abs(x2 - x1) > abs(y2 - y1):
+        return HORIZONTAL, c.hor
+    return VERTICAL, c.vert
+
+
+def _start_vertical_line(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if y1 != y2:
+        return VERTICAL, c.vert
+    if n.top == c.vert:
+        char = c.lower
+    if n.bottom == c.vert:
+        char = c.upper
+    return HORIZONTAL, char
+
+
+def _start_vertical_first(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if y1 != y2:
+        return VERTICAL, c.vert
+    return HORIZONTAL, c.hor
+
+
+def _start_horizontal_line(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if x1 != x2:
+        return HORIZONTAL, c.hor
+    if y2 > y1:
+        char = c.upper
+    elif y2 < y1:
+        char = c.lower
+    return VERTICAL, char
+
+
+# start character rules, (condition, action, status) with condition(neighbours, chars),
+# action(ends, neighbours, chars, ori, char) -> (ori, char) and status(chars).
+# All rules are evaluated in this order, a rule that applies overrides the preceding ones.
+START_RULES = [
+    # nichts drumherum
+    (_all_free, _start_all_free,
+     lambda c: _("S:all free")),
+    # o/u = |, l/r frei
+    (lambda n, c: (n.top == c.vert or n.bottom == c.vert) and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _start_vertical_line,
+     lambda c: _("S:topVbottom {}; l/r=space").format(c.vert)),
+    # oben .
+    (lambda n, c: n.top == c.upper and n.bottom == SPACE_CHAR and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _start_vertical_first,
+     lambda c: _("S:top {}; l/r/b=space").format(c.lower)),
+    # unten '
+    (lambda n, c: n.bottom == c.lower and n.top == SPACE_CHAR and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _start_vertical_first,
+     lambda c: _("S:bottom {}; l/r/t=space").format(c.lower)),
+    # oben -
+    (lambda n, c: n.top == c.hor and n.bottom == SPACE_CHAR and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _start_vertical_first,
+     lambda c: _("S:top {}; l/r/b=space").format(c.hor)),
+    # unten -
+    (lambda n, c: n.bottom == c.hor and n.top == SPACE_CHAR and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _start_vertical_first,
+     lambda c: _("S:bottom {}; l/r=space").format(c.hor)),
+    # l/r = -, o/u frei
+    (lambda n, c: (n.left == c.hor or n.right == c.hor) and (n.top == SPACE_CHAR or n.bottom == SPACE_CHAR),
+     _start_horizontal_line,
+     lambda c: _("S:leftVright {}, topVbottom=space").format(c.hor)),
+    # links und rechts -, oben kein |
+    (lambda n, c: n.left == c.hor and n.right == c.hor and n.top != c.vert,
+     lambda ends, n, c, ori, char: (VERTICAL, CONNECT_CHAR),
+     lambda c: _("S:left and right {}; top none {}").format(c.hor, c.vert)),
+    # oben und unten |, links kein -
+    (lambda n, c: n.top == c.vert and n.bottom == c.vert and n.left != c.hor,
+     lambda ends, n, c, ori, char: (HORIZONTAL, CONNECT_CHAR),
+     lambda c: _("S:top and bottom {}; left none").format(c.vert, c.hor)),
+    # links oder rechts o
+    (lambda n, c: n.left == CONNECT_CHAR or n.right == CONNECT_CHAR,
+     lambda ends, n, c, ori, char: (HORIZONTAL, c.hor),
+     lambda c: _("S:leftVright {};").format(CONNECT_CHAR)),
+    # oben oder unten o
+    (lambda n, c: n.top == CONNECT_CHAR or n.bottom == CONNECT_CHAR,
+     lambda ends, n, c, ori, char: (VERTICAL, c.vert),
+     lambda c: _("S:topVbottom {};").format(CONNECT_CHAR)),
+]
+
+
+def _end_all_free(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if ori == VERTICAL:
+        char = c.vert if x1 == x2 else c.hor
+    if ori == HORIZONTAL:
+        char = c.hor if y1 == y2 else c.vert
+    return char
+
+
+def _end_vertical_line(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if ori == VERTICAL:
+        char = c.vert if x1 == x2 else CONNECT_CHAR
+    if ori == HORIZONTAL:
+        char = CONNECT_CHAR if y1 == y2 else c.vert
+    return char
+
+
+def _end_horizontal_line(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if (ori == VERTICAL and x1 == x2) or (ori == HORIZONTAL and y1 != y2):
+        if y1 < y2:
+            char = c.lower
+        if y1 > y2:
+            char = c.upper
+    elif ori in (VERTICAL, HORIZONTAL):
+        char = c.hor
+    return char
+
+
+def _end_crossing(ends, n, c, ori, char):
+    x1, y1, x2, y2 = ends
+    if (ori == VERTICAL and x1 == x2) or (ori == HORIZONTAL and y1 != y2):
+        char = CONNECT_CHAR
+    return char
+
+
+# end character rules, (condition, action, status) with condition(neighbours, chars),
+# action(ends, neighbours, chars, start ori, char) -> char and status(chars).
+# All rules are evaluated in this order, a rule that applies overrides the preceding ones.
+END_RULES = [
+    # nichts drumherum
+    (_all_free, _end_all_free,
+     lambda c: _("E:all free")),
+    # von oben oder unten
+    (lambda n, c: (n.top == c.vert or n.bottom == c.vert) and n.left == SPACE_CHAR and n.right == SPACE_CHAR,
+     _end_vertical_line,
+     lambda c: _("E:top/bottom")),
+    # von links oder rechts
+    (lambda n, c: (n.left == c.hor or n.right == c.hor) and n.top == SPACE_CHAR and n.bottom == SPACE_CHAR,
+     _end_horizontal_line,
+     lambda c: _("E:left/right")),
+    # links und rechts -
+    (lambda n, c: n.left == c.hor and n.right == c.hor,
+     _end_crossing,
+     lambda c: _("E:left and right {}").format(c.hor)),
+    # links oder rechts - unten |
+    (lambda n, c: (n.left == c.hor or n.right == c.hor) and n.right == SPACE_CHAR and n.bottom == c.vert,
+     lambda ends, n, c, ori, char: CONNECT_CHAR,
+     lambda c: _("E: l{0}/r{1} bottom={2}").format(c.upper, c.lower, c.vert)),
+]
+
+
 class MagLineOld(MagLine):
     """Alte MagLine, wegen abwaertscompatibilitaet noch vorhanden."""
 
-    def __init__(self, startpos, endpos, cell_callback=None, type=Line.MLINE_LEGACY):
-        super(MagLineOld, self).__init__(startpos=startpos, endpos=endpos, cell_callback=cell_callback, type=type)
-        self._representation()
+    def __init__(self, startpos, endpos, cell_callback=None, type=Line.MLINE_LEGACY, neighbourhood_callback=None, report_status=True):
         self._se_count = 0
         self._se_status_msg = ""
+        super(MagLineOld, self).__init__(startpos=startpos, endpos=endpos, cell_callback=cell_callback, type=type,
+                                         neighbourhood_callback=neighbourhood_callback, report_status=report_status)
 
     def paste(self, grid):
         super(MagLineOld, self).paste(grid)
-        if self._se_count > 0:
+        if self._se_count > 0 and self.report_status:
             msg = self._status_msg
             pub.sendMessage('STATUS_MESSAGE', msg=msg)
 
     def _representation(self):
+        self._reads = dict()
         se_status = ""
         se_count = 0
         se_count, se_status, start_char, start_ori = self.start_character(se_count, se_status)
@@ -735,278 +1031,63 @@ class MagLineOld(MagLine):
         self._status_msg = se_status + "; cnt:" + str(se_count)
         self._draw_line(start_char, start_ori, end_char)
 
-    def start_character(self, se_count, se_status):
+    def neighbours(self, pos):
+        """Return the (top, bottom, left, right) neighbour cells of a line end."""
+        cells = self.neighbourhood(pos)
+        return Neighbours(cells[1], cells[7], cells[3], cells[5])
 
-        def set_rechts_links():
-            nonlocal start_ori  # noqa E999
-            nonlocal start_char  # noqa E999
-            start_ori = HORIZONTAL
-            start_char = line_hor
-
-        def set_oben_unten():
-            nonlocal start_ori  # noqa E999
-            nonlocal start_char  # noqa E999
-            start_ori = VERTICAL
-            start_char = line_vert
-
-        x1, y1 = self._startpos.xy
-        x2, y2 = self._endpos.xy
-        xdiv = abs(x2 - x1)  # Differenz x
-        ydiv = abs(y2 - y1)  # Differenz y
+    def start_character(self, se_count, se_status):
+        """
+        Determine the start character and the orientation of the first line, from the start position neighbours.
+        :returns se_count, se_status, start_char, start_ori
+        """
+        ends = self._startpos.xy + self._endpos.xy
+        n = self.neighbours(self._startpos)
+        c = legacy_line_chars()
         start_ori = VERTICAL
         start_char = '#'
-        space_char = ' '
-        connect_char = 'o'
-        line_hor = Preferences.values['LINE_HOR']
-        line_vert = Preferences.values['LINE_VERT']
-        upper_corner = Preferences.values['UPPER_CORNER']
-        lower_corner = Preferences.values['LOWER_CORNER']
-
-        # DEBUG
-        # print("START startc: {} endc: {} o: {} u: {} l:{} r:{} ".format(startc, endc,
-        #                                                                 self.cell(Pos(x1, y1 - 1)),
-        #                                                                 self.cell(Pos(x1, y1 + 1)),
-        #                                                                 self.cell(Pos(x1 - 1, y1)),
-        #                                                                 self.cell(Pos(x1 + 1, y1))))
-
-        # nichts drumherum
-        if self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char \
-                and self.cell(Pos(x1, y1 - 1)) == space_char \
-                and self.cell(Pos(x1, y1 + 1)) == space_char:
-            if xdiv > ydiv:
-                start_ori = HORIZONTAL
-            else:
-                start_ori = VERTICAL
-            if start_ori == VERTICAL:
-                start_char = line_vert
-            else:
-                start_char = line_hor
-            se_count += 1
-            se_status = _("S:all free")
-
-        # o/u = |, l/r frei
-        if (self.cell(Pos(x1, y1 - 1)) == line_vert or self.cell(Pos(x1, y1 + 1)) == line_vert) \
-                and self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char:
-            if ydiv > 0:
-                set_oben_unten()
-            elif ydiv == 0:
-                start_ori = HORIZONTAL
-                if self.cell(Pos(x1, y1 - 1)) == line_vert:
-                    start_char = lower_corner
-                if self.cell(Pos(x1, y1 + 1)) == line_vert:
-                    start_char = upper_corner
-            se_count += 1
-            se_status = _("S:topVbottom {}; l/r=space").format(line_vert)
-
-        # oben .
-        if self.cell(Pos(x1, y1 - 1)) == upper_corner \
-                and self.cell(Pos(x1, y1 + 1)) == space_char \
-                and self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char:
-            if ydiv > 0:
-                set_oben_unten()
-            elif ydiv == 0:
-                set_rechts_links()
-            se_count += 1
-            se_status = _("S:top {}; l/r/b=space").format(lower_corner)
-
-        # unten '
-        if self.cell(Pos(x1, y1 + 1)) == lower_corner \
-                and self.cell(Pos(x1, y1 - 1)) == space_char \
-                and self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char:
-            if ydiv > 0:
-                set_oben_unten()
-            elif ydiv == 0:
-                set_rechts_links()
-            se_count += 1
-            se_status = _("S:bottom {}; l/r/t=space").format(lower_corner)
-
-        # oben -
-        if self.cell(Pos(x1, y1 - 1)) == line_hor \
-                and self.cell(Pos(x1, y1 + 1)) == space_char \
-                and self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char:
-            if ydiv > 0:
-                set_oben_unten()
-            elif ydiv == 0:
-                set_rechts_links()
-            se_count += 1
-            se_status = _("S:top {}; l/r/b=space").format(line_hor)
-
-        # unten -
-        if self.cell(Pos(x1, y1 + 1)) == line_hor \
-                and self.cell(Pos(x1, y1 - 1)) == space_char \
-                and self.cell(Pos(x1 - 1, y1)) == space_char \
-                and self.cell(Pos(x1 + 1, y1)) == space_char:
-            if ydiv > 0:
-                set_oben_unten()
-            elif ydiv == 0:
-                set_rechts_links()
-            se_count += 1
-            se_status = _("S:bottom {}; l/r=space").format(line_hor)
-
-        # l/r = -, o/u frei
-        if (self.cell(Pos(x1 - 1, y1)) == line_hor or self.cell(Pos(x1 + 1, y1)) == line_hor) \
-                and ((self.cell(Pos(x1, y1 - 1)) == space_char) or self.cell(Pos(x1, y1 + 1)) == space_char):
-            if xdiv > 0:
-                set_rechts_links()
-            elif xdiv == 0:
-                start_ori = VERTICAL
-                if y2 > y1:
-                    start_char = upper_corner
-                elif y2 < y1:
-                    start_char = lower_corner
-            se_count += 1
-            se_status = _("S:leftVright {}, topVbottom=space").format(line_hor)
-
-        # links und rechts -, oben kein |
-        if self.cell(Pos(x1 - 1, y1)) == line_hor \
-                and self.cell(Pos(x1 + 1, y1)) == line_hor \
-                and self.cell(Pos(x1, y1 - 1)) != line_vert:
-            start_ori = VERTICAL
-            start_char = connect_char
-            se_count += 1
-            se_status = _("S:left and right {}; top none {}").format(line_hor, line_vert)
-
-        # oben und unten |, links kein -
-        if self.cell(Pos(x1, y1 - 1)) == line_vert \
-                and self.cell(Pos(x1, y1 + 1)) == line_vert \
-                and self.cell(Pos(x1 - 1, y1)) != line_hor:
-            start_ori = HORIZONTAL
-            start_char = connect_char
-            se_count += 1
-            se_status = _("S:top and bottom {}; left none").format(line_vert, line_hor)
-
-        # links oder rechts o
-        if self.cell(Pos(x1 - 1, y1)) == connect_char \
-                or self.cell(Pos(x1 + 1, y1)) == connect_char:
-            set_rechts_links()
-            se_count += 1
-            se_status = _("S:leftVright {};").format(connect_char)
-
-        # oben oder unten o
-        if self.cell(Pos(x1, y1 - 1)) == connect_char \
-                or self.cell(Pos(x1, y1 + 1)) == connect_char:
-            set_oben_unten()
-            se_count += 1
-            se_status = _("S:topVbottom {};").format(connect_char)
+        for condition, action, status in START_RULES:
+            if condition(n, c):
+                start_ori, start_char = action(ends, n, c, start_ori, start_char)
+                se_count += 1
+                se_status = status(c)
 
         # generell, wenn startc noch # ist
         if start_char == '#':
             if start_ori == VERTICAL:
-                start_char = line_vert
+                start_char = c.vert
             elif start_ori == HORIZONTAL:
-                start_char = line_hor
+                start_char = c.hor
 
         return se_count, se_status, start_char, start_ori
 
     def end_character(self, se_count, se_status, start_ori):
-        x1, y1 = self._startpos.xy
-        x2, y2 = self._endpos.xy
+        """
+        Determine the end character, from the end position neighbours.
+        :returns se_count, se_status, end_char
+        """
+        x1, y1, x2, y2 = ends = self._startpos.xy + self._endpos.xy
+        n = self.neighbours(self._endpos)
+        c = legacy_line_chars()
         end_char = '#'
-        space_char = ' '
-        connect_char = 'o'
-        line_hor = Preferences.values['LINE_HOR']
-        line_vert = Preferences.values['LINE_VERT']
-        upper_corner = Preferences.values['UPPER_CORNER']
-        lower_corner = Preferences.values['LOWER_CORNER']
-
-        # DEBUG
-        # print("END type: {} startc: {} endc: {} o: {} u: {} l:{} r:{} ".format(self._type, startc, endc,
-        #                                                                        self.cell(Pos(x2, y2 - 1)),
-        #                                                                        self.cell(Pos(x2, y2 + 1)),
-        #                                                                        self.cell(Pos(x2 - 1, y2)),
-        #                                                                        self.cell(Pos(x2 + 1, y2))))
-
-        # nichts drumherum
-        if self.cell(Pos(x2 - 1, y2)) == space_char \
-                and self.cell(Pos(x2 + 1, y2)) == space_char \
-                and self.cell(Pos(x2, y2 - 1)) == space_char \
-                and self.cell(Pos(x2, y2 + 1)) == space_char:
-            if start_ori == VERTICAL:
-                if x1 == x2:
-                    end_char = line_vert
-                else:
-                    end_char = line_hor
-            if start_ori == HORIZONTAL:
-                if y1 == y2:
-                    end_char = line_hor
-                else:
-                    end_char = line_vert
-            se_count += 1
-            se_status = _("E:all free")
-
-        # von oben oder unten
-        if (self.cell(Pos(x2, y2 - 1)) == line_vert or self.cell(Pos(x2, y2 + 1)) == line_vert) \
-                and self.cell(Pos(x2 - 1, y2)) == space_char \
-                and self.cell(Pos(x2 + 1, y2)) == space_char:
-            if start_ori == VERTICAL:
-                if x1 == x2:
-                    end_char = line_vert
-                else:
-                    end_char = connect_char
-            if start_ori == HORIZONTAL:
-                if y1 == y2:
-                    end_char = connect_char
-                else:
-                    end_char = line_vert
-            se_count += 1
-            se_status = _("E:top/bottom")
-
-        # von links oder rechts
-        if (self.cell(Pos(x2 - 1, y2)) == line_hor or self.cell(Pos(x2 + 1, y2)) == line_hor) \
-                and self.cell(Pos(x2, y2 - 1)) == space_char \
-                and self.cell(Pos(x2, y2 + 1)) == space_char:
-            if start_ori == VERTICAL:
-                if x1 == x2:
-                    if y1 < y2:
-                        end_char = lower_corner
-                    if y1 > y2:
-                        end_char = upper_corner
-                else:
-                    end_char = line_hor
-            if start_ori == HORIZONTAL:
-                if y1 != y2:
-                    if y1 < y2:
-                        end_char = lower_corner
-                    if y1 > y2:
-                        end_char = upper_corner
-                else:
-                    end_char = line_hor
-            se_count += 1
-            se_status = _("E:left/right")
-
-        # links und rechts -
-        if self.cell(Pos(x2 - 1, y2)) == line_hor \
-                and self.cell(Pos(x2 + 1, y2)) == line_hor:
-            if (start_ori == VERTICAL and x1 == x2) or (start_ori == HORIZONTAL and y1 != y2):
-                end_char = connect_char
-            se_count += 1
-            se_status = _("E:left and right {}").format(line_hor)
-
-        # links oder rechts - unten |
-        if (self.cell(Pos(x2 - 1, y2)) == line_hor or self.cell(Pos(x2 + 1, y2)) == line_hor) \
-                and self.cell(Pos(x2 + 1, y2)) == space_char \
-                and self.cell(Pos(x2, y2 + 1)) == line_vert:
-            end_char = connect_char
-            se_count += 1
-            se_status = _("E: l{0}/r{1} bottom={2}").format(upper_corner, lower_corner, line_vert)
+        for condition, action, status in END_RULES:
+            if condition(n, c):
+                end_char = action(ends, n, c, start_ori, end_char)
+                se_count += 1
+                se_status = status(c)
 
         # generell, wenn endc noch # ist
         if end_char == '#':
             if start_ori == VERTICAL:
                 if x1 == x2:
-                    end_char = line_vert
+                    end_char = c.vert
                 else:
-                    end_char = line_hor
+                    end_char = c.hor
             if start_ori == HORIZONTAL:
                 if y1 != y2:
-                    end_char = line_vert
+                    end_char = c.vert
                 else:
-                    end_char = line_hor
+                    end_char = c.hor
 
         return se_count, se_status, end_char
 
@@ -1096,7 +1177,8 @@ class Rect(Symbol):
         super(Rect, self).__init__(grid=grid, startpos=startpos, endpos=endpos)
         self._is_symbol = False
         self._is_line = True
-        self._representation()
+        self._translatable = False
+        self._relative_repr()
 
     def _representation(self):
         ul = self._startpos
@@ -1138,7 +1220,8 @@ class Arrow(Symbol):
         super(Arrow, self).__init__(grid=grid, startpos=startpos, endpos=endpos)
         self._is_symbol = False
         self._is_line = True
-        self._representation()
+        self._translatable = False
+        self._relative_repr()
 
     def _direction(self):
         dx = abs(self._endpos.x - self._startpos.x)
@@ -1245,6 +1328,8 @@ class Arrow(Symbol):
 
     @property
     def pickpoint_pos(self):
+        # the pick point is set with the representation
+        self._relative_repr()
         return self._pickpoint
 
     def copy(self):
@@ -1270,6 +1355,10 @@ class Column(Symbol):
     def col(self):
         return self._col
 
+    @property
+    def action(self):
+        return self._action
+
     def paste(self, grid):
         if self._action == INSERT:
             grid.insert_col(self.col)
@@ -1308,6 +1397,10 @@ class Row(Symbol):
     def row(self):
         return self._row
 
+    @property
+    def action(self):
+        return self._action
+
     def paste(self, grid):
         if self._action == INSERT:
             grid.insert_row(self.row)
@@ -1331,3 +1424,12 @@ class Row(Symbol):
 
     def copy(self):
         return Row(self._row, self._action)
+
+
+def invalidate_representations():
+    """Invalidate the cached representations of all symbols, e.g. as the line characters changed."""
+    Symbol._repr_generation += 1
+
+
+pub.subscribe(invalidate_representations, 'SAVE_PREFERENCES')
+pub.subscribe(invalidate_representations, 'SAVE_MAGIC_LINE_SETTINGS')
@@ -1,13 +1,23 @@
 # NB to be run with nose, this .py should _not_ be executable (chmod -x)
 
+import os
 import unittest
+import tempfile
 from locale import gettext as _
 
 from application.component_library import ComponentLibrary
+from application.symbol import Symbol
+from application.model_controller import ModelController
 
 
 class ComponentLibraryTest(unittest.TestCase):
 
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
     def test_by_id(self):
 
         c = ComponentLibrary()
@@ -24,3 +34,55 @@ class ComponentLibraryTest(unittest.TestCase):
         symbol = c.get_symbol(key=key)
 
         self.assertEquals(symbol.id, 1)
+
+    def test_variants(self):
+
+        c = ComponentLibrary()
+
+        key = _("Resistor")
+        symbol = c.get_symbol(key=key)
+        duplicate = symbol.copy()
+        self.assertIs(symbol.variants, duplicate.variants)
+
+        grids = c.components[key]['grid']
+        for ori, orientation in Symbol.ORIENTATION.items():
+            for mirrored in (0, 1):
+                duplicate.ori = ori
+                duplicate.mirrored = mirrored
+                grid = grids[orientation]
+                if mirrored == 1:
+                    grid = Symbol.mirror(grid)
+                self.assertEqual(duplicate.grid, grid)
+
+    def test_lazy_loading(self):
+
+        c = ComponentLibrary()
+        id = 2
+        symbol = c.get_symbol_byid(id=id)
+        self.assertEqual(symbol.id, id)
+        # the (sorted) component list is composed on first browse
+        self.assertIsNone(c._components)
+        self.assertEqual(list(c.components.values())[id - 1]['id'], id)
+        self.assertEqual(c.get_symbol_byid(id=id).grid, symbol.grid)
+
+        # the model does not load the libraries at startup
+        m = ModelController()
+        self.assertEqual(len(m.complib._loaded), 0)
+        m.on_list_components()
+        self.assertIsNotNone(m.complib._components)
+
+    def test_cache(self):
+
+        cache_file = os.path.join(self.tmpdir, 'test_components.cache')
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+        # compile the cache
+        c = ComponentLibrary(cache_file=cache_file)
+        components = c.components
+        self.assertTrue(os.path.exists(cache_file))
+
+        # read the cache
+        c = ComponentLibrary(cache_file=cache_file)
+        self.assertIsNotNone(c._read_cache())
+        self.assertEqual(c.components, components)
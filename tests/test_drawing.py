@@ -0,0 +1,38 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import cairo
+import unittest
+
+from application import drawing
+from application.preferences import Preferences
+from application.model_controller import ModelController
+
+
+class DrawingTest(unittest.TestCase):
+
+    def test_glyph_atlas(self):
+
+        c = ModelController()
+        self.assertTrue(c.on_read_from_file('tests/files/test_all.aac'))
+        chars = set(char for line in c.grid.lines() for char in line) - set(' ')
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 800, 600)
+        ctx = cairo.Context(surface)
+        atlas = drawing.GlyphAtlas()
+        atlas.draw_content(ctx, c.grid)
+        # every character is rendered once
+        self.assertEqual(atlas.nr_glyphs, len(chars))
+        slots = set(atlas.slot(char) for char in chars)
+        self.assertEqual(len(slots), len(chars))
+
+        atlas.draw_content(ctx, c.grid, (0, 0, 10, 10))
+        self.assertEqual(atlas.nr_glyphs, len(chars))
+
+        # rebuilt on a font change
+        fontsize = Preferences.values['FONTSIZE']
+        try:
+            Preferences.values['FONTSIZE'] = fontsize + 2
+            atlas.slot('x')
+            self.assertEqual(atlas.nr_glyphs, 1)
+        finally:
+            Preferences.values['FONTSIZE'] = fontsize
@@ -1,17 +1,36 @@
 # NB to be run with nose, this .py should _not_ be executable (chmod -x)
 
 import unittest
-
-from application import REMOVE, INSERT
+import os
+import tempfile
+from pubsub import pub
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional, it is only needed for the ArrayGrid
+    numpy = None
+
+from application import REMOVE, INSERT, CELL_ERASE
+from application.grid import Grid
+from application.sparse_grid import SparseGrid
+from application.delta import Delta
 from application.pos import Pos
-from application.controller import Controller
+from application.model_controller import ModelController
+from application.symbol import Text
 
 
 class EditingTest(unittest.TestCase):
 
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
     def test_insert_remove(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         # NB test should be run against the default (en_US) component library
@@ -21,18 +40,18 @@ class EditingTest(unittest.TestCase):
         c.on_component_changed('NAND gate')
         c.on_paste_objects(Pos(14, 2))
 
-        filename = 'tmp/test_edit_insert.aac'
+        filename = os.path.join(self.tmpdir, 'test_edit_insert.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
         rect = (Pos(4, 2), Pos(5, 3))
         c.on_cut(rect)
 
-        filename = 'tmp/test_edit_remove.aac'
+        filename = os.path.join(self.tmpdir, 'test_edit_remove.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_cols(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         grid = c.grid
@@ -63,7 +82,7 @@ class EditingTest(unittest.TestCase):
 
     def test_rows(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
         grid = c.grid
 
@@ -93,7 +112,7 @@ class EditingTest(unittest.TestCase):
 
     def test_erase(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         # NB test should be run against the default (en_US) component library
@@ -103,12 +122,12 @@ class EditingTest(unittest.TestCase):
         c.on_eraser_selected((5, 5))
         c.on_paste_objects(Pos(5, 2))
 
-        filename = 'tmp/test_edit_erase.aac'
+        filename = os.path.join(self.tmpdir, 'test_edit_erase.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_duplicate(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         # NB test should be run against the default (en_US) component library
@@ -121,5 +140,176 @@ class EditingTest(unittest.TestCase):
         rect = (Pos(4, 2), Pos(5, 3))
         c.on_cut(rect)
 
-        filename = 'tmp/test_edit_duplicate.aac'
+        filename = os.path.join(self.tmpdir, 'test_edit_duplicate.aac')
         self.assertTrue(c.on_write_to_file(filename))
+
+    def test_handles(self):
+
+        c = ModelController()
+        c.on_new()
+
+        # two identical lines at the same position
+        c.on_paste_line(Pos(2, 2), Pos(10, 2), 0)
+        first = c.latest_action[-1].symbol
+        c.on_paste_line(Pos(2, 2), Pos(10, 2), 0)
+        second = c.latest_action[-1].symbol
+        self.assertNotEqual(first.handle, second.handle)
+
+        # undo removes exactly the last one
+        c.on_undo()
+        self.assertEqual(list(c.objects.values()), [first])
+
+        # cut and undo the cut, the object keeps its handle
+        c.on_cut((Pos(2, 2), Pos(3, 3)))
+        self.assertEqual(len(c.objects), 0)
+        c.on_undo()
+        self.assertEqual(list(c.objects.keys()), [first.handle])
+
+    def test_redraw(self):
+
+        c = ModelController()
+        c.on_new()
+        c.CHECKPOINT_INTERVAL = 4
+
+        for n in range(10):
+            c.on_paste_line(Pos(2, 2 + n), Pos(10 + n, 2 + n), 0)
+            c.on_paste_mag_line(Pos(30, 2 + 2 * n), Pos(40 - n, 12))
+        c.on_redraw_grid()
+        content = c.grid.content_as_str()
+        self.assertEqual(len(c._checkpoints), 5)
+
+        # resume from the last checkpoint
+        c.on_redraw_grid()
+        self.assertEqual(c.grid.content_as_str(), content)
+
+        # checkpoints after a removed object are no longer valid
+        c.on_cut((Pos(2, 5), Pos(3, 6)))
+        c.on_redraw_grid()
+        self.assertEqual(len(c._checkpoints), 4)
+        c.clear_checkpoints()
+        content = c.grid.content_as_str()
+        c.on_redraw_grid()
+        self.assertEqual(c.grid.content_as_str(), content)
+
+    def test_resize(self):
+
+        c = ModelController()
+        c.on_new()
+
+        c.on_paste_line(Pos(2, 2), Pos(10, 2), 0)
+        content = c.grid.content_as_str(strip=True)
+        c.on_grid_size(100, 50)
+        self.assertEqual((c.grid.nr_cols, c.grid.nr_rows), (100, 50))
+        self.assertEqual(c.grid.content_as_str(strip=True), content)
+
+        # a line drawn partly outside the grid shows after enlarging the grid
+        c.on_paste_line(Pos(90, 5), Pos(110, 5), 0)
+        self.assertTrue(c.grid.clipped)
+        c.on_grid_size(120, 50)
+        self.assertEqual(c.grid.cell(Pos(110, 5)), '-')
+
+    def test_undo_delta(self):
+
+        c = ModelController()
+        c.on_new()
+
+        # a line over another one, undo restores the crossed cell exactly
+        c.on_paste_line(Pos(2, 5), Pos(10, 5), 0)
+        before = c.grid.content_as_str()
+        c.on_paste_line(Pos(6, 2), Pos(6, 8), 0)
+        after = c.grid.content_as_str()
+        c.on_undo()
+        self.assertEqual(c.grid.content_as_str(), before)
+        c.on_redo()
+        self.assertEqual(c.grid.content_as_str(), after)
+
+        # the content of a row that is removed returns with the undo
+        c.on_grid_row(5, REMOVE)
+        self.assertNotEqual(c.grid.content_as_str(), after)
+        c.on_undo()
+        self.assertEqual(c.grid.content_as_str(), after)
+
+        # the history is limited to the budget, the oldest actions are dropped
+        c.UNDO_BUDGET = 2000
+        for n in range(20):
+            c.on_paste_line(Pos(2, 10 + n), Pos(60, 10 + n), 0)
+        self.assertLess(len(c.latest_action), 20)
+        self.assertLessEqual(sum(act.delta.nbytes for act in c.latest_action), c.UNDO_BUDGET)
+        self.assertEqual(c.latest_action[-1].action, INSERT)
+
+    def test_undo_bulk(self):
+
+        # the cells changed by blit, erase_rect and erase are recorded too, undo restores them exactly
+        engines = [Grid, SparseGrid]
+        if numpy is not None:
+            from application.array_grid import ArrayGrid
+            engines.append(ArrayGrid)
+        for engine in engines:
+            grid = engine(40, 20)
+            grid.blit(Pos(2, 2), ["+--+", "|  |", "+--+"])
+            before = list(grid.lines())
+            grid.journal = Delta()
+            grid.blit(Pos(3, 1), ["xyz", ['a', CELL_ERASE, 'b'], "   "])
+            grid.erase_rect((Pos(1, 3), Pos(4, 3)))
+            grid.fill_rect(Pos(10, 10), ["pq"])
+            after = list(grid.lines())
+            grid.erase()
+            delta = grid.journal
+            grid.journal = None
+            delta.undo(grid)
+            self.assertEqual(list(grid.lines()), before)
+            delta.redo(grid)
+            self.assertEqual(list(grid.lines()), [" " * 40] * 20)
+            self.assertNotEqual(after, before)
+
+    def test_transaction(self):
+
+        c = ModelController()
+        c.on_new()
+        empty = c.grid.content_as_str()
+
+        # the actions of a transaction are undone and redone as one
+        with c.transaction():
+            c.on_paste_line(Pos(2, 5), Pos(10, 5), 0)
+            c.on_paste_line(Pos(6, 2), Pos(6, 8), 0)
+            c.on_paste_rect(Pos(20, 2), Pos(30, 8))
+        self.assertEqual(len(c.latest_action), 1)
+        # the cell changes are combined, to restore them in one pass
+        self.assertIsNotNone(c.latest_action[0].delta)
+        after = c.grid.content_as_str()
+        c.on_undo()
+        self.assertEqual(c.grid.content_as_str(), empty)
+        self.assertEqual(len(c.objects), 0)
+        c.on_redo()
+        self.assertEqual(c.grid.content_as_str(), after)
+        self.assertEqual(len(c.objects), 3)
+
+        # cutting several objects is a single undo step
+        c.on_cut((Pos(0, 0), Pos(40, 10)))
+        self.assertEqual(len(c.latest_action), 2)
+        self.assertEqual(c.grid.content_as_str(), empty)
+        c.on_undo()
+        self.assertEqual(c.grid.content_as_str(), after)
+
+    def test_undo_notification(self):
+
+        c = ModelController()
+        c.on_new()
+        notifications = []
+
+        def on_undo_changed(undo):
+            notifications.append(undo)
+
+        # a single notification per action, or per transaction
+        pub.subscribe(on_undo_changed, 'UNDO_CHANGED')
+        try:
+            c.on_paste_text(Text(Pos(2, 2), "abc"))
+            self.assertEqual(notifications, [True])
+            c.on_erase(Pos(2, 2), (2, 1))
+            self.assertEqual(notifications, [True, True])
+            with c.transaction():
+                c.on_paste_text(Text(Pos(2, 4), "def"))
+                c.on_erase(Pos(2, 4), (1, 1))
+            self.assertEqual(notifications, [True, True, True])
+        finally:
+            pub.unsubscribe(on_undo_changed, 'UNDO_CHANGED')
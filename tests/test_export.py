@@ -0,0 +1,42 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import unittest
+import os
+import tempfile
+
+from application.controller import Controller
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def test_export_pdf(self):
+
+        c = Controller()
+
+        filename = 'tests/files/test_all.aac'
+        self.assertTrue(c.on_read_from_file(filename))
+
+        # FIXME
+        # To avoid using grid_view methods, use the controller to pass to grid_view.
+        # With the disadvantage of not being able to check the outcome here.
+        # Instead, visually check the existence and content of the PDF file.
+        filename = os.path.join(self.tmpdir, 'test_all.pdf')
+        c.on_export_as_pdf(filename)
+
+    def test_import_aacircuit_export_pdf(self):
+
+        c = Controller()
+        c.legacy = True
+
+        filename = 'tests/files/original_741.aac'
+        self.assertTrue(c.on_read_from_file(filename))
+
+        # for (visual) verification only
+        filename = os.path.join(self.tmpdir, '741_legacy.pdf')
+        c.on_export_as_pdf(filename)
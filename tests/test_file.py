@@ -1,33 +1,85 @@
 # NB to be run with nose, this .py should _not_ be executable (chmod -x)
 
 import unittest
+import os
+import tempfile
+from pubsub import pub
 
 from application.pos import Pos
-from application.controller import Controller
+from application.model_controller import ModelController
 
 
 class FileTest(unittest.TestCase):
 
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
     def test_read_write(self):
 
-        c = Controller()
+        c = ModelController()
 
         filename = 'tests/files/test_all.aac'
         self.assertTrue(c.on_read_from_file(filename))
 
-        filename = 'tmp/test_all.aac'
+        filename = os.path.join(self.tmpdir, 'test_all.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_read_aac(self):
 
-        c = Controller()
+        c = ModelController()
 
         filename = 'tests/files/test_tr_circuit.aac'
         self.assertTrue(c.on_read_from_file(filename))
 
+    def test_bulk_load(self):
+
+        c = ModelController()
+        messages = []
+
+        def listener(topic=pub.AUTO_TOPIC, **kwargs):
+            messages.append(topic.getName())
+
+        pub.subscribe(listener, pub.ALL_TOPICS)
+        try:
+            filename = 'tests/files/test_all.aac'
+            self.assertTrue(c.on_read_from_file(filename))
+        finally:
+            pub.unsubscribe(listener, pub.ALL_TOPICS)
+
+        # a single damage and undo notification, nothing to undo
+        self.assertEqual(messages.count('GRID_DAMAGED'), 1)
+        self.assertEqual(messages.count('UNDO_CHANGED'), 1)
+        self.assertEqual(c.latest_action, [])
+        self.assertGreater(len(c.objects), 0)
+
+        # the same content as pasted one by one
+        d = ModelController()
+        with open(filename, 'r') as f:
+            d.play_memo(f.readlines())
+        self.assertEqual(c.grid.content_as_str(), d.grid.content_as_str())
+        self.assertEqual(len(d.latest_action), len(d.objects))
+
+        # the magic lines of the file are silent, a magic line drawn afterwards reports its terminals
+        status = []
+
+        def on_message(msg, type=None):
+            status.append(msg)
+
+        pub.subscribe(on_message, 'STATUS_MESSAGE')
+        try:
+            c.on_redraw_grid()
+            self.assertEqual(status, [])
+            c.on_paste_mag_line(Pos(2, 2), Pos(10, 6))
+            self.assertGreater(len(status), 0)
+        finally:
+            pub.unsubscribe(on_message, 'STATUS_MESSAGE')
+
     def test_read_ascii(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         filename = 'tests/files/test_ascii.txt'
@@ -36,55 +88,29 @@ class FileTest(unittest.TestCase):
         pos = Pos(0, 0)
         c.on_paste_objects(pos)
 
-        filename = 'tmp/test_ascii.aac'
+        filename = os.path.join(self.tmpdir, 'test_ascii.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_import_aacircuit(self):
 
-        c = Controller()
+        c = ModelController()
         c.legacy = True
 
         filename = 'tests/files/original_741.aac'
         self.assertTrue(c.on_read_from_file(filename))
 
-        filename = 'tmp/741.aac'
+        filename = os.path.join(self.tmpdir, '741.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
-        filename = 'tmp/741_legacy.txt'
+        filename = os.path.join(self.tmpdir, '741_legacy.txt')
         self.assertTrue(c.on_write_to_ascii_file(filename))
 
     def test_export_ascii(self):
 
-        c = Controller()
+        c = ModelController()
 
         filename = 'tests/files/test_all.aac'
         self.assertTrue(c.on_read_from_file(filename))
 
-        filename = 'tmp/test_all.txt'
+        filename = os.path.join(self.tmpdir, 'test_all.txt')
         self.assertTrue(c.on_write_to_ascii_file(filename))
-
-    def test_export_pdf(self):
-
-        c = Controller()
-
-        filename = 'tests/files/test_all.aac'
-        self.assertTrue(c.on_read_from_file(filename))
-
-        # FIXME
-        # To avoid using grid_view methods, use the controller to pass to grid_view.
-        # With the disadvantage of not being able to check the outcome here.
-        # Instead, visually check the existence and content of the PDF file.
-        filename = 'tmp/test_all.pdf'
-        c.on_export_as_pdf(filename)
-
-    def test_import_aacircuit_export_pdf(self):
-
-        c = Controller()
-        c.legacy = True
-
-        filename = 'tests/files/original_741.aac'
-        self.assertTrue(c.on_read_from_file(filename))
-
-        # for (visual) verification only
-        filename = 'tmp/741_legacy.pdf'
-        c.on_export_as_pdf(filename)
@@ -1,9 +1,23 @@
 # NB to be run with nose, this .py should _not_ be executable (chmod -x)
 
+import io
 import unittest
 
+from application import CELL_ERASE
 from application.grid import Grid
-from application.grid_view import Pos
+from application.sparse_grid import SparseGrid
+from application.pos import Pos
+
+# NumPy is optional, the ArrayGrid engine is only tested when it is installed
+try:
+    import numpy
+    from application.array_grid import ArrayGrid
+except ImportError:
+    numpy = None
+    ArrayGrid = None
+
+# the grid engines available
+ENGINES = tuple(e for e in (Grid, ArrayGrid, SparseGrid) if e is not None)
 
 
 class GridTest(unittest.TestCase):
@@ -104,3 +118,204 @@ class GridTest(unittest.TestCase):
         print("insert row 2:")
         g.insert_row(2)
         print(g)
+
+    def test_damage(self):
+
+        g = Grid(10, 10)
+        self.assertFalse(g.is_damaged)
+
+        g.set_cell(Pos(2, 3), 'a')
+        g.set_cell(Pos(5, 3), 'b')
+        g.set_cell(Pos(2, 4), 'c')
+        g.set_cell(Pos(5, 4), 'd')
+        g.set_cell(Pos(7, 7), ' ')
+        self.assertEqual(g.damaged_rects(), [(2, 3, 4, 2)])
+
+        g.flush_damage()
+        self.assertFalse(g.is_damaged)
+
+        # unchanged cells are not damaged
+        g.set_cell(Pos(2, 3), 'a')
+        self.assertFalse(g.is_damaged)
+
+        g.insert_row(8)
+        self.assertEqual(g.damaged_rects(), [(0, 8, 10, 2)])
+
+    def test_export(self):
+
+        g = Grid(6, 5)
+        g.set_cell(Pos(1, 1), 'a')
+        g.set_cell(Pos(3, 2), 'b')
+
+        lines = list(g.lines())
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[1], ' a    ')
+
+        lines = list(g.lines(strip=True))
+        self.assertEqual(lines, ['', ' a', '   b'])
+
+        out = io.StringIO()
+        g.write_to(out)
+        self.assertEqual(out.getvalue(), g.content_as_str())
+
+    def test_copy(self):
+
+        for engine in ENGINES:
+            g = engine(6, 5)
+            g.set_cell(Pos(1, 1), 'a')
+            g.set_cell(Pos(4, 3), 'b')
+            # reading (a wrapped around position) does not clip
+            self.assertEqual(g.cell(Pos(-2, -2)), 'b')
+            self.assertEqual(g.neighbourhood(Pos(-1, -1))[0], 'b')
+            self.assertFalse(g.clipped)
+
+            c = g.copy(8, 7)
+            self.assertEqual(list(c.lines(strip=True)), list(g.lines(strip=True)))
+            self.assertFalse(c.clipped)
+
+            # cropped
+            c = g.copy(3, 3)
+            self.assertEqual(list(c.lines()), ['   ', ' a ', '   '])
+            self.assertTrue(c.clipped)
+
+            # drawn outside the grid
+            g.blit(Pos(5, 0), ['xy'])
+            self.assertTrue(g.clipped)
+
+    def test_neighbourhood(self):
+        # the 3x3 block around a position, the same cells as read one by one
+        for grid in [engine(6, 4) for engine in ENGINES]:
+            grid.blit(Pos(0, 0), ["abcdef", "ghijkl", "mnopqr", "stuvwx"])
+            self.assertEqual(grid.neighbourhood(Pos(2, 1)), list("bcdhijnop"))
+            for pos in (Pos(0, 0), Pos(5, 3), Pos(6, 2), Pos(3, 4)):
+                cells = [grid.cell(Pos(pos.x + i, pos.y + j)) for j in (-1, 0, 1) for i in (-1, 0, 1)]
+                self.assertEqual(grid.neighbourhood(pos), cells)
+
+    def test_snapshot(self):
+
+        for engine in ENGINES:
+            g = engine(80, 70)
+            g.blit(Pos(0, 0), ["abc", "def"])
+            g.set_cell(Pos(60, 50), 'x')
+            s = g.snapshot()
+            before = list(s.lines())
+            self.assertEqual(list(g.lines()), before)
+
+            # the changes of the grid do not show in the snapshot
+            g.set_cell(Pos(1, 0), 'B')
+            g.blit(Pos(60, 50), ['yz'])
+            g.erase_rect((Pos(0, 1), Pos(2, 1)))
+            g.insert_col(0)
+            g.remove_row(0)
+            self.assertEqual(list(s.lines()), before)
+            self.assertEqual(g.cell(Pos(61, 49)), 'y')
+
+            # a snapshot is read-only
+            with self.assertRaises(TypeError):
+                s.set_cell(Pos(0, 0), 'A')
+            with self.assertRaises(TypeError):
+                s.remove_row(0)
+
+            # its copy is a grid, of which the changes do not show in the snapshot either
+            c = s.copy()
+            c.set_cell(Pos(0, 0), 'A')
+            self.assertEqual(list(s.lines()), before)
+            self.assertEqual(c.cell(Pos(0, 0)), 'A')
+            self.assertEqual(c.copy(3, 2).cell(Pos(1, 0)), 'b')
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+class ArrayGridTest(unittest.TestCase):
+
+    def fill(self, g):
+        i = 0
+        for r in range(g.nr_rows):
+            for c in range(g.nr_cols):
+                g.set_cell(Pos(c, r), chr(ord('a') + i))
+                i += 1
+
+    def test_same_as_grid(self):
+
+        g = Grid(7, 4)
+        a = ArrayGrid(7, 4)
+        self.fill(g)
+        self.fill(a)
+
+        for grid in (g, a):
+            grid.insert_col(2)
+            grid.remove_row(1)
+            grid.insert_row(0)
+            grid.remove_col(5)
+            grid.blit(Pos(5, 2), ["XY", " Z ", [CELL_ERASE]])
+
+        self.assertEqual(a.grid, g.grid)
+        self.assertEqual(a.content_as_str(), g.content_as_str())
+
+    def test_cell(self):
+
+        a = ArrayGrid()
+        a.set_cell(Pos(1, 2), 'µ')
+        self.assertEqual(a.cell(Pos(1, 2)), 'µ')
+
+        a.set_cell(Pos(1, 2), ' ')
+        self.assertEqual(a.cell(Pos(1, 2)), 'µ')
+
+        a.set_cell(Pos(1, 2), CELL_ERASE)
+        self.assertEqual(a.cell(Pos(1, 2)), ' ')
+
+    def test_dimensions(self):
+
+        a = ArrayGrid(6, 3)
+
+        a._insert_col(3)
+        self.assertEqual(a.nr_cols, 7)
+        a._remove_row(0)
+        self.assertEqual(a.nr_rows, 2)
+
+        a.erase_rect((Pos(0, 0), Pos(6, 1)))
+        self.assertEqual(a.row(1), [' '] * 7)
+
+    def test_snapshot_memory(self):
+        # the rows that are changed after the snapshot are saved, not the whole buffer
+        g = ArrayGrid(400, 300)
+        s = g.snapshot()
+        g.set_cell(Pos(10, 20), 'a')
+        g.blit(Pos(0, 100), ['bc', 'de'])
+        self.assertEqual(sorted(s._saved), [20, 100, 101])
+        self.assertEqual(s.cell(Pos(10, 20)), ' ')
+
+
+class SparseGridTest(unittest.TestCase):
+
+    def test_same_as_grid(self):
+
+        g = Grid(70, 40)
+        s = SparseGrid(70, 40)
+        for grid in (g, s):
+            for i in range(0, 40, 3):
+                grid.set_cell(Pos(i + 20, i), chr(ord('a') + i))
+            grid.insert_col(2)
+            grid.remove_row(1)
+            grid.insert_row(0)
+            grid.remove_col(5)
+            grid.blit(Pos(60, 35), ["XYZ", " Z ", "", [CELL_ERASE, 'Q']])
+            grid._insert_row(33)
+            grid._remove_col(0)
+
+        self.assertEqual(s.grid, g.grid)
+        self.assertEqual(s.content_as_str(), g.content_as_str())
+
+    def test_memory(self):
+
+        s = SparseGrid(10000, 10000)
+        self.assertEqual(s.nr_tiles, 0)
+        self.assertEqual(s.cell(Pos(5000, 5000)), ' ')
+
+        s.set_cell(Pos(5000, 5000), 'X')
+        s.set_cell(Pos(5001, 5001), 'Y')
+        self.assertEqual(s.nr_tiles, 1)
+        self.assertEqual(s.cell(Pos(5000, 5000)), 'X')
+
+        s.set_cell(Pos(5000, 5000), CELL_ERASE)
+        s.set_cell(Pos(5001, 5001), CELL_ERASE)
+        self.assertEqual(s.nr_tiles, 0)
@@ -0,0 +1,28 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import sys
+import subprocess
+import unittest
+
+# block the GUI libraries, then use the model
+SCRIPT = """
+import sys
+for name in ('gi', 'cairo'):
+    sys.modules[name] = None
+
+from application.pos import Pos
+from application.model_controller import ModelController
+
+c = ModelController()
+assert c.on_read_from_file('tests/files/test_all.aac')
+c.on_paste_line(Pos(1, 1), Pos(10, 1), 1)
+assert 'gi.repository' not in sys.modules
+"""
+
+
+class HeadlessTest(unittest.TestCase):
+
+    def test_model_without_gui(self):
+
+        result = subprocess.run([sys.executable, '-c', SCRIPT], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
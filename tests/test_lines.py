@@ -1,17 +1,28 @@
 # NB to be run with nose, this .py should _not_ be executable (chmod -x)
 
 import unittest
+import os
+import tempfile
 
 from application.pos import Pos
-from application.symbol import Line
-from application.controller import Controller
+from application.preferences import Preferences
+from application.symbol import Line, MagLine, Text
+from application.magic_line_settings import MagicLineSettings
+from application import HORIZONTAL, VERTICAL
+from application.model_controller import ModelController
 
 
 class LinesTest(unittest.TestCase):
 
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
     def test_lines(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         start = Pos(5, 5)
@@ -24,12 +35,12 @@ class LinesTest(unittest.TestCase):
             start += Pos(0, 5)
             end += Pos(0, 5)
 
-        filename = 'tmp/test_lines.aac'
+        filename = os.path.join(self.tmpdir, 'test_lines.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_rect(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         start = Pos(5, 5)
@@ -37,12 +48,12 @@ class LinesTest(unittest.TestCase):
 
         c.on_paste_rect(start, end)
 
-        filename = 'tmp/test_rect.aac'
+        filename = os.path.join(self.tmpdir, 'test_rect.aac')
         self.assertTrue(c.on_write_to_file(filename))
 
     def test_magic_line(self):
 
-        c = Controller()
+        c = ModelController()
         c.on_new()
 
         # connect rectangle sides
@@ -61,5 +72,48 @@ class LinesTest(unittest.TestCase):
         c.on_paste_mag_line(Pos(24, 6), Pos(15, 6))
         c.on_paste_mag_line(Pos(24, 8), Pos(20, 2))
 
-        filename = 'tmp/test_magic_line.aac'
+        filename = os.path.join(self.tmpdir, 'test_magic_line.aac')
         self.assertTrue(c.on_write_to_file(filename))
+
+    def test_line_match(self):
+        # the compiled patterns match as the first (in LMD order) pattern with the orientation
+        settings = MagicLineSettings()
+        settings.load_default_settings()
+        blank = [' '] * 9
+        self.assertEqual(MagicLineSettings.match(blank), (0, MagicLineSettings.LMD[0].ori, 'o'))
+        self.assertIsNone(MagicLineSettings.match(blank, HORIZONTAL))
+        # a vertical line above
+        cells = [' ', '|', ' ', ' ', ' ', ' ', ' ', ' ', ' ']
+        self.assertEqual(MagicLineSettings.match(cells), (6, VERTICAL, '|'))
+        self.assertEqual(MagicLineSettings.match(cells, HORIZONTAL), (8, HORIZONTAL, "'"))
+        cells[0] = '-'
+        self.assertIsNone(MagicLineSettings.match(cells, VERTICAL))
+        self.assertEqual(MagicLineSettings.match(cells), (8, HORIZONTAL, "'"))
+        # replaced patterns are compiled again
+        MagicLineSettings.LMD = MagicLineSettings.LMD[1:]
+        self.assertEqual(MagicLineSettings.match(cells), (7, HORIZONTAL, "'"))
+        settings.load_default_settings()
+
+    def test_repr_cache(self):
+
+        # a translated symbol keeps its (relative) representation
+        text = Text(Pos(1, 1), "abc")
+        cells = text._relative_repr()
+        text.startpos = Pos(5, 5)
+        self.assertIs(cells, text._relative_repr())
+        self.assertEqual(text.repr[Pos(7, 5)], 'c')
+        text.ori = 1
+        self.assertIsNot(cells, text._relative_repr())
+        self.assertEqual(text.repr[Pos(5, 7)], 'c')
+
+        # a magic line is composed again when a grid cell it depends on changes
+        c = ModelController()
+        c.on_new()
+        grid = c.grid
+        line = MagLine(Pos(2, 2), Pos(8, 6), c.cell_callback)
+        cells = line._relative_repr()
+        self.assertIs(cells, line._relative_repr())
+        self.assertEqual(line.repr[Pos(5, 2)], Preferences.values['LINE_HOR'])
+        grid.set_cell(Pos(5, 2), Preferences.values['LINE_VERT'])
+        self.assertIsNot(cells, line._relative_repr())
+        self.assertEqual(line.repr[Pos(5, 2)], Preferences.values['CROSSING'])
@@ -0,0 +1,66 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import unittest
+
+from application import REMOVE, INSERT
+from application.pos import Pos
+from application import memo_parser
+
+
+class MemoParserTest(unittest.TestCase):
+
+    def test_parse(self):
+
+        memo = ['comp:15,1,0,18,10\n',
+                'char:65,3,4\n',
+                'eras:2,3,5,6\n',
+                'line:0,7,2,26,2\n',
+                'magl:1,12,3,20,9\n',
+                'dirl:1,2,3,4\n',
+                'rect:7,8,26,15\n',
+                'arrw:1,1,8,1\n',
+                'text:0,5,6,"hello\\nworld"\n',
+                'icol:3\n',
+                'drow:4\n',
+                'line:0,7,2\n',
+                'text:0,5,6,"not json\n',
+                'rubbish\n']
+        records = list(memo_parser.parse(memo))
+        self.assertEqual(len(records), len(memo))
+        self.assertEqual([r.linenr for r in records], list(range(1, len(memo) + 1)))
+
+        comp, char, eras, line, magl, dirl, rect, arrw, text, col, row = records[:11]
+        self.assertEqual((comp.id, comp.ori, comp.mirrored, comp.pos), (15, 1, 0, Pos(18, 10)))
+        self.assertEqual((char.char, char.pos), ('A', Pos(3, 4)))
+        self.assertEqual((eras.size, eras.pos), ((2, 3), Pos(5, 6)))
+        self.assertEqual((line.type, line.startpos, line.endpos), (0, Pos(7, 2), Pos(26, 2)))
+        self.assertEqual((magl.type, magl.startpos, magl.endpos), (1, Pos(12, 3), Pos(20, 9)))
+        self.assertEqual((dirl.startpos, dirl.endpos), (Pos(1, 2), Pos(3, 4)))
+        self.assertEqual((rect.startpos, rect.endpos), (Pos(7, 8), Pos(26, 15)))
+        self.assertEqual((arrw.startpos, arrw.endpos), (Pos(1, 1), Pos(8, 1)))
+        self.assertEqual((text.ori, text.pos, text.text), (0, Pos(5, 6), 'hello\nworld'))
+        self.assertEqual((type(col), col.action, col.col), (memo_parser.Column, INSERT, 3))
+        self.assertEqual((type(row), row.action, row.row), (memo_parser.Row, REMOVE, 4))
+
+        # missing arguments, invalid text and unknown lines are skipped
+        for record in records[11:]:
+            self.assertIsInstance(record, memo_parser.Skipped)
+
+    def test_parse_original(self):
+
+        memo = ['comp:4,2,10,12,s\n',
+                'rect:0,1,2,3,4\n',
+                'MagL:1,12,3,20,9\n',
+                'text:a, b,5,6\n',
+                'IROW:7\n',
+                'arrw:1,1,8,1\n']
+        records = list(memo_parser.parse(memo, legacy=True))
+
+        comp, rect, magl, text, row, arrw = records
+        self.assertEqual((comp.id, comp.ori, comp.mirrored, comp.pos), (4, 1, 1, Pos(10, 12)))
+        self.assertEqual((rect.startpos, rect.endpos), (Pos(1, 2), Pos(3, 4)))
+        self.assertIsInstance(magl, memo_parser.MagLine)
+        self.assertEqual((text.ori, text.pos, text.text), (0, Pos(5, 6), 'a, b'))
+        self.assertEqual((row.action, row.row), (INSERT, 7))
+        # no arrows in the original file format
+        self.assertIsInstance(arrw, memo_parser.Skipped)
@@ -0,0 +1,84 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import os
+import unittest
+import tempfile
+
+from application import render
+from application.model_controller import ModelController, GRID_ENGINES
+
+
+class RenderTest(unittest.TestCase):
+
+    def setUp(self):
+        # the test outputs are written to a temporary directory, not into the work tree
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def test_render_ascii(self):
+
+        output_dir = os.path.join(self.tmpdir, 'render')
+        filenames = ['tests/files/test_all.aac', 'tests/files/test_tr_circuit.aac']
+        self.assertEqual(render.main(['--force', '-j', '2', '-o', output_dir] + filenames), 0)
+
+        # the same content as read by the controller
+        for filename in filenames:
+            c = ModelController()
+            self.assertTrue(c.on_read_from_file(filename))
+            output = os.path.join(output_dir, os.path.splitext(os.path.basename(filename))[0] + '.txt')
+            with open(output, 'r') as f:
+                self.assertEqual(f.read(), c.grid.content_as_str())
+
+        # the outputs are up to date now
+        for filename in filenames:
+            outputs = render.output_files(filename, ['ascii'], output_dir)
+            self.assertTrue(render.up_to_date(filename, outputs))
+
+    def test_render_pdf_svg(self):
+
+        # for (visual) verification only
+        output_dir = os.path.join(self.tmpdir, 'render')
+        filename = 'tests/files/test_all.aac'
+        self.assertEqual(render.main(['--force', '-f', 'pdf', '-f', 'svg', '-o', output_dir, filename]), 0)
+        for ext in ('.pdf', '.svg'):
+            self.assertTrue(os.path.exists(os.path.join(output_dir, 'test_all' + ext)))
+
+    def test_engines(self):
+
+        # the same output with every grid storage engine
+        filename = 'tests/files/test_all.aac'
+        contents = []
+        for engine in sorted(GRID_ENGINES):
+            output_dir = os.path.join(self.tmpdir, engine)
+            self.assertEqual(render.main(['--force', '-j', '1', '--engine', engine, '-o', output_dir, filename]), 0)
+            with open(os.path.join(output_dir, 'test_all.txt'), 'r') as f:
+                contents.append(f.read())
+        self.assertEqual(contents, [contents[0]] * len(contents))
+
+        # a large grid is an array (if NumPy is installed), a small grid a list
+        c = ModelController()
+        c.init_grid(400, 300)
+        self.assertIs(type(c.grid), GRID_ENGINES.get('array', GRID_ENGINES['list']))
+        c.init_grid(72, 36)
+        self.assertIs(type(c.grid), GRID_ENGINES['list'])
+
+    def test_skipped_lines(self):
+
+        filename = os.path.join(self.tmpdir, 'render_skipped.aac')
+        with open(filename, 'w') as f:
+            f.write('char:65,3,4\nrubbish\n')
+        result = render.render(render.Job(filename, [], False, False))
+        self.assertIsNone(result.error)
+        self.assertEqual([record.linenr for record in result.skipped], [2])
+        # a skipped line results in a non-zero exit status
+        self.assertEqual(render.main(['--force', '-j', '1', '-o', os.path.join(self.tmpdir, 'render'), filename]), 1)
+
+        # an unknown line type is skipped, the other files are still converted
+        bad = os.path.join(self.tmpdir, 'render_bad_line.aac')
+        with open(bad, 'w') as f:
+            f.write('char:65,3,4\nline:2,1,1,5,1\n')
+        result = render.render(render.Job(bad, [], False, False))
+        self.assertEqual([record.linenr for record in result.skipped], [2])
+        self.assertEqual(render.main(['--force', '-j', '2', '-o', os.path.join(self.tmpdir, 'render'), 'tests/files/test_all.aac', bad]), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'render', 'test_all.txt')))
@@ -0,0 +1,35 @@
+# NB to be run with nose, this .py should _not_ be executable (chmod -x)
+
+import random
+import unittest
+
+from application.pos import Pos
+from application.symbol import Character
+from application.spatial_index import SpatialIndex
+
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def test_lookup(self):
+
+        random.seed(1)
+        index = SpatialIndex()
+        objects = []
+        for i in range(500):
+            symbol = Character('x', startpos=Pos(random.randrange(100), random.randrange(60)))
+            objects.append(symbol)
+            index.insert(symbol)
+        for symbol in objects[::3]:
+            objects.remove(symbol)
+            index.remove(symbol)
+        self.assertEqual(len(index), len(objects))
+
+        # same result, and order, as a scan of the list of objects
+        for rect in ((Pos(0, 0), Pos(100, 60)), (Pos(10, 5), Pos(40, 50)), (Pos(17, 33), Pos(18, 34)), (Pos(5, 5), Pos(5, 9))):
+            expected = [symbol for symbol in objects if symbol.pickpoint_pos.in_rect(rect)]
+            self.assertEqual(index.in_rect(rect), expected)
+
+        for symbol in objects[:50]:
+            pos = symbol.pickpoint_pos
+            expected = [sym for sym in objects if sym.pickpoint_pos == pos]
+            self.assertEqual(index.at(pos), expected)